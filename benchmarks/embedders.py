@@ -0,0 +1,97 @@
+"""
+Embedder benchmark: for each embedder, in a fresh interpreter, the cold-start time (load
+the embedder and embed the first text), the time to embed a labelled set, leave-one-out
+k-NN accuracy on it, whether torch was imported, and peak RSS.
+
+    python benchmarks/embedders.py [--labels training_labels.json] [--embedder MODEL ...]
+                                   [--metric euclidean|cosine] [--threads N] [--repeat N]
+                                   [--json out.json]
+
+The default compares the sentence-transformers model with the hashing n-gram embedder.
+An embedder that fails to load (e.g. a model that cannot be downloaded offline) is
+reported and skipped.
+"""
+import argparse
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+SRC = str(Path(__file__).resolve().parents[1] / "src")
+sys.path.insert(0, SRC)
+
+from knn_file_organiser.config import EMBEDDER_MODEL, HASHING_EMBEDDER  # noqa: E402
+
+WORKER = """
+import json, sys, time
+t0 = time.perf_counter()
+import numpy as np
+from knn_file_organiser.calibrate import leave_one_out
+from knn_file_organiser.model_utils import KNNModelWrapper
+from knn_file_organiser.profiling import peak_rss
+
+model_name, labels_path, metric, threads, repeat = sys.argv[1:6]
+data = json.loads(open(labels_path, encoding="utf-8").read())
+n = min(len(data["examples"]), len(data["labels"]))
+examples, labels = data["examples"][:n], data["labels"][:n]
+
+wrapper = KNNModelWrapper(model_name=model_name, metric=metric, embedder_options={"threads": int(threads) or None})
+wrapper.encode(examples[:1])
+cold_start = time.perf_counter() - t0
+
+samples = []
+for _ in range(int(repeat)):
+    start = time.perf_counter()
+    wrapper.encode(examples)
+    samples.append(time.perf_counter() - start)
+wrapper.train(examples, labels)
+predicted, _ = leave_one_out(wrapper)
+print(json.dumps({
+    "cold_start_s": cold_start,
+    "encode_ms_per_text": min(samples) / n * 1000,
+    "loo_accuracy": float((predicted == np.asarray(labels)).mean()),
+    "dim": int(wrapper.embeddings.shape[1]),
+    "torch_imported": "torch" in sys.modules,
+    "peak_rss_mb": (peak_rss() or {}).get("self", 0) / 2**20,
+}))
+"""
+
+
+def run_embedder(model_name, labels_path, metric, threads, repeat):
+    out = subprocess.run(
+        [sys.executable, "-c", WORKER, model_name, str(labels_path), metric, str(threads), str(repeat)],
+        env={"PYTHONPATH": SRC, "HF_HUB_OFFLINE": "1"}, capture_output=True, text=True,
+    )
+    if out.returncode != 0:
+        return {"error": (out.stderr.strip().splitlines() or ["failed"])[-1]}
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--labels", type=Path, default=Path("training_labels.json"))
+    parser.add_argument("--embedder", action="append", default=None, metavar="MODEL")
+    parser.add_argument("--metric", choices=("euclidean", "cosine"), default="euclidean")
+    parser.add_argument("--threads", type=int, default=0, help="Embedder threads (0: the library default)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", type=Path, default=None, help="Write results to this JSON file.")
+    args = parser.parse_args()
+
+    results = {}
+    for model_name in args.embedder or [EMBEDDER_MODEL, HASHING_EMBEDDER]:
+        results[model_name] = r = run_embedder(model_name, args.labels.resolve(), args.metric, args.threads, args.repeat)
+        if "error" in r:
+            print(f"{model_name:>20}: skipped ({r['error']})")
+            continue
+        print(
+            f"{model_name:>20}: cold start {r['cold_start_s']:6.2f} s, {r['encode_ms_per_text']:7.3f} ms/text, "
+            f"leave-one-out accuracy {r['loo_accuracy']:.3f}, dim {r['dim']}, "
+            f"torch {'yes' if r['torch_imported'] else 'no'}, peak RSS {r['peak_rss_mb']:.0f} MB"
+        )
+
+    if args.json:
+        args.json.write_text(json.dumps({"embedders": results}, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
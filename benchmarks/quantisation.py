@@ -0,0 +1,133 @@
+"""
+Storage precision benchmark: for each of float32 / float16 / int8, train on part of a
+labelled set and classify the rest, reporting accuracy, agreement with float32 labels,
+how many predictions cross the confidence threshold relative to float32, the size of
+the stored matrix, the memory actually held once the index is built (and the peak while
+building and querying it, both traced with tracemalloc), and query time.
+
+    python benchmarks/quantisation.py [--labels labels.json] [--metric euclidean|cosine]
+                                      [--index BACKEND] [--synthetic N] [--repeat N]
+                                      [--json out.json]
+
+Texts are embedded once with the configured sentence model; --synthetic N skips the
+model and uses N clustered random 384-d vectors instead (useful offline and for
+measuring query time at a realistic matrix size).
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from knn_file_organiser.config import (  # noqa: E402
+    EMBEDDING_PRECISIONS,
+    INDEX_BACKEND_NAMES,
+    default_threshold,
+)
+from knn_file_organiser.model_utils import KNNModelWrapper  # noqa: E402
+
+
+def embed_labels(path: Path, metric: str):
+    data = json.loads(path.read_text(encoding="utf-8"))
+    n = min(len(data["examples"]), len(data["labels"]))
+    wrapper = KNNModelWrapper(metric=metric)
+    vecs = wrapper.normalise(wrapper.encode(data["examples"][:n]))
+    return vecs, np.asarray(data["labels"][:n])
+
+
+def synthetic(n: int, metric: str, n_labels: int = 12, dim: int = 384, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(n_labels, dim)).astype(np.float32)
+    labels = rng.integers(0, n_labels, size=n)
+    vecs = centres[labels] + rng.normal(scale=1.5, size=(n, dim)).astype(np.float32)
+    if metric == "cosine":
+        vecs /= np.linalg.norm(vecs, axis=1, keepdims=True)
+    return vecs.astype(np.float32), labels.astype(str)
+
+
+def run_precision(precision, train, train_labels, queries, metric, index, repeat):
+    tracemalloc.start()
+    wrapper = KNNModelWrapper(index=index, metric=metric, precision=precision)
+    # A fresh copy, so float32 (stored as is) is counted like the quantised matrices
+    wrapper.train_embeddings(np.array(train), list(train_labels))
+    resident, _ = tracemalloc.get_traced_memory()
+
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        labels, dists = wrapper.predict_embeddings(queries)
+        samples.append(time.perf_counter() - start)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    nbytes = wrapper.embeddings.nbytes
+    if wrapper.embedding_scales is not None:
+        nbytes += wrapper.embedding_scales.nbytes
+    return labels, dists, nbytes, resident, peak, statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--labels", type=Path, default=Path("labels.json"))
+    parser.add_argument("--metric", choices=("euclidean", "cosine"), default="euclidean")
+    parser.add_argument("--index", choices=INDEX_BACKEND_NAMES, default=None, help="Default: by metric.")
+    parser.add_argument("--synthetic", type=int, default=0, metavar="N")
+    parser.add_argument("--test-every", type=int, default=5, help="Hold out every Nth example.")
+    parser.add_argument("--threshold", type=float, default=None)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", type=Path, default=None, help="Write results to this JSON file.")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        vecs, labels = synthetic(args.synthetic, args.metric)
+    else:
+        vecs, labels = embed_labels(args.labels, args.metric)
+    threshold = args.threshold
+    if threshold is None:
+        threshold = default_threshold(args.metric)
+
+    held_out = np.zeros(len(vecs), dtype=bool)
+    held_out[:: args.test_every] = True
+    train, train_labels = vecs[~held_out], labels[~held_out]
+    queries, truth = vecs[held_out], labels[held_out]
+    print(f"[INFO] {len(train)} training vectors, {len(queries)} queries, metric={args.metric}, threshold={threshold}")
+
+    results = {}
+    reference = None
+    for precision in EMBEDDING_PRECISIONS:
+        pred, dists, nbytes, resident, peak, query_s = run_precision(
+            precision, train, train_labels, queries, args.metric, args.index, args.repeat
+        )
+        confident = dists <= threshold
+        if reference is None:
+            reference = (pred, dists, confident)
+        ref_pred, ref_dists, ref_confident = reference
+        results[precision] = {
+            "accuracy": float((pred == truth).mean()),
+            "agreement": float((pred == ref_pred).mean()),
+            "threshold_flips": int((confident != ref_confident).sum()),
+            "max_distance_error": float(np.abs(dists - ref_dists).max()) if len(dists) else 0.0,
+            "matrix_bytes": int(nbytes),
+            "resident_bytes": int(resident),
+            "peak_bytes": int(peak),
+            "query_ms": query_s * 1000,
+        }
+        r = results[precision]
+        print(
+            f"{precision:>8}: accuracy {r['accuracy']:.3f}  agreement {r['agreement']:.3f}  "
+            f"flips {r['threshold_flips']:4d}  max |dd| {r['max_distance_error']:.4f}  "
+            f"matrix {r['matrix_bytes'] / 1024:9.1f} KiB  resident {r['resident_bytes'] / 1024:9.1f} KiB  "
+            f"peak {r['peak_bytes'] / 1024:9.1f} KiB  {r['query_ms']:8.2f} ms"
+        )
+
+    if args.json:
+        args.json.write_text(json.dumps({"quantisation": results}, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Load-test client for `knn-file-organiser serve`: N concurrent clients send classify
+requests for a fixed number of requests, then p50/p99 latency and throughput are reported.
+
+    knn-file-organiser serve &
+    python benchmarks/server_load.py [--url http://127.0.0.1:8765 | --socket PATH]
+                                     [--concurrency 16] [--requests 2000] [--texts-per-request 1]
+                                     [--endpoint classify|neighbors] [--json out.json]
+
+Request texts are the examples in labels.json (or --texts FILE, one per line), cycled.
+"""
+import argparse
+import json
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from knn_file_organiser.config import SERVER_PORT  # noqa: E402
+from knn_file_organiser.server import Client  # noqa: E402
+
+
+def load_texts(args):
+    if args.texts:
+        return [line.strip() for line in args.texts.read_text(encoding="utf-8").splitlines() if line.strip()]
+    return json.loads(Path("labels.json").read_text(encoding="utf-8"))["examples"]
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", default=f"http://127.0.0.1:{SERVER_PORT}")
+    parser.add_argument("--socket", type=Path, default=None)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--texts-per-request", type=int, default=1)
+    parser.add_argument("--endpoint", choices=("classify", "neighbors"), default="classify")
+    parser.add_argument("--texts", type=Path, default=None, help="File of request texts, one per line.")
+    parser.add_argument("--json", type=Path, default=None, help="Write results to this JSON file.")
+    args = parser.parse_args()
+
+    texts = load_texts(args)
+    before = Client(args.url, args.socket).health()
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    counter = iter(range(args.requests))
+
+    def worker():
+        client = Client(args.url, args.socket)
+        try:
+            while True:
+                with lock:
+                    i = next(counter, None)
+                if i is None:
+                    return
+                batch = [texts[(i * args.texts_per_request + j) % len(texts)] for j in range(args.texts_per_request)]
+                start = time.perf_counter()
+                try:
+                    getattr(client, args.endpoint)(batch)
+                except Exception as e:
+                    with lock:
+                        errors.append(str(e))
+                    continue
+                elapsed = time.perf_counter() - start
+                with lock:
+                    latencies.append(elapsed)
+        finally:
+            client.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(args.concurrency)]
+    wall_start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - wall_start
+    after = Client(args.url, args.socket).health()
+
+    batches = after["batches"] - before["batches"]
+    results = {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "concurrency": args.concurrency,
+        "texts_per_request": args.texts_per_request,
+        "p50_ms": percentile(latencies, 0.50) * 1000 if latencies else None,
+        "p99_ms": percentile(latencies, 0.99) * 1000 if latencies else None,
+        "mean_ms": statistics.mean(latencies) * 1000 if latencies else None,
+        "requests_per_s": len(latencies) / wall,
+        "texts_per_s": len(latencies) * args.texts_per_request / wall,
+        "mean_batch_texts": (after["texts"] - before["texts"]) / batches if batches else None,
+    }
+    print(
+        f"{results['requests']} requests ({results['errors']} errors) in {wall:.2f}s, "
+        f"concurrency {args.concurrency}: {results['requests_per_s']:.1f} req/s, "
+        f"{results['texts_per_s']:.1f} texts/s"
+    )
+    if latencies:
+        print(f"latency p50 {results['p50_ms']:.1f} ms, p99 {results['p99_ms']:.1f} ms, mean {results['mean_ms']:.1f} ms")
+    if batches:
+        print(f"server batches: {batches}, mean {results['mean_batch_texts']:.1f} texts/batch")
+    for error in errors[:5]:
+        print(f"[ERROR] {error}")
+
+    if args.json:
+        args.json.write_text(json.dumps({"server_load": results}, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
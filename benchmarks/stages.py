@@ -0,0 +1,199 @@
+"""
+Stage benchmark: builds synthetic directory trees of N files and times each stage of a
+run separately: scan (list_all_files), extract (extract_text_from_file), train
+(KNNModelWrapper.train on N labelled names), predict (predict_batch over the tree) and
+move (MoveExecutor into category folders). Runs offline with the hashing n-gram embedder
+in place of the sentence model by default, so mostly the organiser's own overhead is
+measured; pass --embedder MODEL to time a sentence-transformers model instead.
+
+    python benchmarks/stages.py [--sizes 100 1000 5000] [--pdf-fraction 0.1] [--repeat 3]
+                                [--embedder MODEL] [--seed 0] [--json out.json]
+                                [--compare baseline.json]
+
+Filenames are generated from training_labels.json examples in mixed styles (spaces,
+snake_case, kebab-case, CamelCase, dates, numbering) and extensions; a fraction of the
+files are real one-page text PDFs. The same seed always produces the same trees.
+With --compare, each stage's median is printed as a ratio to the baseline JSON.
+"""
+import argparse
+import contextlib
+import io
+import json
+import platform
+import random
+import re
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+import numpy as np  # noqa: E402
+
+from knn_file_organiser.config import HASHING_EMBEDDER  # noqa: E402
+from knn_file_organiser.io_utils import extract_text_from_file, list_all_files  # noqa: E402
+from knn_file_organiser.model_utils import KNNModelWrapper  # noqa: E402
+from knn_file_organiser.mover import MoveExecutor  # noqa: E402
+
+EXTENSIONS = [".pdf", ".jpg", ".png", ".docx", ".txt", ".xlsx"]
+STAGES = ("scan", "extract", "train", "predict", "move")
+
+
+def seed_examples():
+    data = json.loads((ROOT / "training_labels.json").read_text(encoding="utf-8"))
+    n = min(len(data["examples"]), len(data["labels"]))
+    return data["examples"][:n], data["labels"][:n]
+
+
+def style_name(text: str, rng: random.Random) -> str:
+    words = re.findall(r"\w+", text)
+    style = rng.randrange(5)
+    if style == 0:
+        name = " ".join(words)
+    elif style == 1:
+        name = "_".join(w.lower() for w in words)
+    elif style == 2:
+        name = "-".join(w.lower() for w in words)
+    elif style == 3:
+        name = "".join(w.capitalize() for w in words)
+    else:
+        name = f"{' '.join(words)} {rng.randint(2015, 2025)}-{rng.randint(1, 12):02d}"
+    if rng.random() < 0.3:
+        name += f" ({rng.randint(1, 9)})"
+    return name
+
+
+def write_pdf(path: Path, text: str) -> None:
+    import fitz
+
+    doc = fitz.open()
+    page = doc.new_page()
+    page.insert_text((72, 72), text)
+    doc.save(str(path))
+    doc.close()
+
+
+def make_tree(root: Path, n: int, pdf_fraction: float, seed: int):
+    """
+    Create `n` files under `root`, spread over nested folders. Returns (paths, labels).
+    """
+    rng = random.Random(seed)
+    examples, labels = seed_examples()
+    dirs = [root] + [root / f"folder{i}" / f"sub{j}" for i in range(max(1, n // 500)) for j in range(3)]
+    paths, path_labels = [], []
+    for i in range(n):
+        k = rng.randrange(len(examples))
+        directory = dirs[i % len(dirs)]
+        directory.mkdir(parents=True, exist_ok=True)
+        stem = f"{style_name(examples[k], rng)} {i}"
+        if rng.random() < pdf_fraction:
+            path = directory / f"{stem}.pdf"
+            write_pdf(path, f"{examples[k]}. Generated document {i}.")
+        else:
+            path = directory / f"{stem}{rng.choice(EXTENSIONS[1:])}"
+            path.write_bytes(b"x" * rng.randint(0, 4096))
+        paths.append(path)
+        path_labels.append(labels[k])
+    return paths, path_labels
+
+
+def timed(fn, repeat: int):
+    samples = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples), result
+
+
+def run_scale(n: int, args) -> dict:
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        paths, labels = make_tree(tmp / "src", n, args.pdf_fraction, args.seed)
+
+        results["scan"], found = timed(lambda: list_all_files(tmp / "src"), args.repeat)
+        assert len(found) == n
+        results["extract"], texts = timed(lambda: [extract_text_from_file(p) for p in paths], args.repeat)
+
+        def train():
+            knn = KNNModelWrapper(model_name=args.embedder)
+            knn.train(texts, labels)
+            return knn
+
+        results["train"], knn = timed(train, args.repeat)
+        results["predict"], _ = timed(lambda: knn.predict_batch(texts), args.repeat)
+
+        # Moving is destructive, so each repeat moves a fresh copy of the tree
+        samples = []
+        for r in range(args.repeat):
+            copy = tmp / f"copy{r}"
+            shutil.copytree(tmp / "src", copy)
+            copied = [copy / p.relative_to(tmp / "src") for p in paths]
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                with MoveExecutor(tmp / f"dest{r}", workers=args.move_workers) as mover:
+                    for path, label in zip(copied, labels):
+                        mover.submit(path, label)
+            samples.append(time.perf_counter() - start)
+        results["move"] = statistics.median(samples)
+
+    return {
+        stage: {"seconds": seconds, "per_file_us": seconds / n * 1e6}
+        for stage, seconds in results.items()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--pdf-fraction", type=float, default=0.1)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--move-workers", type=int, default=8)
+    parser.add_argument("--embedder", default=HASHING_EMBEDDER, metavar="MODEL")
+    parser.add_argument("--json", type=Path, default=None, help="Write results to this JSON file.")
+    parser.add_argument("--compare", type=Path, default=None, help="Baseline JSON from an earlier run.")
+    args = parser.parse_args()
+
+    # Pay one-off imports (scikit-learn, PyMuPDF, the embedder) before anything is timed
+    KNNModelWrapper(model_name=args.embedder).train(["warm up", "start up"], ["a", "b"])
+    with tempfile.TemporaryDirectory() as tmp:
+        write_pdf(Path(tmp) / "warm.pdf", "warm up")
+        extract_text_from_file(Path(tmp) / "warm.pdf")
+    baseline = json.loads(args.compare.read_text(encoding="utf-8"))["stages"] if args.compare else {}
+
+    results = {}
+    print(f"{'files':>7} " + " ".join(f"{s:>12}" for s in STAGES))
+    for n in args.sizes:
+        results[str(n)] = run_scale(n, args)
+        row = []
+        for stage in STAGES:
+            seconds = results[str(n)][stage]["seconds"]
+            cell = f"{seconds * 1000:10.1f}ms"
+            base = baseline.get(str(n), {}).get(stage)
+            if base:
+                cell = f"{seconds / base['seconds']:.2f}x"
+            row.append(f"{cell:>12}")
+        print(f"{n:>7} " + " ".join(row))
+
+    if args.json:
+        meta = {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "seed": args.seed,
+            "pdf_fraction": args.pdf_fraction,
+            "repeat": args.repeat,
+            "embedder": args.embedder,
+        }
+        args.json.write_text(json.dumps({"meta": meta, "stages": results}, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Startup benchmark: wall-clock time of `knn-file-organiser --version`, `--help`, and a run
+over an empty directory, each in a fresh interpreter. These paths should never import
+torch/scikit-learn/PyMuPDF or load the model.
+
+    python benchmarks/startup.py [--repeat N] [--json out.json]
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+SRC = str(Path(__file__).resolve().parents[1] / "src")
+
+CASES = {
+    "version": ["--version"],
+    "help": ["--help"],
+    "empty_run": ["--source", "src", "--dest", "out", "--no-cache"],
+}
+
+
+def time_case(argv, cwd, repeat):
+    code = (
+        "import sys; sys.argv = ['knn-file-organiser'] + %r\n"
+        "from knn_file_organiser.cli import main\n"
+        "try:\n    main()\nexcept SystemExit:\n    pass\n" % (argv,)
+    )
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], cwd=cwd, env={"PYTHONPATH": SRC},
+                       stdout=subprocess.DEVNULL, check=True)
+        samples.append(time.perf_counter() - start)
+    return {"median_s": statistics.median(samples), "min_s": min(samples), "repeat": repeat}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", type=Path, default=None, help="Write results to this JSON file.")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        (Path(tmp) / "src").mkdir()
+        for name, argv in CASES.items():
+            results[name] = time_case(argv, tmp, args.repeat)
+            print(f"{name:>10}: {results[name]['median_s'] * 1000:8.1f} ms (median of {args.repeat})")
+
+    if args.json:
+        args.json.write_text(json.dumps({"startup": results}, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+import hashlib
+import json
+import os
+import struct
+from pathlib import Path
+from typing import Dict, Tuple
+
+import numpy as np
+
+# Layout of a model artifact (all integers little-endian):
+#   8 bytes  magic b"KFOMODEL"
+#   4 bytes  format version (uint32)
+#   4 bytes  reserved (zero)
+#   8 bytes  header length in bytes (uint64)
+#   header   UTF-8 JSON: model metadata plus an "arrays" table of
+#            {name: {dtype, shape, offset, sha256}}, offsets relative to the data section
+#   padding  up to a multiple of ALIGN
+#   data     raw C-order array bytes, each array starting on an ALIGN boundary
+MAGIC = b"KFOMODEL"
+FORMAT_VERSION = 1
+ALIGN = 64
+_PREAMBLE = struct.Struct("<8sIIQ")
+
+
+class ArtifactError(ValueError):
+    """
+    Raised when a model artifact is malformed, from an unknown version, or fails its checksums.
+    """
+
+
+def _align(n: int) -> int:
+    return (n + ALIGN - 1) // ALIGN * ALIGN
+
+
+def _sha256(arr: np.ndarray) -> str:
+    return hashlib.sha256(np.ascontiguousarray(arr).data).hexdigest()
+
+
+def write_artifact(path: Path, header: dict, arrays: Dict[str, np.ndarray]) -> None:
+    """
+    Write `header` and `arrays` to `path` as one artifact.
+    The file is written next to `path` and atomically renamed into place, so processes
+    that have the previous version memory-mapped keep a consistent view.
+    """
+    path = Path(path)
+    table = {}
+    offset = end = 0
+    contiguous = {}
+    for name, arr in arrays.items():
+        arr = np.ascontiguousarray(arr)
+        contiguous[name] = arr
+        table[name] = {
+            "dtype": arr.dtype.str,
+            "shape": list(arr.shape),
+            "offset": offset,
+            "sha256": _sha256(arr),
+        }
+        end = offset + arr.nbytes
+        offset = _align(end)
+
+    header = dict(header, arrays=table)
+    header_bytes = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    data_start = _align(_PREAMBLE.size + len(header_bytes))
+
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(_PREAMBLE.pack(MAGIC, FORMAT_VERSION, 0, len(header_bytes)))
+        f.write(header_bytes)
+        for name, arr in contiguous.items():
+            f.seek(data_start + table[name]["offset"])
+            f.write(arr.data)
+        f.truncate(data_start + end)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def read_artifact(path: Path, verify: bool = False) -> Tuple[dict, Dict[str, np.ndarray]]:
+    """
+    Open an artifact written by `write_artifact`.
+    Arrays are returned as read-only memory maps, so loading costs no resident memory
+    up front and several processes opening the same file share its pages.
+    With `verify`, every array is read once and checked against its stored SHA-256.
+    """
+    path = Path(path)
+    with open(path, "rb") as f:
+        preamble = f.read(_PREAMBLE.size)
+        if len(preamble) != _PREAMBLE.size:
+            raise ArtifactError(f"{path} is too short to be a model artifact.")
+        magic, version, _, header_len = _PREAMBLE.unpack(preamble)
+        if magic != MAGIC:
+            raise ArtifactError(f"{path} is not a model artifact.")
+        if version != FORMAT_VERSION:
+            raise ArtifactError(f"{path} has artifact format version {version}; expected {FORMAT_VERSION}.")
+        try:
+            header = json.loads(f.read(header_len).decode("utf-8"))
+        except ValueError as e:
+            raise ArtifactError(f"{path} has a corrupt header: {e}") from e
+
+    data_start = _align(_PREAMBLE.size + header_len)
+    file_size = path.stat().st_size
+    arrays = {}
+    for name, spec in header.pop("arrays", {}).items():
+        dtype = np.dtype(spec["dtype"])
+        shape = tuple(spec["shape"])
+        start = data_start + spec["offset"]
+        nbytes = int(np.prod(shape, dtype=np.int64)) * dtype.itemsize
+        if start + nbytes > file_size:
+            raise ArtifactError(f"{path} is truncated (array {name!r}).")
+        if nbytes == 0:
+            arr = np.empty(shape, dtype=dtype)
+        else:
+            arr = np.memmap(path, dtype=dtype, mode="r", offset=start, shape=shape)
+        if verify and _sha256(arr) != spec["sha256"]:
+            raise ArtifactError(f"{path} failed its checksum (array {name!r}).")
+        arrays[name] = arr
+    return header, arrays
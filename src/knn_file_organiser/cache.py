@@ -0,0 +1,180 @@
+import os
+import sqlite3
+import time
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .config import CACHE_BUSY_TIMEOUT, CACHE_FILE, CACHE_MAX_ENTRIES, EMBEDDING_PRECISION, EMBEDDING_PRECISIONS
+from .quantise import dequantize, quantize
+
+
+class EmbeddingCache:
+    """
+    On-disk cache of (normalised text, embedding vector) per scanned file.
+    Entries are keyed by (path, size, mtime, embedder model name), so a file is only
+    re-extracted and re-embedded when it changes or the embedder changes. The KNN side
+    is not part of the key, which lets the cache survive --retrain.
+    Size is bounded to `max_entries`; the least recently used entries are evicted first.
+    Vectors are written at `precision` (see quantise.py) and returned as float32.
+    """
+
+    def __init__(
+        self,
+        path: Path = Path(CACHE_FILE),
+        model_name: str = "",
+        max_entries: int = CACHE_MAX_ENTRIES,
+        precision: str = EMBEDDING_PRECISION,
+    ):
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1.")
+        if precision not in EMBEDDING_PRECISIONS:
+            raise ValueError(f"precision must be one of {EMBEDDING_PRECISIONS}, got {precision!r}")
+        self.path = Path(path)
+        self.model_name = model_name
+        self.precision = precision
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        # The database is opened on first use, so a run with no files creates no cache file
+        self._connection: Optional[sqlite3.Connection] = None
+        self._count = 0
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self._connection = self._open()
+        return self._connection
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self.path), timeout=CACHE_BUSY_TIMEOUT)
+        # Several processes may share the cache: readers don't block the writer under WAL,
+        # and writers wait for each other instead of failing with "database is locked"
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA busy_timeout = {int(CACHE_BUSY_TIMEOUT * 1000)}")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                path      TEXT    NOT NULL,
+                size      INTEGER NOT NULL,
+                mtime_ns  INTEGER NOT NULL,
+                model     TEXT    NOT NULL,
+                text      TEXT    NOT NULL,
+                dim       INTEGER NOT NULL,
+                vector    BLOB    NOT NULL,
+                last_used INTEGER NOT NULL,
+                dtype     TEXT    NOT NULL DEFAULT 'float32',
+                scale     REAL,
+                PRIMARY KEY (path, model)
+            )
+            """
+        )
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(embeddings)")}
+        if "dtype" not in columns:
+            # Caches written before storage precision was configurable hold float32 vectors
+            conn.execute("ALTER TABLE embeddings ADD COLUMN dtype TEXT NOT NULL DEFAULT 'float32'")
+            conn.execute("ALTER TABLE embeddings ADD COLUMN scale REAL")
+        conn.execute("CREATE INDEX IF NOT EXISTS embeddings_lru ON embeddings (last_used)")
+        conn.commit()
+        self._count = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        return conn
+
+    @staticmethod
+    def _stat_key(file_path: Path) -> Optional[Tuple[str, int, int]]:
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            return None
+        return str(file_path), st.st_size, st.st_mtime_ns
+
+    def get_many(self, file_paths: Sequence[Path]) -> List[Optional[Tuple[str, np.ndarray]]]:
+        """
+        Look up cached (text, vector) pairs for `file_paths`.
+        Returns a list aligned with `file_paths`, holding None where there is no fresh entry.
+        """
+        results: List[Optional[Tuple[str, np.ndarray]]] = []
+        touched = []
+        now = time.time_ns()
+        for file_path in file_paths:
+            key = self._stat_key(file_path)
+            row = None
+            if key is not None:
+                row = self._conn.execute(
+                    "SELECT size, mtime_ns, text, dim, vector, dtype, scale FROM embeddings "
+                    "WHERE path = ? AND model = ?",
+                    (key[0], self.model_name),
+                ).fetchone()
+            if row is None or (row[0], row[1]) != key[1:]:
+                results.append(None)
+                self.misses += 1
+                continue
+            data = np.frombuffer(row[4], dtype=row[5], count=row[3])[None, :]
+            vector = dequantize(data, None if row[6] is None else np.array([row[6]], dtype=np.float32))[0]
+            results.append((row[2], vector))
+            touched.append((now, key[0], self.model_name))
+            self.hits += 1
+        if touched:
+            self._conn.executemany("UPDATE embeddings SET last_used = ? WHERE path = ? AND model = ?", touched)
+            self._conn.commit()
+        return results
+
+    def put_many(self, entries: Sequence[Tuple[Path, str, np.ndarray]]) -> None:
+        """
+        Store (file_path, text, vector) entries, then evict down to `max_entries`.
+        Files that can no longer be stat'ed are skipped.
+        """
+        now = time.time_ns()
+        rows = []
+        for file_path, text, vector in entries:
+            key = self._stat_key(file_path)
+            if key is None:
+                continue
+            data, scales = quantize(np.asarray(vector, dtype=np.float32).reshape(1, -1), self.precision)
+            scale = None if scales is None else float(scales[0])
+            rows.append(
+                (key[0], key[1], key[2], self.model_name, text, data.shape[1], data.tobytes(), now, self.precision, scale)
+            )
+        if not rows:
+            return
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO embeddings "
+            "(path, size, mtime_ns, model, text, dim, vector, last_used, dtype, scale) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+        self._conn.commit()
+        # Replaced rows make this an upper bound; it is made exact before evicting
+        self._count += len(rows)
+        self._evict()
+
+    def _evict(self) -> None:
+        if self._count <= self.max_entries:
+            return
+        self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        excess = self._count - self.max_entries
+        if excess <= 0:
+            return
+        self._conn.execute(
+            "DELETE FROM embeddings WHERE rowid IN "
+            "(SELECT rowid FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+            (excess,),
+        )
+        self._conn.commit()
+        self._count -= excess
+
+    def __len__(self) -> int:
+        if self._connection is None:
+            self._connection = self._open()
+        return self._count
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def __enter__(self) -> "EmbeddingCache":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,199 @@
+import json
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from . import profiling
+from .config import (
+    CALIBRATION_TARGET_ACCURACY,
+    DUPLICATES_LABEL,
+    KNN_NEIGHBORS,
+    PREDICT_BATCH_SIZE,
+    UNCATEGORISED_LABEL,
+    default_threshold,
+)
+from .io_utils import iter_files
+from .model_utils import KNNModelWrapper
+from .organiser import RunOptions, _embed_stream, prepare_model
+
+# Calibration measures, on labelled data, how accurate the classifier is on the files it
+# is confident about at each threshold: at threshold t, a file is covered when the mean
+# distance to its KNN_NEIGHBORS nearest examples is <= t, and correct when the predicted
+# label matches its known one. Sorting files by distance once turns the whole
+# coverage-vs-accuracy curve into two cumulative sums.
+
+
+def labelled_tree(root: Path, **scan_options) -> Tuple[List[Path], List[str]]:
+    """
+    Files under `root` labelled by their top-level folder (the layout of an organised
+    destination: <root>/<label>/...). Files directly in `root`, and the Uncategorised and
+    Duplicates folders, are skipped.
+    """
+    paths, labels = [], []
+    for file_path in iter_files(root, **scan_options):
+        parts = file_path.relative_to(root).parts
+        if len(parts) > 1 and parts[0] not in (UNCATEGORISED_LABEL, DUPLICATES_LABEL):
+            paths.append(file_path)
+            labels.append(parts[0])
+    return paths, labels
+
+
+def leave_one_out(knn_wrapper: KNNModelWrapper, batch_size: int = PREDICT_BATCH_SIZE) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (predicted_labels, mean_distances) for every stored training example, classified by
+    its neighbours among the *other* examples. Uses the stored embeddings (nothing is
+    re-embedded), searched `batch_size` rows at a time.
+    """
+    n = len(knn_wrapper.examples)
+    k = min(KNN_NEIGHBORS, n - 1)
+    if k < 1:
+        raise ValueError("Leave-one-out calibration needs at least two training examples.")
+    predicted, mean_distances = [], []
+    for start in range(0, n, batch_size):
+        rows = np.arange(start, min(start + batch_size, n))
+        vecs = knn_wrapper.embedding_matrix_rows(rows)
+        distances, indices = knn_wrapper.nearest_embeddings(vecs, k + 1, batch_size=batch_size)
+        # Drop each example's own row (normally the first column, but an identical
+        # example can tie with it); rows where it is absent lose their farthest column
+        own = indices == rows[:, None]
+        drop = np.where(own.any(axis=1), own.argmax(axis=1), k)
+        keep = np.arange(k + 1)[None, :] != drop[:, None]
+        distances = distances[keep].reshape(len(rows), k)
+        indices = indices[keep].reshape(len(rows), k)
+        labels, means = knn_wrapper.predict_from_neighbors(distances, indices)
+        predicted.append(labels)
+        mean_distances.append(means)
+    return np.concatenate(predicted), np.concatenate(mean_distances)
+
+
+def sweep_thresholds(mean_distances: np.ndarray, correct: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Coverage and accuracy at every distinct threshold, vectorised.
+    Returns arrays "threshold" (ascending distinct distances), "coverage" (fraction of
+    files with distance <= threshold), "accuracy" (fraction of those files that are
+    correctly labelled) and "covered" (their count).
+    """
+    order = np.argsort(mean_distances, kind="stable")
+    sorted_d = np.asarray(mean_distances, dtype=np.float64)[order]
+    cum_correct = np.cumsum(np.asarray(correct, dtype=np.int64)[order])
+    # The last position of each distinct distance: ties are covered together
+    last = np.flatnonzero(np.append(sorted_d[1:] != sorted_d[:-1], True))
+    covered = last + 1
+    return {
+        "threshold": sorted_d[last],
+        "coverage": covered / len(sorted_d),
+        "accuracy": cum_correct[last] / covered,
+        "covered": covered,
+    }
+
+
+def recommend_threshold(curve: Dict[str, np.ndarray], target_accuracy: float) -> Optional[int]:
+    """
+    Index into `curve` of the threshold with the highest coverage whose accuracy is at
+    least `target_accuracy`, or None if no threshold reaches it.
+    """
+    ok = np.flatnonzero(curve["accuracy"] >= target_accuracy)
+    return int(ok[-1]) if len(ok) else None
+
+
+def _at(curve: Dict[str, np.ndarray], threshold: float) -> Tuple[float, float]:
+    i = np.searchsorted(curve["threshold"], threshold, side="right") - 1
+    if i < 0:
+        return 0.0, float("nan")
+    return float(curve["coverage"][i]), float(curve["accuracy"][i])
+
+
+def run_calibration(
+    source: Optional[Path] = None,
+    options: Optional[RunOptions] = None,
+    target_accuracy: float = CALIBRATION_TARGET_ACCURACY,
+    json_path: Optional[Path] = None,
+    steps: int = 10,
+) -> Dict[str, object]:
+    """
+    Print a coverage-vs-accuracy table and a recommended --threshold, and return them.
+    With `source`, the files of an organised tree (<source>/<label>/...) are extracted
+    and embedded the same way a run does (reusing the embedding cache) and classified
+    against the model; without it, the model's own training examples are classified
+    leave-one-out from their stored embeddings. The recommendation is the threshold that
+    covers the most files while keeping accuracy >= `target_accuracy`.
+    The saved model is only read (see `prepare_model`): asking for a different embedder
+    or metric than it was built with raises ValueError; set `options.retrain` to
+    calibrate a freshly trained model held in memory. Of the scan and move settings in
+    `options` (see RunOptions), none apply.
+    """
+    options = options or RunOptions()
+    knn_wrapper = options.make_model()
+    with profiling.stage("model_load"):
+        # Calibration never writes the model: --retrain and other settings are tried in memory
+        prepare_model(knn_wrapper, retrain=options.retrain, read_only=True)
+    threshold = options.threshold
+    if threshold is None:
+        threshold = default_threshold(knn_wrapper.metric)
+
+    if source is not None:
+        paths, true_labels = labelled_tree(source)
+        if not paths:
+            raise ValueError(f"No labelled files under {source} (expected <source>/<label>/<file>).")
+        cache = options.open_cache(knn_wrapper)
+        predicted, mean_distances = [], []
+        try:
+            for _, vecs in _embed_stream(
+                paths, knn_wrapper, cache, options.batch_size, options.workers, options.extract_timeout, options.max_chars
+            ):
+                with profiling.stage("search"):
+                    labels, means = knn_wrapper.predict_embeddings(vecs, batch_size=options.batch_size)
+                predicted.append(labels)
+                mean_distances.append(means)
+        finally:
+            if cache is not None:
+                cache.close()
+        predicted, mean_distances = np.concatenate(predicted), np.concatenate(mean_distances)
+        what = f"{len(paths)} labelled files under {source}"
+    else:
+        true_labels = knn_wrapper.labels
+        with profiling.stage("search"):
+            predicted, mean_distances = leave_one_out(knn_wrapper, batch_size=options.batch_size)
+        what = f"{len(true_labels)} training examples (leave-one-out)"
+
+    correct = predicted.astype(str) == np.asarray(true_labels, dtype=str)
+    curve = sweep_thresholds(mean_distances, correct)
+    best = recommend_threshold(curve, target_accuracy)
+
+    print(f"[INFO] Calibrating on {what}; {knn_wrapper.metric} distances, mean of {KNN_NEIGHBORS} neighbours.")
+    print(f"[INFO] Overall accuracy if every file were classified: {correct.mean():.3f}")
+    print(f"\n{'threshold':>10} {'coverage':>9} {'accuracy':>9} {'files':>8}")
+    n_points = len(curve["threshold"])
+    for i in np.unique(np.linspace(0, n_points - 1, min(steps, n_points)).round().astype(int)):
+        print(
+            f"{curve['threshold'][i]:10.4f} {curve['coverage'][i]:9.3f} "
+            f"{curve['accuracy'][i]:9.3f} {curve['covered'][i]:8d}"
+        )
+    coverage, accuracy = _at(curve, threshold)
+    print(f"\n[INFO] Current threshold {threshold:.4f}: coverage {coverage:.3f}, accuracy {accuracy:.3f}")
+
+    result = {
+        "files": int(len(correct)),
+        "metric": knn_wrapper.metric,
+        "target_accuracy": target_accuracy,
+        "current": {"threshold": threshold, "coverage": coverage, "accuracy": accuracy},
+        "recommended": None,
+        "curve": {name: values.tolist() for name, values in curve.items()},
+    }
+    if best is None:
+        print(f"[WARN] No threshold reaches {target_accuracy:.0%} accuracy; add labelled examples or lower the target.")
+    else:
+        result["recommended"] = {
+            "threshold": float(curve["threshold"][best]),
+            "coverage": float(curve["coverage"][best]),
+            "accuracy": float(curve["accuracy"][best]),
+        }
+        print(
+            f"[INFO] Recommended --threshold {curve['threshold'][best]:.4f}: coverage {curve['coverage'][best]:.3f}, "
+            f"accuracy {curve['accuracy'][best]:.3f} (target {target_accuracy:.3f})"
+        )
+    if json_path is not None:
+        Path(json_path).write_text(json.dumps(result, indent=2), encoding="utf-8")
+        print(f"[INFO] Curve written to {json_path}")
+    return result
@@ -2,20 +2,166 @@ import argparse
 from pathlib import Path
 import sys
 
-from .config import DEFAULT_SOURCE, DEFAULT_DEST, DEFAULT_THRESHOLD
-from .organiser import run_organiser
+from . import __version__
+from .config import (
+    DEFAULT_SOURCE,
+    DEFAULT_DEST,
+    DEFAULT_THRESHOLD,
+    DEFAULT_COSINE_THRESHOLD,
+    PREDICT_BATCH_SIZE,
+    CACHE_FILE,
+    EXTRACT_WORKERS,
+    EXTRACT_TIMEOUT,
+    INDEX_BACKEND,
+    IVF_N_PROBE,
+    EMBEDDING_METRIC,
+    INDEX_BACKEND_NAMES,
+    METRICS,
+    SYMLINK_POLICIES,
+    EMBEDDING_PRECISION,
+    EMBEDDING_PRECISIONS,
+    MOVE_WORKERS,
+    MOVE_JOURNAL_FILE,
+    WATCH_INTERVAL,
+    WATCH_DEBOUNCE,
+    SERVER_PORT,
+    SERVER_MAX_BATCH,
+    SERVER_MAX_WAIT_MS,
+    EXTRACT_TOKEN_BUDGET,
+    DUPLICATE_POLICIES,
+    STREAM_QUEUE_FILE,
+    SHARD_WORKERS,
+    DUPLICATES_LABEL,
+    NEAR_DUPLICATE_SIMILARITY,
+    CALIBRATION_TARGET_ACCURACY,
+    EMBEDDER_MODEL,
+    HASHING_EMBEDDER,
+    default_threshold,
+)
 
+# Keep this module's imports light: the organiser (and with it numpy, scikit-learn,
+# PyMuPDF and torch) is only imported once arguments are parsed and a run starts.
 
-def parse_args():
-    parser = argparse.ArgumentParser(
-        prog="knn-file-organiser",
-        description="Organise files into folders using a KNN classifier on semantic embeddings."
+
+def _add_model_args(parser: argparse.ArgumentParser) -> None:
+    """
+    Options that pick and load the model; shared by every command, including `serve`.
+    """
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=None,
+        help=(
+            "Distance threshold above which files are marked as uncategorised "
+            f"(default: {DEFAULT_THRESHOLD} euclidean, {DEFAULT_COSINE_THRESHOLD} cosine)"
+        )
+    )
+    parser.add_argument(
+        "--embedder",
+        default=EMBEDDER_MODEL,
+        metavar="MODEL",
+        help=(
+            f"Sentence-transformers model to embed with, or '{HASHING_EMBEDDER}' (or '{HASHING_EMBEDDER}:DIM') "
+            "for a fast character n-gram embedder that needs no torch or model download "
+            f"(default: {EMBEDDER_MODEL}). Changing it retrains the model."
+        )
+    )
+    parser.add_argument(
+        "--embed-threads",
+        type=int,
+        default=None,
+        help="CPU threads the embedder may use (default: all cores)"
+    )
+    parser.add_argument(
+        "--embed-batch-size",
+        type=int,
+        default=None,
+        help="Texts per embedder forward pass; takes precedence over --batch-size when embedding (default: --batch-size)"
+    )
+    parser.add_argument(
+        "--max-seq-length",
+        type=int,
+        default=None,
+        help="Truncate embedder inputs to this many tokens; shorter is faster (default: the model's)"
+    )
+    parser.add_argument(
+        "--device",
+        default=None,
+        help="Device for the sentence-transformers embedder, e.g. cpu, cuda or mps "
+             "(default: picked automatically, preferring a GPU)"
+    )
+    parser.add_argument(
+        "--metric",
+        choices=METRICS,
+        default=None,
+        help=(
+            "Distance metric; 'cosine' L2-normalises embeddings and uses a fast matrix-multiply search "
+            f"(default: the saved model's, else {EMBEDDING_METRIC}). Changing it retrains the model."
+        )
+    )
+    parser.add_argument(
+        "--retrain",
+        action="store_true",
+        help="Force re-training of the KNN model, even if a saved model exists."
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=PREDICT_BATCH_SIZE,
+        help=f"Number of files to embed and classify together (default: {PREDICT_BATCH_SIZE})"
+    )
+    parser.add_argument(
+        "--index",
+        choices=INDEX_BACKEND_NAMES,
+        default=None,
+        help=f"Neighbour index backend; 'ivf' is approximate and faster on large label sets (default: the saved model's, else {INDEX_BACKEND})"
+    )
+    parser.add_argument(
+        "--ivf-lists",
+        type=int,
+        default=None,
+        help="Number of IVF cells (default: about sqrt of the number of examples)"
+    )
+    parser.add_argument(
+        "--ivf-probe",
+        type=int,
+        default=None,
+        help=f"IVF cells searched per query; higher is slower but more accurate (default: {IVF_N_PROBE})"
     )
+    parser.add_argument(
+        "--precision",
+        choices=EMBEDDING_PRECISIONS,
+        default=None,
+        help=(
+            "Storage precision for the training matrix and embedding cache; int8 uses one scale per vector. "
+            "Every index searches the matrix at this precision, dequantising a block of rows at a time, "
+            "so memory use shrinks with it "
+            f"(default: the saved model's, else {EMBEDDING_PRECISION})"
+        )
+    )
+    parser.add_argument(
+        "--candidate-labels",
+        type=int,
+        default=None,
+        metavar="M",
+        help=(
+            "Two-stage search: score per-label centroids first, then search only the examples of the "
+            "M closest labels, skipping files that cannot be within --threshold of any label "
+            "(faster with many labels; approximate when M is smaller than the number of labels)"
+        )
+    )
+
+
+def _add_common_args(parser: argparse.ArgumentParser) -> None:
+    """
+    Options shared by a one-off run and `watch`.
+    """
     parser.add_argument(
         "--source",
         type=Path,
-        default=DEFAULT_SOURCE,
-        help=f"Directory to scan for files (default: {DEFAULT_SOURCE})"
+        action="append",
+        default=None,
+        help=f"Directory to scan for files; repeat to organise several (default: {DEFAULT_SOURCE})"
     )
     parser.add_argument(
         "--dest",
@@ -24,10 +170,35 @@ def parse_args():
         help=f"Destination root for organised files (default: {DEFAULT_DEST})"
     )
     parser.add_argument(
-        "--threshold",
-        type=float,
-        default=DEFAULT_THRESHOLD,
-        help=f"Distance threshold above which files are marked as uncategorised (default: {DEFAULT_THRESHOLD})"
+        "--include",
+        action="append",
+        metavar="GLOB",
+        help="Only organise files matching this glob (relative path or name); may be repeated."
+    )
+    parser.add_argument(
+        "--exclude",
+        action="append",
+        metavar="GLOB",
+        help="Skip files and directories matching this glob; may be repeated."
+    )
+    parser.add_argument(
+        "--ext",
+        action="append",
+        dest="extensions",
+        metavar="EXT",
+        help="Only organise files with this extension (e.g. pdf); may be repeated."
+    )
+    parser.add_argument(
+        "--max-depth",
+        type=int,
+        default=None,
+        help="Maximum directory depth below --source to scan (default: unlimited)"
+    )
+    parser.add_argument(
+        "--symlinks",
+        choices=SYMLINK_POLICIES,
+        default="files",
+        help="Symlink policy: 'files' includes linked files only, 'follow' also enters linked directories, 'skip' ignores links (default: files)"
     )
     parser.add_argument(
         "--dry-run",
@@ -35,37 +206,479 @@ def parse_args():
         help="Perform a dry run: show where files would be placed without actually moving them."
     )
     parser.add_argument(
-        "--retrain",
+        "--no-cache",
         action="store_true",
-        help="Force re-training of the KNN model, even if a saved model exists."
+        help="Do not read or write the per-file embedding cache."
+    )
+    parser.add_argument(
+        "--cache-path",
+        type=Path,
+        default=Path(CACHE_FILE),
+        help=f"Location of the per-file embedding cache (default: {CACHE_FILE})"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Worker processes for PDF and Word text extraction; 0 extracts inline "
+             f"(default: {EXTRACT_WORKERS}, or 0 per shard worker when sharding)"
+    )
+    parser.add_argument(
+        "--extract-timeout",
+        type=float,
+        default=EXTRACT_TIMEOUT,
+        help=f"Seconds to wait for one file's text before falling back to its filename (default: {EXTRACT_TIMEOUT})"
+    )
+    parser.add_argument(
+        "--token-budget",
+        type=int,
+        default=EXTRACT_TOKEN_BUDGET,
+        help="Embedder tokens of content to extract per file; reading stops once this much text "
+             f"is collected (default: {EXTRACT_TOKEN_BUDGET})"
+    )
+    parser.add_argument(
+        "--move-workers",
+        type=int,
+        default=MOVE_WORKERS,
+        help=f"Threads used to move files; 0 moves inline (default: {MOVE_WORKERS})"
+    )
+    parser.add_argument(
+        "--journal",
+        type=Path,
+        default=Path(MOVE_JOURNAL_FILE),
+        help=f"Append-only journal of file moves, used to recover and undo runs (default: {MOVE_JOURNAL_FILE})"
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="",
+        default=None,
+        metavar="REPORT.json",
+        help="Print per-stage timings, latency percentiles, counters and peak memory at the end; "
+             "with a path, also write them there as JSON."
+    )
+    _add_model_args(parser)
+
+
+def _set_sources(args: argparse.Namespace) -> None:
+    """
+    `--source` may be repeated: `args.sources` lists the roots, `args.source` is the first.
+    """
+    args.sources = args.source or [Path(DEFAULT_SOURCE)]
+    args.source = args.sources[0]
+
+
+def parse_args(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if argv[:1] == ["watch"]:
+        parser = argparse.ArgumentParser(
+            prog="knn-file-organiser watch",
+            description=(
+                "Keep the model loaded and organise files as they appear in --source. "
+                "Files the model is unsure about are left in place for a normal run to label."
+            )
+        )
+        _add_common_args(parser)
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=WATCH_INTERVAL,
+            help=f"Seconds between scans of --source (default: {WATCH_INTERVAL})"
+        )
+        parser.add_argument(
+            "--debounce",
+            type=float,
+            default=WATCH_DEBOUNCE,
+            help=f"Seconds a new file must stay unchanged before it is classified (default: {WATCH_DEBOUNCE})"
+        )
+        args = parser.parse_args(argv[1:])
+        _set_sources(args)
+        if len(args.sources) > 1:
+            parser.error("watch takes a single --source.")
+        args.command, args.undo = "watch", None
+        return args
+
+    if argv[:1] == ["serve"]:
+        parser = argparse.ArgumentParser(
+            prog="knn-file-organiser serve",
+            description=(
+                "Load the model once and answer classify / nearest-example requests over "
+                "localhost HTTP or a Unix socket, batching concurrent requests."
+            )
+        )
+        _add_model_args(parser)
+        parser.add_argument(
+            "--host",
+            default="127.0.0.1",
+            help="Address to listen on (default: 127.0.0.1)"
+        )
+        parser.add_argument(
+            "--port",
+            type=int,
+            default=SERVER_PORT,
+            help=f"TCP port to listen on (default: {SERVER_PORT})"
+        )
+        parser.add_argument(
+            "--socket",
+            type=Path,
+            default=None,
+            help="Listen on this Unix socket instead of TCP."
+        )
+        parser.add_argument(
+            "--max-batch",
+            type=int,
+            default=SERVER_MAX_BATCH,
+            help=f"Most texts embedded together in one batch (default: {SERVER_MAX_BATCH})"
+        )
+        parser.add_argument(
+            "--max-wait-ms",
+            type=float,
+            default=SERVER_MAX_WAIT_MS,
+            help=f"How long the first request of a batch waits for others to join it (default: {SERVER_MAX_WAIT_MS})"
+        )
+        args = parser.parse_args(argv[1:])
+        args.command, args.undo = "serve", None
+        return args
+
+    if argv[:1] == ["calibrate"]:
+        parser = argparse.ArgumentParser(
+            prog="knn-file-organiser calibrate",
+            description=(
+                "Measure coverage and accuracy at every distance threshold on labelled data "
+                "and recommend a --threshold. The data is an organised tree (--source, one "
+                "folder per label), or else the model's own examples, left out one at a time."
+            )
+        )
+        _add_model_args(parser)
+        parser.add_argument(
+            "--source",
+            type=Path,
+            default=None,
+            help="Organised tree whose top-level folders are the labels of the files in them "
+                 "(default: calibrate on the training examples)"
+        )
+        parser.add_argument(
+            "--target-accuracy",
+            type=float,
+            default=CALIBRATION_TARGET_ACCURACY,
+            help=f"Accuracy the recommended threshold must keep (default: {CALIBRATION_TARGET_ACCURACY})"
+        )
+        parser.add_argument(
+            "--json",
+            type=Path,
+            default=None,
+            metavar="FILE",
+            help="Also write the full coverage-vs-accuracy curve to FILE."
+        )
+        parser.add_argument(
+            "--no-cache",
+            action="store_true",
+            help="Do not read or write the per-file embedding cache."
+        )
+        parser.add_argument(
+            "--cache-path",
+            type=Path,
+            default=Path(CACHE_FILE),
+            help=f"Location of the per-file embedding cache (default: {CACHE_FILE})"
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=EXTRACT_WORKERS,
+            help=f"Worker processes for PDF and Word text extraction; 0 extracts inline (default: {EXTRACT_WORKERS})"
+        )
+        parser.add_argument(
+            "--extract-timeout",
+            type=float,
+            default=EXTRACT_TIMEOUT,
+            help=f"Seconds to wait for one file's text before falling back to its filename (default: {EXTRACT_TIMEOUT})"
+        )
+        parser.add_argument(
+            "--token-budget",
+            type=int,
+            default=EXTRACT_TOKEN_BUDGET,
+            help=f"Embedder tokens of content to extract per file (default: {EXTRACT_TOKEN_BUDGET})"
+        )
+        args = parser.parse_args(argv[1:])
+        args.command, args.undo = "calibrate", None
+        return args
+
+    parser = argparse.ArgumentParser(
+        prog="knn-file-organiser",
+        description="Organise files into folders using a KNN classifier on semantic embeddings.",
+        epilog=(
+            "Run 'knn-file-organiser watch --help' for the long-running watch mode, "
+            "'knn-file-organiser serve --help' for the local classification server, and "
+            "'knn-file-organiser calibrate --help' to tune --threshold on labelled files."
+        )
+    )
+    _add_common_args(parser)
+    parser.add_argument(
+        "--undo",
+        nargs="?",
+        const="last",
+        default=None,
+        metavar="RUN_ID",
+        help="Move the files of a run back where they came from (default: the most recent run), then exit."
+    )
+    parser.add_argument(
+        "--import-labels",
+        type=Path,
+        default=None,
+        metavar="FILE",
+        help="Add the labelled examples of a labels.json-format file to labels.json, then exit."
+    )
+    parser.add_argument(
+        "--export-labels",
+        type=Path,
+        default=None,
+        metavar="FILE",
+        help="Write all labelled examples to FILE in the labels.json format, then exit."
+    )
+    parser.add_argument(
+        "--group-labels",
+        action="store_true",
+        help="When labelling files the model is unsure about, group similar files and ask once per group."
+    )
+    parser.add_argument(
+        "--duplicates",
+        choices=DUPLICATE_POLICIES,
+        default="off",
+        help="Detect files with identical content and classify each only once; duplicates are then "
+             "left in place (skip), moved next to their original and hard-linked to it (link), "
+             f"or moved to {DUPLICATES_LABEL}/ (move). Default: off"
+    )
+    parser.add_argument(
+        "--near-duplicates",
+        nargs="?",
+        type=float,
+        const=NEAR_DUPLICATE_SIMILARITY,
+        default=None,
+        metavar="SIMILARITY",
+        help="With --duplicates, also treat files whose embeddings have at least this cosine "
+             f"similarity as duplicates (default: {NEAR_DUPLICATE_SIMILARITY})"
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Keep memory bounded on very large trees: move confident files as they are classified and "
+             f"keep files waiting for a label in an on-disk queue ({STREAM_QUEUE_FILE}), from which an "
+             "interrupted run resumes. Cannot be combined with --duplicates."
+    )
+    parser.add_argument(
+        "--shard-workers",
+        type=int,
+        default=None,
+        metavar="N",
+        help="Classify the --source roots (or the top-level folders of a single root) in N processes "
+             "sharing one model, with the embedder's threads divided between them; also used when "
+             f"several --source roots are given (default then: {SHARD_WORKERS}). --workers then applies per shard worker."
     )
     parser.add_argument(
         "--version",
         action="version",
-        version="knn-file-organiser 0.1.0"
+        version=f"knn-file-organiser {__version__}"
+    )
+    args = parser.parse_args(argv)
+    _set_sources(args)
+    args.sharded = len(args.sources) > 1 or args.shard_workers is not None
+    if args.shard_workers is not None and args.shard_workers < 1:
+        parser.error("--shard-workers must be at least 1.")
+    if args.sharded and (args.stream or args.duplicates != "off"):
+        parser.error("Several --source roots or --shard-workers cannot be combined with --stream or --duplicates.")
+    if args.near_duplicates is not None and args.duplicates == "off":
+        parser.error("--near-duplicates needs a --duplicates policy.")
+    if args.stream and args.duplicates != "off":
+        parser.error("--stream cannot be combined with --duplicates.")
+    args.command = "run"
+    return args
+
+
+def _run_options(args: argparse.Namespace, **settings):
+    """
+    RunOptions from the model options every command takes, plus the command's own
+    `settings`.
+    """
+    from .organiser import RunOptions
+
+    return RunOptions(
+        model_name=args.embedder,
+        metric=args.metric,
+        precision=args.precision,
+        candidate_labels=args.candidate_labels,
+        retrain=args.retrain,
+        threshold=args.threshold,
+        batch_size=args.batch_size,
+        **settings,
     )
-    return parser.parse_args()
 
 
 def main():
     args = parse_args()
 
-    source = args.source.expanduser().resolve()
-    dest = args.dest.expanduser().resolve()
+    if args.undo is not None:
+        from .mover import MoveJournal, undo_run
+
+        try:
+            stats = undo_run(
+                MoveJournal(args.journal),
+                run_id=None if args.undo == "last" else args.undo,
+                workers=args.move_workers,
+            )
+        except ValueError as e:
+            print(f"[ERROR] {e}")
+            sys.exit(1)
+        sys.exit(1 if stats["failed"] else 0)
+
+    if args.command == "run" and (args.import_labels or args.export_labels):
+        from .label_store import LabelStore
+
+        store = LabelStore()
+        if args.import_labels:
+            if not args.import_labels.exists():
+                print(f"[ERROR] {args.import_labels} does not exist.")
+                sys.exit(1)
+            added = store.import_json(args.import_labels)
+            store.close()
+            print(f"[INFO] Imported {added} new labelled example(s) from {args.import_labels}.")
+        if args.export_labels:
+            store.export_json(args.export_labels)
+            print(f"[INFO] Exported {len(store.examples)} labelled example(s) to {args.export_labels}.")
+        sys.exit(0)
 
-    if not source.exists() or not source.is_dir():
-        print(f"[ERROR] Source directory does not exist: {source}")
+    index_params = {}
+    if args.ivf_lists is not None:
+        index_params["n_lists"] = args.ivf_lists
+    if args.ivf_probe is not None:
+        index_params["n_probe"] = args.ivf_probe
+    if index_params and args.index == "exact":
+        print("[ERROR] --ivf-lists/--ivf-probe only apply to --index ivf")
         sys.exit(1)
+    index = args.index or ("ivf" if index_params else None)
+    embedder_options = dict(
+        threads=args.embed_threads,
+        batch_size=args.embed_batch_size,
+        max_seq_length=args.max_seq_length,
+        device=args.device,
+    )
+
+    model_options = dict(index=index, index_params=index_params, embedder_options=embedder_options)
+
+    if args.command == "serve":
+        from .organiser import prepare_model
+        from .server import serve
+
+        knn_wrapper = _run_options(args, **model_options).make_model()
+        prepare_model(knn_wrapper, retrain=args.retrain)
+        threshold = args.threshold
+        if threshold is None:
+            threshold = default_threshold(knn_wrapper.metric)
+        try:
+            serve(
+                knn_wrapper,
+                threshold,
+                host=args.host,
+                port=args.port,
+                socket_path=args.socket,
+                max_batch=args.max_batch,
+                max_wait_ms=args.max_wait_ms,
+            )
+        except FileExistsError as e:
+            print(f"[ERROR] {e}")
+            sys.exit(1)
+        return
+
+    if args.command == "calibrate":
+        from .calibrate import run_calibration
+
+        source = args.source.expanduser().resolve() if args.source is not None else None
+        if source is not None and not source.is_dir():
+            print(f"[ERROR] Source directory does not exist: {source}")
+            sys.exit(1)
+        try:
+            options = _run_options(
+                args,
+                use_cache=not args.no_cache,
+                cache_path=args.cache_path,
+                workers=args.workers,
+                extract_timeout=args.extract_timeout,
+                token_budget=args.token_budget,
+                **model_options,
+            )
+            run_calibration(source=source, options=options, target_accuracy=args.target_accuracy, json_path=args.json)
+        except ValueError as e:
+            print(f"[ERROR] {e}")
+            sys.exit(1)
+        return
+
+    from .organiser import run_organiser, watch_organiser
+
+    sources = [s.expanduser().resolve() for s in args.sources]
+    source = sources[0]
+    dest = args.dest.expanduser().resolve()
+
+    for root in sources:
+        if not root.exists() or not root.is_dir():
+            print(f"[ERROR] Source directory does not exist: {root}")
+            sys.exit(1)
 
     dest.mkdir(parents=True, exist_ok=True)
 
-    run_organiser(
-        source=source,
-        dest=dest,
-        threshold=args.threshold,
+    options = _run_options(
+        args,
         dry_run=args.dry_run,
-        retrain=args.retrain,
+        use_cache=not args.no_cache,
+        cache_path=args.cache_path,
+        workers=EXTRACT_WORKERS if args.workers is None else args.workers,
+        extract_timeout=args.extract_timeout,
+        include=args.include,
+        exclude=args.exclude,
+        extensions=args.extensions,
+        max_depth=args.max_depth,
+        symlinks=args.symlinks,
+        move_workers=args.move_workers,
+        journal_path=args.journal,
+        token_budget=args.token_budget,
+        **model_options,
     )
+    if args.profile is not None:
+        from . import profiling
+
+        profiler = profiling.enable()
+    try:
+        if args.command == "watch":
+            watch_organiser(source, dest, options, interval=args.interval, debounce=args.debounce)
+        elif args.sharded:
+            from dataclasses import replace
+
+            from .shards import run_sharded
+
+            # The shard workers are the parallelism; each extracts inline unless asked otherwise
+            run_sharded(
+                sources,
+                dest,
+                replace(options, workers=args.workers or 0),
+                shard_workers=args.shard_workers or SHARD_WORKERS,
+                group_labels=args.group_labels,
+            )
+        else:
+            run_organiser(
+                source,
+                dest,
+                options,
+                duplicates=args.duplicates,
+                near_duplicates=args.near_duplicates,
+                group_labels=args.group_labels,
+                stream=args.stream,
+            )
+    finally:
+        if args.profile is not None:
+            report = profiler.report()
+            profiling.disable()
+            profiling.print_report(report)
+            if args.profile:
+                profiling.write_report(report, Path(args.profile))
+                print(f"[PROFILE] Report written to {args.profile}")
 
 
 if __name__ == "__main__":
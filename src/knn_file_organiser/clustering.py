@@ -0,0 +1,135 @@
+from typing import List, Tuple
+
+import numpy as np
+
+from .config import LABEL_GROUP_MAX_CENTROIDS, LABEL_GROUP_SHOWN, QUANT_BLOCK_ROWS
+from .quantise import iter_blocks
+
+# Grouping of low-confidence files for bulk labelling. Files are clustered on the
+# embeddings computed while classifying them, in the model's distance space, with the
+# confidence threshold as the cut-off: two groups are merged while the average distance
+# between their members is within it. Average-linkage clustering costs O(m^2) memory and
+# O(m^3) time in the worst case, so it runs directly on at most LABEL_GROUP_MAX_CENTROIDS
+# files; larger sets are first summarised by mini-batch k-means into that many weighted
+# centroids, which are then clustered instead.
+
+
+def pairwise_distances(a: np.ndarray, b: np.ndarray, metric: str = "euclidean") -> np.ndarray:
+    """
+    (len(a), len(b)) euclidean or cosine distances.
+    """
+    if metric == "cosine":
+        a = a / np.maximum(np.linalg.norm(a, axis=1, keepdims=True), 1e-12)
+        b = b / np.maximum(np.linalg.norm(b, axis=1, keepdims=True), 1e-12)
+        return np.maximum(1.0 - a @ b.T, 0.0)
+    sq = (a * a).sum(axis=1)[:, None] - 2.0 * (a @ b.T) + (b * b).sum(axis=1)[None, :]
+    return np.sqrt(np.maximum(sq, 0.0))
+
+
+def _kmeans_plus_plus(points: np.ndarray, k: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    k-means++ seeding: each further centre is drawn with probability proportional to its
+    squared distance from the centres chosen so far, so small clusters still get one.
+    """
+    chosen = [int(rng.integers(len(points)))]
+    closest = pairwise_distances(points, points[chosen])[:, 0] ** 2
+    for _ in range(1, k):
+        total = closest.sum()
+        if total <= 0:
+            break
+        chosen.append(int(rng.choice(len(points), p=closest / total)))
+        closest = np.minimum(closest, pairwise_distances(points, points[chosen[-1:]])[:, 0] ** 2)
+    return points[chosen].copy()
+
+
+def minibatch_kmeans(
+    vecs: np.ndarray, n_clusters: int, batch_size: int = 1024, n_iter: int = 100, seed: int = 0
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Mini-batch k-means (Sculley, 2010): each iteration moves every centre towards the mean
+    of the sampled points assigned to it, at a rate that decays with the number of points
+    the centre has absorbed. Centres are seeded by k-means++ on a sample of
+    `batch_size` rows. Returns (centroids, assignment of every row), with empty clusters
+    dropped.
+    """
+    rng = np.random.default_rng(seed)
+    n = len(vecs)
+    sample = vecs[rng.choice(n, min(max(batch_size, n_clusters), n), replace=False)]
+    centroids = _kmeans_plus_plus(np.asarray(sample, dtype=np.float32), min(n_clusters, n), rng)
+    seen = np.zeros(len(centroids))
+    for _ in range(n_iter):
+        batch = vecs[rng.integers(0, n, size=min(batch_size, n))]
+        assign = pairwise_distances(batch, centroids).argmin(axis=1)
+        counts = np.bincount(assign, minlength=len(centroids))
+        # Per-centre sums of the batch as one (k, b) @ (b, dim) product
+        members = np.zeros((len(centroids), len(batch)), dtype=np.float32)
+        members[assign, np.arange(len(batch))] = 1.0
+        sums = members @ batch
+        hit = counts > 0
+        seen[hit] += counts[hit]
+        rate = (counts[hit] / seen[hit])[:, None].astype(np.float32)
+        centroids[hit] = (1.0 - rate) * centroids[hit] + rate * sums[hit] / counts[hit, None]
+
+    assign = np.concatenate([
+        pairwise_distances(block, centroids).argmin(axis=1)
+        for _, block in iter_blocks(vecs, block_rows=QUANT_BLOCK_ROWS)
+    ])
+    used, assign = np.unique(assign, return_inverse=True)
+    return centroids[used], assign
+
+
+def agglomerate(points: np.ndarray, weights: np.ndarray, max_distance: float, metric: str = "euclidean") -> np.ndarray:
+    """
+    Weighted average-linkage clustering of `points`, merging the closest pair of groups
+    while their distance is at most `max_distance`. Distances between merged groups are
+    updated with the Lance-Williams formula, so each merge costs O(m). Returns the group
+    of each point, numbered from 0.
+    """
+    m = len(points)
+    dist = pairwise_distances(points, points, metric).astype(np.float64)
+    np.fill_diagonal(dist, np.inf)
+    weights = np.asarray(weights, dtype=np.float64).copy()
+    group = np.arange(m)
+    for _ in range(m - 1):
+        i, j = np.unravel_index(np.argmin(dist), dist.shape)
+        if dist[i, j] > max_distance:
+            break
+        merged = (weights[i] * dist[i] + weights[j] * dist[j]) / (weights[i] + weights[j])
+        dist[i], dist[:, i] = merged, merged
+        dist[i, i] = np.inf
+        dist[j], dist[:, j] = np.inf, np.inf
+        weights[i] += weights[j]
+        group[group == j] = i
+    return np.unique(group, return_inverse=True)[1]
+
+
+def cluster_embeddings(
+    vecs: np.ndarray,
+    max_distance: float,
+    metric: str = "euclidean",
+    max_centroids: int = LABEL_GROUP_MAX_CENTROIDS,
+    seed: int = 0,
+) -> List[np.ndarray]:
+    """
+    Group the rows of `vecs` (see above). Returns the row indices of each group, largest
+    group first.
+    """
+    vecs = np.asarray(vecs, dtype=np.float32)
+    if len(vecs) <= max_centroids:
+        assign = agglomerate(vecs, np.ones(len(vecs)), max_distance, metric)
+    else:
+        centroids, micro = minibatch_kmeans(vecs, max_centroids, seed=seed)
+        weights = np.bincount(micro, minlength=len(centroids))
+        assign = agglomerate(centroids, weights, max_distance, metric)[micro]
+    order = np.argsort(assign, kind="stable")
+    groups = np.split(order, np.flatnonzero(np.diff(assign[order])) + 1)
+    return sorted(groups, key=len, reverse=True)
+
+
+def representatives(vecs: np.ndarray, rows: np.ndarray, n: int = LABEL_GROUP_SHOWN, metric: str = "euclidean") -> np.ndarray:
+    """
+    The `n` rows of a group closest to its mean, closest first.
+    """
+    members = np.asarray(vecs[rows], dtype=np.float32)
+    distances = pairwise_distances(members, members.mean(axis=0, keepdims=True), metric)[:, 0]
+    return rows[np.argsort(distances, kind="stable")[:n]]
@@ -1,10 +1,19 @@
+import os
 from pathlib import Path
 
 # Filenames for persisted data
 LABELS_FILE = "labels.json"
 TRAINING_LABELS_FILE = "training_labels.json"
+# Labels added since labels.json was last rewritten, one JSON record per line; folded
+# into labels.json after LABELS_COMPACT_EVERY labels and at the end of a run
+LABELS_LOG_FILE = "labels.log.jsonl"
+LABELS_COMPACT_EVERY = 256
+MODEL_ARTIFACT_FILE = "knn_model.kfo"
+# Legacy model files (read if no artifact exists; no longer written)
 MODEL_FILE = "knn_model.joblib"
 EMBEDDINGS_FILE = "embeddings.npy"
+METADATA_FILE = "model_metadata.json"
+CACHE_FILE = "embedding_cache.sqlite"
 
 # Special label for uncategorised files
 UNCATEGORISED_LABEL = "Uncategorised"
@@ -13,6 +22,119 @@ UNCATEGORISED_LABEL = "Uncategorised"
 DEFAULT_SOURCE = Path.home() / "Downloads"
 DEFAULT_DEST = Path.cwd() / "Organised"
 DEFAULT_THRESHOLD = 0.7  # If mean neighbour distance > threshold, mark as "Uncategorised"
+# Same cut-off in cosine-distance space (for unit vectors, cosine = euclidean^2 / 2)
+DEFAULT_COSINE_THRESHOLD = 0.245
+
+
+def default_threshold(metric: str) -> float:
+    """
+    The default distance threshold for a model using `metric`.
+    """
+    return DEFAULT_COSINE_THRESHOLD if metric == "cosine" else DEFAULT_THRESHOLD
+
+
+# `calibrate` recommends the threshold that classifies the most files while keeping
+# accuracy on labelled data at least this high
+CALIBRATION_TARGET_ACCURACY = 0.95
+
+# Embedder (see embedders.py): a sentence-transformers model name, or HASHING_EMBEDDER
+# ("hashing", or "hashing:<dim>") for the torch-free character n-gram embedder, which
+# hashes HASHING_NGRAM_RANGE n-grams into HASHING_DIM dimensions
+EMBEDDER_MODEL = "all-MiniLM-L6-v2"
+HASHING_EMBEDDER = "hashing"
+HASHING_DIM = 1024
+HASHING_NGRAM_RANGE = (2, 4)
+# Encoding scheduler (see embedders.encode_scheduled): texts are embedded in batches of
+# similar length holding at most ENCODE_MAX_BATCH texts and ENCODE_BATCH_TOKENS tokens
+# (counting padding)
+ENCODE_MAX_BATCH = 128
+ENCODE_BATCH_TOKENS = 4096
 
 # KNN hyperparameters
 KNN_NEIGHBORS = 3
+
+# Neighbour index backend: "exact" (blocked brute force over the stored matrix) or "ivf"
+# (approximate, pure NumPy); "dot" is the same search as "exact", the default for cosine
+# models. IVF_N_PROBE is how many of the closest cells each query searches.
+INDEX_BACKEND = "exact"
+INDEX_BACKEND_NAMES = ("dot", "exact", "ivf")
+IVF_N_PROBE = 8
+
+# Distance metric: "euclidean" on raw embeddings, or "cosine" on L2-normalised ones
+# (uses DEFAULT_COSINE_THRESHOLD; see the `calibrate` subcommand for tuning either)
+EMBEDDING_METRIC = "euclidean"
+METRICS = ("euclidean", "cosine")
+
+# Storage precision of the stored training matrix and cached per-file embeddings:
+# "float32", "float16", or "int8" (with one float32 scale per vector).
+# Quantised matrices are dequantised QUANT_BLOCK_ROWS rows at a time during search.
+EMBEDDING_PRECISION = "float32"
+EMBEDDING_PRECISIONS = ("float32", "float16", "int8")
+QUANT_BLOCK_ROWS = 16384
+
+# Number of files extracted, embedded and searched together in one batch
+PREDICT_BATCH_SIZE = 64
+
+# Per-file embedding cache: maximum number of entries kept before LRU eviction, and how
+# many seconds a process waits for another one (e.g. a shard worker) holding the write lock
+CACHE_MAX_ENTRIES = 200_000
+CACHE_BUSY_TIMEOUT = 30.0
+
+# How the directory scan treats symlinks (see io_utils.iter_files)
+SYMLINK_POLICIES = ("files", "follow", "skip")
+
+# Parallel text extraction: worker processes for PDF parsing (0 = extract inline)
+# and the per-file timeout after which the filename is used instead
+EXTRACT_WORKERS = min(4, os.cpu_count() or 1)
+EXTRACT_TIMEOUT = 30.0
+
+# Content extraction budget (see extractors.py): extractors stop reading once they have
+# about EXTRACT_TOKEN_BUDGET embedder tokens of text (at CHARS_PER_TOKEN characters per
+# token), since all-MiniLM-L6-v2 truncates its input at 256 tokens anyway.
+# PDFs are read for at most EXTRACT_MAX_PAGES pages.
+EXTRACT_TOKEN_BUDGET = 256
+CHARS_PER_TOKEN = 4
+EXTRACT_MAX_PAGES = 3
+
+# Grouped labelling (see clustering.py): low-confidence files are clustered directly
+# when there are at most LABEL_GROUP_MAX_CENTROIDS of them (k-means summarises larger
+# sets into that many centroids first); each prompt shows LABEL_GROUP_SHOWN filenames
+LABEL_GROUP_MAX_CENTROIDS = 256
+LABEL_GROUP_SHOWN = 5
+
+# File moves: threads used to move files (moves are I/O bound, so this can exceed the
+# CPU count) and the append-only journal of moves used to recover and undo runs
+MOVE_WORKERS = 8
+MOVE_JOURNAL_FILE = "move_journal.jsonl"
+
+# Streaming runs (--stream): files waiting for a label are kept in STREAM_QUEUE_FILE
+# (which is also the checkpoint an interrupted run resumes from) and read back
+# STREAM_PAGE_ROWS at a time; at most STREAM_MAX_PENDING_MOVES moves are queued at once
+STREAM_QUEUE_FILE = "label_queue.sqlite"
+STREAM_PAGE_ROWS = 1024
+STREAM_MAX_PENDING_MOVES = 1024
+
+# Sharded runs (several --source roots, or --shard-workers): processes that classify
+# shards of the source trees in parallel, sharing one model
+SHARD_WORKERS = os.cpu_count() or 1
+
+# Watch mode: seconds between scans of the source directory, and how long a new or
+# changed file's size/mtime must stay unchanged before it is classified
+WATCH_INTERVAL = 0.25
+WATCH_DEBOUNCE = 0.5
+
+# Classification server: default TCP port, and how requests are coalesced into batches
+# (at most SERVER_MAX_BATCH texts, waiting at most SERVER_MAX_WAIT_MS for more to arrive)
+SERVER_PORT = 8765
+SERVER_MAX_BATCH = 64
+SERVER_MAX_WAIT_MS = 5.0
+
+# Duplicate detection (see dedup.py): what happens to a file whose content is identical
+# (or, with --near-duplicates, whose embedding is within NEAR_DUPLICATE_SIMILARITY cosine
+# similarity) to one seen earlier in the run. Same-size files are compared by a hash of
+# their first DEDUP_PARTIAL_BYTES, then by a full hash read DEDUP_CHUNK_BYTES at a time.
+DUPLICATE_POLICIES = ("off", "skip", "link", "move")
+DUPLICATES_LABEL = "Duplicates"
+NEAR_DUPLICATE_SIMILARITY = 0.98
+DEDUP_PARTIAL_BYTES = 64 * 1024
+DEDUP_CHUNK_BYTES = 1024 * 1024
@@ -0,0 +1,177 @@
+import hashlib
+import os
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from . import profiling
+from .config import DEDUP_CHUNK_BYTES, DEDUP_PARTIAL_BYTES, NEAR_DUPLICATE_SIMILARITY, QUANT_BLOCK_ROWS
+from .quantise import iter_blocks
+
+
+def file_digest(file_path: Path, limit: Optional[int] = None, chunk_bytes: int = DEDUP_CHUNK_BYTES) -> bytes:
+    """
+    BLAKE2b digest of the first `limit` bytes of `file_path` (the whole file if None),
+    read `chunk_bytes` at a time.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    remaining = limit
+    with open(file_path, "rb") as f:
+        while remaining is None or remaining > 0:
+            chunk = f.read(chunk_bytes if remaining is None else min(chunk_bytes, remaining))
+            if not chunk:
+                break
+            digest.update(chunk)
+            profiling.count("dedup_bytes_hashed", len(chunk))
+            if remaining is not None:
+                remaining -= len(chunk)
+    return digest.digest()
+
+
+class DuplicateFinder:
+    """
+    Streaming exact-duplicate detection for the directory scan.
+    A file is only hashed when an earlier file has the same size; candidates are then
+    compared by a hash of their first `partial_bytes`, and only files that still match
+    are hashed in full. Digests are computed at most once per file. The first file seen
+    with given content is its original; empty files are never treated as duplicates.
+    """
+
+    def __init__(self, partial_bytes: int = DEDUP_PARTIAL_BYTES, chunk_bytes: int = DEDUP_CHUNK_BYTES):
+        self.partial_bytes = partial_bytes
+        self.chunk_bytes = chunk_bytes
+        self.duplicates: List[Tuple[Path, Path]] = []
+        self._by_size: Dict[int, List[Path]] = defaultdict(list)
+        self._partial: Dict[Path, bytes] = {}
+        self._full: Dict[Path, bytes] = {}
+
+    def _digest(self, file_path: Path, full: bool) -> bytes:
+        memo = self._full if full else self._partial
+        if file_path not in memo:
+            limit = None if full else self.partial_bytes
+            memo[file_path] = file_digest(file_path, limit, self.chunk_bytes)
+        return memo[file_path]
+
+    def original_of(self, file_path: Path) -> Optional[Path]:
+        """
+        The earlier file with the same content as `file_path`, or None if it is the first
+        (in which case it becomes the original for later copies).
+        """
+        try:
+            size = os.stat(file_path).st_size
+        except OSError:
+            return None
+        if size == 0:
+            return None
+        candidates = self._by_size[size]
+        try:
+            for candidate in candidates:
+                if self._digest(candidate, full=False) != self._digest(file_path, full=False):
+                    continue
+                if size <= self.partial_bytes or self._digest(candidate, full=True) == self._digest(file_path, full=True):
+                    return candidate
+        except OSError:
+            # Unreadable (or vanished) files are left to the rest of the run to report
+            return None
+        candidates.append(file_path)
+        return None
+
+    def filter(self, files: Iterable[Path]) -> Iterator[Path]:
+        """
+        Pass through the originals among `files`; duplicates are collected in
+        `self.duplicates` as (duplicate, original) pairs instead.
+        """
+        for file_path in files:
+            with profiling.stage("dedup"):
+                original = self.original_of(file_path)
+            if original is None:
+                yield file_path
+            else:
+                profiling.count("duplicates")
+                self.duplicates.append((file_path, original))
+
+
+class NearDuplicateIndex:
+    """
+    Incremental near-duplicate search over the embeddings computed for classification.
+    Vectors are L2-normalised, so cosine similarity is a dot product; each new file is
+    compared with the originals seen so far in blocks of `block_rows` rows (and with the
+    earlier files of its own batch). A file at least `similarity` close to an original is
+    its near duplicate; otherwise it becomes an original itself.
+    """
+
+    def __init__(self, similarity: float = NEAR_DUPLICATE_SIMILARITY, block_rows: int = QUANT_BLOCK_ROWS):
+        self.similarity = similarity
+        self.block_rows = block_rows
+        self._matrix: Optional[np.ndarray] = None
+        self._n = 0
+        self._paths: List[Path] = []
+
+    def _append(self, vecs: np.ndarray, paths: Sequence[Path]) -> None:
+        if self._matrix is None:
+            self._matrix = np.empty((max(len(vecs), 64), vecs.shape[1]), dtype=np.float32)
+        elif self._n + len(vecs) > len(self._matrix):
+            grown = np.empty((max(2 * len(self._matrix), self._n + len(vecs)), vecs.shape[1]), dtype=np.float32)
+            grown[:self._n] = self._matrix[:self._n]
+            self._matrix = grown
+        self._matrix[self._n:self._n + len(vecs)] = vecs
+        self._n += len(vecs)
+        self._paths.extend(paths)
+
+    def add(self, paths: Sequence[Path], vecs: np.ndarray) -> List[Optional[Path]]:
+        """
+        Return, for each of `paths`, the original it nearly duplicates (or None).
+        Files without an original are added to the index.
+        """
+        vecs = np.asarray(vecs, dtype=np.float32)
+        norms = np.linalg.norm(vecs, axis=1, keepdims=True)
+        vecs = vecs / np.where(norms > 0, norms, 1.0)
+
+        best = np.full(len(vecs), -np.inf, dtype=np.float32)
+        best_row = np.full(len(vecs), -1, dtype=np.int64)
+        if self._n:
+            for start, block in iter_blocks(self._matrix[:self._n], block_rows=self.block_rows):
+                sims = vecs @ block.T
+                cols = sims.argmax(axis=1)
+                top = sims[np.arange(len(vecs)), cols]
+                better = top > best
+                best[better] = top[better]
+                best_row[better] = start + cols[better]
+
+        originals: List[Optional[Path]] = []
+        new_rows: List[int] = []
+        for i in range(len(vecs)):
+            original = self._paths[best_row[i]] if best[i] >= self.similarity else None
+            if original is None and new_rows:
+                # Earlier originals of this same batch
+                sims = vecs[new_rows] @ vecs[i]
+                j = int(sims.argmax())
+                if sims[j] >= self.similarity:
+                    original = paths[new_rows[j]]
+            if original is None:
+                new_rows.append(i)
+            originals.append(original)
+        if new_rows:
+            self._append(vecs[new_rows], [paths[i] for i in new_rows])
+        return originals
+
+
+def hard_link_copies(pairs: Iterable[Tuple[Path, Path]]) -> int:
+    """
+    Replace each `copy` with a hard link to its identical `original`, so both names share
+    one copy of the data on disk. Pairs that cannot be linked (e.g. on different file
+    systems, or where a move failed) are left as they are. Returns the number linked.
+    """
+    linked = 0
+    for original, copy in pairs:
+        tmp = copy.with_name(copy.name + ".kfo-link")
+        try:
+            os.link(original, tmp)
+            os.replace(tmp, copy)
+        except OSError:
+            tmp.unlink(missing_ok=True)
+            continue
+        linked += 1
+    return linked
@@ -0,0 +1,182 @@
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from . import profiling
+from .config import (
+    CHARS_PER_TOKEN,
+    EMBEDDER_MODEL,
+    ENCODE_BATCH_TOKENS,
+    ENCODE_MAX_BATCH,
+    HASHING_DIM,
+    HASHING_EMBEDDER,
+    HASHING_NGRAM_RANGE,
+)
+
+# An embedder turns a list of texts into an (n, dim) float32 matrix through
+# `encode(texts, batch_size=..., convert_to_numpy=True)`, the SentenceTransformer call
+# signature, so any object with that method can stand in for one. Backends are picked by
+# model name: "hashing" or "hashing:<dim>" selects NgramEmbedder, anything else is a
+# sentence-transformers model. The model name is the embedder's identity (it is stored
+# in the model artifact and keys the embedding cache), while `threads`, `batch_size`,
+# `max_seq_length` and `device` are run-time options.
+
+
+class SentenceTransformerEmbedder:
+    """
+    A sentence-transformers model (this is where torch gets imported).
+    `threads` caps torch's intra-op threads, `batch_size` overrides the caller's batch
+    size and `max_seq_length` truncates inputs to that many tokens. `device` ("cpu",
+    "cuda", "mps", ...) defaults to None, letting sentence-transformers pick CUDA or MPS
+    when available.
+    """
+
+    def __init__(
+        self,
+        model_name: str = EMBEDDER_MODEL,
+        threads: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        max_seq_length: Optional[int] = None,
+        device: Optional[str] = None,
+    ):
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        if threads:
+            torch.set_num_threads(threads)
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.model = SentenceTransformer(model_name, device=device)
+        if max_seq_length:
+            self.model.max_seq_length = max_seq_length
+
+    def encode(self, texts: List[str], batch_size: int = 32, convert_to_numpy: bool = True, **kwargs) -> np.ndarray:
+        return self.model.encode(
+            texts, batch_size=self.batch_size or batch_size, convert_to_numpy=True, show_progress_bar=False
+        )
+
+
+class NgramEmbedder:
+    """
+    Offline embedder with no model to download and no torch: each text's character
+    n-grams (within word boundaries, lowercased) are hashed into `dim` buckets, counts are
+    damped with log1p and rows are L2-normalised. It is stateless, so adding labelled
+    examples never changes the vectors of earlier ones. Matches on spelling rather than
+    meaning: "invoice" and "receipt" are unrelated to it.
+    """
+
+    def __init__(
+        self,
+        dim: int = HASHING_DIM,
+        ngram_range: Tuple[int, int] = HASHING_NGRAM_RANGE,
+        threads: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        max_seq_length: Optional[int] = None,
+        device: Optional[str] = None,
+    ):
+        # `device` is accepted for interface parity; hashing always runs on the CPU
+        from sklearn.feature_extraction.text import HashingVectorizer
+
+        self.dim = dim
+        self.batch_size = batch_size
+        self.max_chars = max_seq_length * CHARS_PER_TOKEN if max_seq_length else None
+        self.vectorizer = HashingVectorizer(
+            analyzer="char_wb",
+            ngram_range=tuple(ngram_range),
+            n_features=dim,
+            alternate_sign=False,
+            norm=None,
+            dtype=np.float32,
+        )
+
+    def encode(self, texts: List[str], batch_size: int = 32, convert_to_numpy: bool = True, **kwargs) -> np.ndarray:
+        batch_size = self.batch_size or batch_size
+        out = np.empty((len(texts), self.dim), dtype=np.float32)
+        for start in range(0, len(texts), batch_size):
+            chunk = texts[start:start + batch_size]
+            if self.max_chars:
+                chunk = [text[:self.max_chars] for text in chunk]
+            counts = self.vectorizer.transform(chunk)
+            np.log1p(counts.data, out=counts.data)
+            block = counts.toarray()
+            norms = np.linalg.norm(block, axis=1, keepdims=True)
+            out[start:start + len(chunk)] = block / np.where(norms > 0, norms, 1.0)
+        return out
+
+
+def make_embedder(model_name: str = EMBEDDER_MODEL, **options):
+    """
+    The embedder for `model_name` (see above), built with run-time `options`.
+    """
+    backend, _, arg = model_name.partition(":")
+    if backend == HASHING_EMBEDDER:
+        if arg and not arg.isdigit():
+            raise ValueError(f"Expected {HASHING_EMBEDDER}:<dim>, got {model_name!r}.")
+        return NgramEmbedder(dim=int(arg) if arg else HASHING_DIM, **options)
+    return SentenceTransformerEmbedder(model_name, **options)
+
+
+def limit_threads(threads: int) -> None:
+    """
+    Cap the threads this process uses to embed and search: the BLAS/OpenMP pools behind
+    numpy and scikit-learn, and torch's intra-op pool if an embedder already loaded torch.
+    Used by processes that share the machine's cores (see shards.py).
+    """
+    import sys
+    from threadpoolctl import threadpool_limits
+
+    threadpool_limits(limits=threads)
+    if "torch" in sys.modules:
+        sys.modules["torch"].set_num_threads(threads)
+
+
+def plan_batches(lengths: np.ndarray, max_tokens: int = ENCODE_BATCH_TOKENS, max_items: int = ENCODE_MAX_BATCH) -> List[np.ndarray]:
+    """
+    Split items with the given token `lengths` into batches of positions, shortest first.
+    Inputs of a batch are padded to its longest one, so sorting by length keeps padding
+    small; each batch then grows while its padded size (items x longest length) stays
+    within `max_tokens` and it has at most `max_items` items. An item longer than
+    `max_tokens` on its own gets a batch to itself.
+    """
+    order = np.argsort(lengths, kind="stable")
+    sorted_lengths = np.asarray(lengths, dtype=np.int64)[order]
+    batches = []
+    start = 0
+    while start < len(order):
+        window = sorted_lengths[start:start + max_items]
+        # Padded cost of ending the batch at each position; non-decreasing, as both the
+        # item count and the (sorted) longest length grow
+        padded = np.arange(1, len(window) + 1) * window
+        end = start + max(1, int(np.searchsorted(padded, max_tokens, side="right")))
+        batches.append(order[start:end])
+        start = end
+    return batches
+
+
+def encode_scheduled(
+    embedder, texts: List[str], max_tokens: int = ENCODE_BATCH_TOKENS, max_items: int = ENCODE_MAX_BATCH
+) -> np.ndarray:
+    """
+    `embedder.encode(texts)` with less wasted work: identical texts are encoded once and
+    their vector fanned back out, and the distinct texts go through `plan_batches`, one
+    forward pass per batch. Token lengths are estimated from the text length
+    (CHARS_PER_TOKEN characters per token, plus the two special tokens), so no tokenizer
+    needs loading. Returns an (n, dim) float32 matrix in the order of `texts`.
+    """
+    first: Dict[str, int] = {}
+    inverse = np.fromiter((first.setdefault(text, len(first)) for text in texts), dtype=np.int64, count=len(texts))
+    unique = list(first)
+    profiling.count("encode_texts", len(texts))
+    profiling.count("encode_unique", len(unique))
+
+    lengths = np.fromiter((len(text) // CHARS_PER_TOKEN + 2 for text in unique), dtype=np.int64, count=len(unique))
+    vecs = None
+    for rows in plan_batches(lengths, max_tokens, max_items):
+        batch = embedder.encode([unique[i] for i in rows], batch_size=len(rows), convert_to_numpy=True)
+        batch = np.asarray(batch, dtype=np.float32)
+        if vecs is None:
+            vecs = np.empty((len(unique), batch.shape[1]), dtype=np.float32)
+        vecs[rows] = batch
+        profiling.count("encode_batches")
+        profiling.count("encode_padded_tokens", len(rows) * int(lengths[rows].max()))
+    return vecs[inverse]
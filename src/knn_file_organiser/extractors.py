@@ -0,0 +1,177 @@
+import re
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from . import profiling
+from .config import EXTRACT_MAX_PAGES, EXTRACT_TOKEN_BUDGET, CHARS_PER_TOKEN
+
+# Bump when an extractor's output changes, so cached embeddings of old text are not reused
+EXTRACTOR_VERSION = 3
+
+# An extractor takes (file_path, max_chars) and returns up to about max_chars of content
+# text ("" when the file has none); the caller falls back to the filename. Every format
+# gets the same treatment: whitespace is squashed and case is kept, as the embedder
+# sees it.
+Extractor = Callable[[Path, int], str]
+
+
+class ExtractorEntry(NamedTuple):
+    extract: Extractor
+    # Parsing is slow enough (or can hang) that it belongs in a worker process
+    in_process: bool
+
+
+_BY_EXTENSION: Dict[str, ExtractorEntry] = {}
+_BY_MAGIC: List[Tuple[bytes, ExtractorEntry]] = []
+_MAGIC_LEN = 8
+
+
+def register_extractor(*extensions: str, magic: Optional[bytes] = None, in_process: bool = False):
+    """
+    Decorator registering an extractor for file `extensions` (e.g. ".txt") and, optionally,
+    for extension-less files whose first bytes are `magic`.
+    Later registrations for the same extension replace earlier ones.
+    """
+    def decorate(fn: Extractor) -> Extractor:
+        entry = ExtractorEntry(fn, in_process)
+        for ext in extensions:
+            _BY_EXTENSION[ext.lower()] = entry
+        if magic is not None:
+            _BY_MAGIC.append((magic[:_MAGIC_LEN], entry))
+        return fn
+    return decorate
+
+
+def lookup_extractor(file_path: Path) -> Optional[ExtractorEntry]:
+    """
+    The extractor registered for `file_path`'s extension or, for an extension-less file,
+    for its first bytes; None if there is none. Callers that need the answer more than
+    once should keep it, as extension-less files are opened to find it.
+    """
+    suffix = file_path.suffix.lower()
+    if suffix:
+        return _BY_EXTENSION.get(suffix)
+    # Only extension-less files are sniffed, so ordinary files cost no extra open()
+    try:
+        with open(file_path, "rb") as f:
+            head = f.read(_MAGIC_LEN)
+    except OSError:
+        return None
+    for magic, entry in _BY_MAGIC:
+        if head.startswith(magic):
+            return entry
+    return None
+
+
+def has_extractor(file_path: Path) -> bool:
+    return lookup_extractor(file_path) is not None
+
+
+def needs_process(file_path: Path) -> bool:
+    """
+    Whether extracting `file_path` is worth shipping to a worker process, judged by the
+    extractor it resolves to (so an extension-less PDF goes to a worker too).
+    """
+    entry = lookup_extractor(file_path)
+    return entry is not None and entry.in_process
+
+
+def char_budget(token_budget: Optional[int] = None) -> int:
+    """
+    Characters to extract for a budget of `token_budget` embedder tokens.
+    Text beyond the embedder's maximum sequence length is truncated anyway, so reading
+    more only costs I/O and tokenisation.
+    """
+    return (EXTRACT_TOKEN_BUDGET if token_budget is None else token_budget) * CHARS_PER_TOKEN
+
+
+def extract_content(
+    file_path: Path, max_chars: Optional[int] = None, entry: Optional[ExtractorEntry] = None
+) -> str:
+    """
+    Run the registered extractor for `file_path`, returning "" if there is none,
+    it finds no text, or it fails. `entry` is the extractor, if the caller has already
+    looked it up (see `lookup_extractor`).
+    """
+    if entry is None:
+        entry = lookup_extractor(file_path)
+    if entry is None:
+        return ""
+    if max_chars is None:
+        max_chars = char_budget()
+    try:
+        return entry.extract(file_path, max_chars)
+    except Exception:
+        return ""
+
+
+def _squash(text: str, max_chars: int) -> str:
+    return re.sub(r"\s+", " ", text).strip()[:max_chars]
+
+
+@register_extractor(".pdf", magic=b"%PDF-", in_process=True)
+def extract_pdf(file_path: Path, max_chars: int) -> str:
+    """
+    Text of the first EXTRACT_MAX_PAGES pages, stopping early once `max_chars` are collected.
+    """
+    import fitz  # PyMuPDF; imported here so startup doesn't pay for it
+
+    with fitz.open(str(file_path)) as doc:
+        chunks = []
+        n_chars = 0
+        pages = 0
+        for i in range(min(EXTRACT_MAX_PAGES, doc.page_count)):
+            text = doc.load_page(i).get_text()
+            pages += 1
+            chunks.append(text)
+            n_chars += len(text.strip())
+            if n_chars >= max_chars:
+                break
+    # Only the parsed pages were read; counted as text, like the plain-text extractor
+    profiling.count("bytes_read", sum(len(text.encode("utf-8", errors="replace")) for text in chunks))
+    profiling.count("pdf_pages", pages)
+    return _squash(" ".join(chunks), max_chars)
+
+
+@register_extractor(".txt", ".md", ".markdown", ".rst", ".csv", ".tsv", ".log", ".json", ".xml", ".html", ".htm")
+def extract_plain_text(file_path: Path, max_chars: int) -> str:
+    """
+    The first `max_chars` characters of a text file (a bounded read; undecodable bytes
+    are replaced).
+    """
+    with open(file_path, "r", encoding="utf-8", errors="replace") as f:
+        text = f.read(max_chars)
+    profiling.count("bytes_read", len(text.encode("utf-8", errors="replace")))
+    if "\x00" in text:
+        # Binary data behind a text extension
+        return ""
+    if file_path.suffix.lower() in (".html", ".htm", ".xml"):
+        text = re.sub(r"<[^>]*>", " ", text)
+    return _squash(text, max_chars)
+
+
+@register_extractor(".docx", in_process=True)
+def extract_docx(file_path: Path, max_chars: int) -> str:
+    """
+    Body text of a Word document, streamed from word/document.xml and stopped once
+    `max_chars` are collected.
+    """
+    import zipfile
+    from xml.etree.ElementTree import iterparse
+
+    text_tag = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}t"
+    para_tag = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}p"
+    chunks = []
+    n_chars = 0
+    with zipfile.ZipFile(file_path) as zf, zf.open("word/document.xml") as xml:
+        for _, elem in iterparse(xml, events=("end",)):
+            if elem.tag == text_tag and elem.text:
+                chunks.append(elem.text)
+                n_chars += len(elem.text)
+            elif elem.tag == para_tag:
+                chunks.append(" ")
+                elem.clear()
+                if n_chars >= max_chars:
+                    break
+        profiling.count("bytes_read", xml.tell())
+    return _squash("".join(chunks), max_chars)
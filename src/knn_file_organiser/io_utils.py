@@ -2,44 +2,148 @@ import os
 import shutil
 import re
 import json
+from fnmatch import fnmatch
 from pathlib import Path
-from typing import List
+from typing import Iterable, Iterator, List, Optional
 
-import fitz  # PyMuPDF
-
-from .config import LABELS_FILE, TRAINING_LABELS_FILE, UNCATEGORISED_LABEL
+from . import profiling
+from .config import LABELS_FILE, TRAINING_LABELS_FILE, UNCATEGORISED_LABEL, SYMLINK_POLICIES
+from .extractors import ExtractorEntry, extract_content, lookup_extractor
+from .label_store import LabelStore
 
 
 def list_all_files(source: Path) -> List[Path]:
     """
     Recursively list all files (not directories) under `source`.
     """
-    return [p for p in source.rglob("*") if p.is_file()]
-
-
-def extract_text_from_file(file_path: Path) -> str:
+    return list(iter_files(source))
+
+
+def iter_files(
+    source: Path,
+    include: Optional[Iterable[str]] = None,
+    exclude: Optional[Iterable[str]] = None,
+    extensions: Optional[Iterable[str]] = None,
+    max_depth: Optional[int] = None,
+    symlinks: str = "files",
+    subdir: Optional[str] = None,
+) -> Iterator[Path]:
+    """
+    Lazily yield files under `source`, walking it with `os.scandir`.
+    The file/directory type comes from the cached directory entry, so no extra
+    stat is needed per path, and the first file is yielded before the walk finishes.
+    Each directory's entries are visited in name order.
+
+      include/exclude: glob patterns matched against the path relative to `source`
+                       and against the bare name; excluded directories are not entered.
+      extensions:      only yield files with one of these suffixes (e.g. ".pdf").
+      max_depth:       how many directory levels below `source` to enter (0 = top level only).
+      symlinks:        "files"  – yield symlinked files, don't enter symlinked directories
+                       "follow" – also enter symlinked directories (each directory once)
+                       "skip"   – ignore symlinks entirely
+      subdir:          only walk this directory below `source` (a relative path); paths
+                       are still matched and depths counted relative to `source`.
+    """
+    if symlinks not in SYMLINK_POLICIES:
+        raise ValueError(f"symlinks must be one of {SYMLINK_POLICIES}, got {symlinks!r}")
+    include = list(include or [])
+    exclude = list(exclude or [])
+    exts = {e.lower() if e.startswith(".") else "." + e.lower() for e in (extensions or [])}
+
+    def matches(rel: str, name: str, patterns: List[str]) -> bool:
+        return any(fnmatch(rel, pat) or fnmatch(name, pat) for pat in patterns)
+
+    top, prefix, depth = str(source), "", 0
+    if subdir:
+        rel = Path(subdir).as_posix()
+        top, prefix, depth = os.path.join(top, subdir), rel + "/", len(Path(rel).parts)
+
+    seen_dirs = set()
+    if symlinks == "follow":
+        st = os.stat(top)
+        seen_dirs.add((st.st_dev, st.st_ino))
+
+    # Stack of (directory path, relative prefix, depth)
+    stack = [(top, prefix, depth)]
+    while stack:
+        dir_path, prefix, depth = stack.pop()
+        try:
+            with os.scandir(dir_path) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError:
+            continue
+
+        subdirs = []
+        for entry in entries:
+            rel = prefix + entry.name
+            try:
+                is_link = entry.is_symlink()
+                if is_link and symlinks == "skip":
+                    continue
+                if entry.is_dir(follow_symlinks=symlinks == "follow"):
+                    if max_depth is not None and depth >= max_depth:
+                        continue
+                    if exclude and matches(rel, entry.name, exclude):
+                        continue
+                    if symlinks == "follow":
+                        st = entry.stat()
+                        key = (st.st_dev, st.st_ino)
+                        if key in seen_dirs:
+                            continue
+                        seen_dirs.add(key)
+                    subdirs.append((entry.path, rel + "/", depth + 1))
+                    continue
+                if not entry.is_file():
+                    continue
+            except OSError:
+                continue
+            if exts and os.path.splitext(entry.name)[1].lower() not in exts:
+                continue
+            if include and not matches(rel, entry.name, include):
+                continue
+            if exclude and matches(rel, entry.name, exclude):
+                continue
+            yield Path(entry.path)
+
+        # Reversed so the stack pops subdirectories in name order
+        stack.extend(reversed(subdirs))
+
+
+def extract_text_from_file(file_path: Path, max_chars: Optional[int] = None) -> str:
     """
     Extract text for embedding:
-      1) If it's a PDF, try to pull real text from the first few pages.
-      2) Otherwise (or if PDF text is empty), take the filename stem,
+      1) If an extractor is registered for the file's type (PDF, Word, plain text, ...;
+         see extractors.py), use up to `max_chars` characters of its content
+         (default: the configured token budget).
+      2) Otherwise (or if there is no content), take the filename stem,
          remove punctuation/underscores/hyphens, and lowercase it.
     """
-    # === 1) PDF text extraction (if applicable) ===
-    try:
-        if file_path.suffix.lower() == ".pdf":
-            doc = fitz.open(str(file_path))
-            text_chunks = []
-            max_pages = min(3, doc.page_count)
-            for i in range(max_pages):
-                page = doc.load_page(i)
-                text_chunks.append(page.get_text())
-            joined = " ".join(text_chunks).strip()
-            if joined:  # if we actually found text in the PDF
-                return joined.lower()
-    except Exception:
-        pass  # if anything goes wrong, fallback to filename normalization below
+    return extract_text(file_path, lookup_extractor(file_path), max_chars)
+
+
+def extract_text(file_path: Path, entry: Optional[ExtractorEntry], max_chars: Optional[int] = None) -> str:
+    """
+    `extract_text_from_file` for a file whose extractor the caller has already looked up
+    (`entry`, None if it has none; see extractors.lookup_extractor), so extension-less
+    files are not sniffed again.
+    """
+    # === 1) Content extraction (if applicable) ===
+    if entry is not None:
+        text = extract_content(file_path, max_chars, entry)
+        if text:
+            return text
+        # if anything goes wrong, fallback to filename normalization below
+        profiling.count("filename_fallbacks")
 
     # === 2) Filename normalization ===
+    return normalize_filename(file_path)
+
+
+def normalize_filename(file_path: Path) -> str:
+    """
+    Turn a filename into embedding text: take the stem, replace punctuation,
+    underscores and hyphens with spaces, and lowercase it.
+    """
     # Example: "Medibank_Policy_Notification-1.pdf" → 
     #   "medibank policy notification 1"
     base = file_path.stem  # strips away ".pdf", ".txt", etc.
@@ -59,33 +163,50 @@ def extract_text_from_file(file_path: Path) -> str:
 
 
 
-def move_file_to_category(file_path: Path, dest_root: Path, category: str) -> None:
+def unique_target(target_dir: Path, name: str, reserved: Optional[set] = None) -> Path:
+    """
+    Return `target_dir / name`, or `target_dir / "<stem> (n)<suffix>"` with the smallest
+    n >= 1 that neither exists on disk nor is in `reserved` (paths already promised to
+    other pending moves). The chosen path is added to `reserved`.
+    """
+    target = target_dir / name
+    stem, suffix = Path(name).stem, Path(name).suffix
+    n = 0
+    while os.path.lexists(target) or (reserved is not None and target in reserved):
+        n += 1
+        target = target_dir / f"{stem} ({n}){suffix}"
+    if reserved is not None:
+        reserved.add(target)
+    return target
+
+
+def move_file_to_category(file_path: Path, dest_root: Path, category: str) -> Optional[Path]:
     """
     Move `file_path` into `dest_root / category / <original-filename>`.
-    Creates directories as needed.
+    Creates directories as needed. A file already at the target is never overwritten;
+    the moved file is renamed "<name> (n).<ext>" instead (see `unique_target`).
+    Returns the new path, or None if the move failed.
+    For many files, prefer `mover.MoveExecutor`, which moves in parallel and journals each move.
     """
     target_dir = dest_root / category
     target_dir.mkdir(parents=True, exist_ok=True)
+    target = unique_target(target_dir, file_path.name)
     try:
-        shutil.move(str(file_path), str(target_dir / file_path.name))
+        shutil.move(str(file_path), str(target))
     except Exception as e:
         print(f"[ERROR] Unable to move {file_path} → {target_dir}: {e}")
+        return None
+    return target
 
 
 def load_or_initialize_labels() -> (List[str], List[str]):
     """
-    Load examples/labels from LABELS_FILE (labels.json). If it doesn't exist or is empty,
-    load from the TRAINING_LABELS_FILE (training_labels.json) instead.
+    Load examples/labels from the label store (LABELS_FILE, labels.json, plus its log of
+    recent additions; see label_store.py). If it is empty, load from the
+    TRAINING_LABELS_FILE (training_labels.json) instead.
     Returns (examples, labels) as two parallel lists.
     """
-    examples, labels = [], []
-    if Path(LABELS_FILE).exists():
-        try:
-            data = json.loads(Path(LABELS_FILE).read_text(encoding="utf-8"))
-            examples = data.get("examples", [])
-            labels = data.get("labels", [])
-        except Exception:
-            examples, labels = [], []
+    examples, labels = LabelStore(Path(LABELS_FILE)).load()
 
     if not examples or not labels:
         # Fallback to training set
@@ -101,14 +222,10 @@ def load_or_initialize_labels() -> (List[str], List[str]):
 
 def append_to_labels_json(filename: str, label: str) -> None:
     """
-    Append a single (filename → label) mapping to LABELS_FILE. If the file doesn't exist,
-    it will be created with the appropriate JSON structure.
+    Append a single (filename → label) mapping to the label store's log (see
+    label_store.py); labels.json itself is rewritten when the log is compacted.
+    To add many labels, keep one `LabelStore` open instead.
     """
-    if Path(LABELS_FILE).exists():
-        data = json.loads(Path(LABELS_FILE).read_text(encoding="utf-8"))
-    else:
-        data = {"examples": [], "labels": []}
-
-    data["examples"].append(filename)
-    data["labels"].append(label)
-    Path(LABELS_FILE).write_text(json.dumps(data, indent=2), encoding="utf-8")
+    store = LabelStore(Path(LABELS_FILE))
+    store.append(filename, label)
+    store.close(compact=False)
@@ -0,0 +1,126 @@
+import os
+import sqlite3
+from pathlib import Path
+from typing import Iterable, Iterator, List, Sequence, Tuple
+
+import numpy as np
+
+from .config import STREAM_PAGE_ROWS, STREAM_QUEUE_FILE
+
+
+class LabelQueue:
+    """
+    On-disk FIFO of the files a streaming run could not classify confidently, each with
+    the embedding it was classified with, so they can be offered for labelling once the
+    scan is over without holding them in memory.
+    The queue doubles as the run's checkpoint. Confident files are moved as soon as they
+    are classified (and the move journal finishes any that were in flight), and queued
+    files are skipped by the scan, so rerunning an interrupted run with the same `run_key`
+    (source, destination and embedder) only processes files it has not seen. A queue left
+    by a run with a different key is discarded.
+    """
+
+    def __init__(self, path: Path = Path(STREAM_QUEUE_FILE), run_key: str = ""):
+        self.path = Path(path)
+        self._conn = sqlite3.connect(str(self.path))
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS queue (
+                seq    INTEGER PRIMARY KEY AUTOINCREMENT,
+                path   TEXT    NOT NULL UNIQUE,
+                dim    INTEGER NOT NULL,
+                vector BLOB    NOT NULL
+            )
+            """
+        )
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'run'").fetchone()
+        if row is not None and row[0] != run_key:
+            self._conn.execute("DELETE FROM queue")
+        self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('run', ?)", (run_key,))
+        self._conn.commit()
+        self._count = self._conn.execute("SELECT COUNT(*) FROM queue").fetchone()[0]
+        if self._count:
+            # Files may have been moved or deleted since the queue was written
+            self.prune()
+        self.resumed = self._count > 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __contains__(self, file_path: Path) -> bool:
+        return self._conn.execute("SELECT 1 FROM queue WHERE path = ?", (str(file_path),)).fetchone() is not None
+
+    def push_many(self, entries: Sequence[Tuple[Path, np.ndarray]]) -> None:
+        """
+        Append (file_path, vector) entries; files already queued keep their place.
+        """
+        if not entries:
+            return
+        before = self._conn.total_changes
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO queue (path, dim, vector) VALUES (?, ?, ?)",
+            [(str(p), len(vec), np.asarray(vec, dtype=np.float32).tobytes()) for p, vec in entries],
+        )
+        self._conn.commit()
+        self._count += self._conn.total_changes - before
+
+    def _rows(self, after: int, limit: int) -> List[Tuple[int, str, np.ndarray]]:
+        rows = self._conn.execute(
+            "SELECT seq, path, dim, vector FROM queue WHERE seq > ? ORDER BY seq LIMIT ?", (after, limit)
+        ).fetchall()
+        return [(seq, path, np.frombuffer(blob, dtype=np.float32, count=dim)) for seq, path, dim, blob in rows]
+
+    def pages(self, rows: int = STREAM_PAGE_ROWS) -> Iterator[List[Tuple[Path, np.ndarray]]]:
+        """
+        Yield the queue oldest first, `rows` entries at a time. Entries whose file has
+        disappeared (e.g. it was moved by an interrupted run) are dropped. Entries may be
+        removed while iterating.
+        """
+        last = 0
+        while True:
+            batch = self._rows(last, rows)
+            if not batch:
+                return
+            last = batch[-1][0]
+            gone = {path for _, path, _ in batch if not os.path.lexists(path)}
+            self.remove(gone)
+            page = [(Path(path), vec) for _, path, vec in batch if path not in gone]
+            if page:
+                yield page
+
+    def prune(self, rows: int = STREAM_PAGE_ROWS) -> int:
+        """
+        Drop the entries whose file has disappeared, checking `rows` paths at a time.
+        Returns how many were dropped.
+        """
+        before = self._count
+        last = 0
+        while True:
+            batch = self._conn.execute(
+                "SELECT seq, path FROM queue WHERE seq > ? ORDER BY seq LIMIT ?", (last, rows)
+            ).fetchall()
+            if not batch:
+                return before - self._count
+            last = batch[-1][0]
+            self.remove(path for _, path in batch if not os.path.lexists(path))
+
+    def remove(self, file_paths: Iterable[Path]) -> None:
+        before = self._conn.total_changes
+        self._conn.executemany("DELETE FROM queue WHERE path = ?", [(str(p),) for p in file_paths])
+        self._conn.commit()
+        self._count -= self._conn.total_changes - before
+
+    def close(self, delete: bool = False) -> None:
+        """
+        Close the queue; with `delete`, remove its file (the run is complete).
+        """
+        self._conn.close()
+        if delete:
+            self.path.unlink(missing_ok=True)
+
+    def __enter__(self) -> "LabelQueue":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
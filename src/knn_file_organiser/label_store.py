@@ -0,0 +1,164 @@
+import json
+import os
+from pathlib import Path
+from typing import Iterable, List, Optional, Set, Tuple
+
+from .config import LABELS_COMPACT_EVERY, LABELS_FILE, LABELS_LOG_FILE
+
+# The store is labels.json, a snapshot in its usual {"examples": [...], "labels": [...]}
+# form, plus labels.log.jsonl, an append-only log of {"example", "label"} records added
+# since the snapshot was written. Loading replays the log over the snapshot; compaction
+# folds the log into a new snapshot (written to a temporary file and atomically renamed
+# over the old one) and then empties the log. A crash at any point leaves both files
+# readable, and since identical (example, label) pairs are stored once, replaying a log
+# that was already folded in changes nothing.
+
+
+def _read_snapshot(path: Path) -> Tuple[List[str], List[str]]:
+    if not path.exists():
+        return [], []
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+        examples, labels = list(data.get("examples", [])), list(data.get("labels", []))
+    except (ValueError, AttributeError):
+        return [], []
+    n = min(len(examples), len(labels))
+    return examples[:n], labels[:n]
+
+
+def _write_atomic(path: Path, text: str) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class LabelStore:
+    """
+    Labelled (example, label) pairs with O(1) appends.
+    `append` writes one line to the log instead of rewriting labels.json, so a labelling
+    session costs O(n) in total rather than O(n) per label. The log is compacted into
+    labels.json after every `compact_every` appends and on `close()`. Identical pairs
+    are kept once, in the order they were first added.
+    """
+
+    def __init__(
+        self,
+        path: Path = Path(LABELS_FILE),
+        log_path: Optional[Path] = None,
+        compact_every: int = LABELS_COMPACT_EVERY,
+    ):
+        self.path = Path(path)
+        self.log_path = Path(log_path) if log_path is not None else self.path.with_name(LABELS_LOG_FILE)
+        self.compact_every = compact_every
+        self.examples: List[str] = []
+        self.labels: List[str] = []
+        self._seen: Set[Tuple[str, str]] = set()
+        self._loaded = False
+        self._log = None
+        self._pending = 0
+
+    def _add(self, example: str, label: str) -> bool:
+        if (example, label) in self._seen:
+            return False
+        self._seen.add((example, label))
+        self.examples.append(example)
+        self.labels.append(label)
+        return True
+
+    def load(self) -> Tuple[List[str], List[str]]:
+        """
+        Read the snapshot and replay the log. Returns (examples, labels) as parallel lists.
+        A torn last log line (from a crash while it was written) is ignored.
+        """
+        self.examples, self.labels, self._seen = [], [], set()
+        for example, label in zip(*_read_snapshot(self.path)):
+            self._add(example, label)
+        self._pending = 0
+        if self.log_path.exists():
+            with open(self.log_path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                        example, label = record["example"], record["label"]
+                    except (ValueError, KeyError, TypeError):
+                        continue
+                    self._add(example, label)
+                    self._pending += 1
+        self._loaded = True
+        return list(self.examples), list(self.labels)
+
+    def __contains__(self, pair: Tuple[str, str]) -> bool:
+        if not self._loaded:
+            self.load()
+        return tuple(pair) in self._seen
+
+    def append(self, example: str, label: str) -> bool:
+        """
+        Add one pair; returns False (and writes nothing) if it is already stored.
+        """
+        return self.extend([example], [label]) == 1
+
+    def extend(self, examples: Iterable[str], labels: Iterable[str]) -> int:
+        """
+        Append many pairs with a single write to the log; returns how many were new.
+        """
+        if not self._loaded:
+            self.load()
+        lines = [
+            json.dumps({"example": example, "label": label}, ensure_ascii=False) + "\n"
+            for example, label in zip(examples, labels)
+            if self._add(example, label)
+        ]
+        if not lines:
+            return 0
+        if self._log is None:
+            self._log = open(self.log_path, "a", encoding="utf-8")
+            # Start on a fresh line after a torn record
+            if self._log.tell():
+                with open(self.log_path, "rb") as f:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":
+                        self._log.write("\n")
+        self._log.write("".join(lines))
+        self._log.flush()
+        self._pending += len(lines)
+        if self._pending >= self.compact_every:
+            self.compact()
+        return len(lines)
+
+    def compact(self) -> None:
+        """
+        Fold the log into a new labels.json and empty the log.
+        """
+        if not self._loaded:
+            self.load()
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+        self.export_json(self.path)
+        self.log_path.unlink(missing_ok=True)
+        self._pending = 0
+
+    def close(self, compact: bool = True) -> None:
+        if compact and self._pending:
+            self.compact()
+        elif self._log is not None:
+            self._log.close()
+            self._log = None
+
+    def import_json(self, path: Path) -> int:
+        """
+        Add the pairs of a labels.json-format file; returns how many were new.
+        """
+        return self.extend(*_read_snapshot(Path(path)))
+
+    def export_json(self, path: Path) -> None:
+        """
+        Write all pairs to `path` in the labels.json format (atomically).
+        """
+        if not self._loaded:
+            self.load()
+        _write_atomic(Path(path), json.dumps({"examples": self.examples, "labels": self.labels}, indent=2))
@@ -1,35 +1,546 @@
 import os
 import json
-import joblib
+import time
 import numpy as np
 
 from pathlib import Path
-from typing import List, Tuple, Optional
+from typing import Dict, List, Tuple, Optional
 
-from sklearn.neighbors import KNeighborsClassifier
-from sentence_transformers import SentenceTransformer
+from .artifact import ArtifactError, read_artifact, write_artifact
+from .embedders import encode_scheduled, make_embedder
+from .quantise import dequantize, iter_blocks, precision_of, quantize
+
+# joblib, scikit-learn and sentence-transformers (torch) are imported where they are
+# first needed, so that runs which never embed anything start quickly.
 
 from .config import (
     LABELS_FILE,
     TRAINING_LABELS_FILE,
     MODEL_FILE,
     EMBEDDINGS_FILE,
+    METADATA_FILE,
+    MODEL_ARTIFACT_FILE,
     KNN_NEIGHBORS,
+    PREDICT_BATCH_SIZE,
+    INDEX_BACKEND,
+    IVF_N_PROBE,
+    EMBEDDING_METRIC,
+    METRICS,
+    EMBEDDING_PRECISION,
+    EMBEDDING_PRECISIONS,
+    QUANT_BLOCK_ROWS,
+    EMBEDDER_MODEL,
+    ENCODE_MAX_BATCH,
 )
 
 
+def _load_embedder(model_name: str, **options):
+    """
+    Load the embedder backend for `model_name` (see embedders.py); for sentence-transformers
+    models, this is where torch gets imported.
+    """
+    return make_embedder(model_name, **options)
+
+
+def _vote(neighbor_codes: np.ndarray, n_labels: int) -> np.ndarray:
+    """
+    Majority vote over an (n, k) matrix of neighbour label codes, nearest-first.
+    Ties are broken in favour of the label whose neighbour is closest.
+    Returns an (n,) array of winning label codes.
+    """
+    n, k = neighbor_codes.shape
+    scores = np.zeros((n, n_labels), dtype=np.float64)
+    rows = np.repeat(np.arange(n), k)
+    np.add.at(scores, (rows, neighbor_codes.ravel()), 1.0)
+    # Halving rank bonuses sum to < 1, so they only decide between tied counts,
+    # and the nearest neighbour's bonus outweighs all farther ones combined
+    bonus = 0.5 ** (np.arange(k) + 2)
+    np.add.at(scores, (rows, neighbor_codes.ravel()), np.tile(bonus, n))
+    return scores.argmax(axis=1)
+
+
+class IVFIndex:
+    """
+    Approximate nearest-neighbour search with an inverted-file (IVF) index, in pure NumPy.
+    Stored vectors are partitioned into `n_lists` k-means cells; a query is compared
+    against the centroids and then exactly against the vectors of its `n_probe` closest
+    cells only. Raising `n_probe` trades latency for recall (n_probe == n_lists is exact).
+    `n_lists` defaults to roughly sqrt(n_vectors).
+    Vectors are kept at their stored precision (possibly memory-mapped) and only the
+    probed rows are dequantised. The cell lists (`order`, `offsets`) are saved with the
+    centroids, so loading a saved index does no assignment work.
+    """
+
+    name = "ivf"
+    approximate = True
+
+    def __init__(
+        self,
+        n_lists: Optional[int] = None,
+        n_probe: int = IVF_N_PROBE,
+        seed: int = 0,
+        block_rows: int = QUANT_BLOCK_ROWS,
+    ):
+        if n_probe < 1:
+            raise ValueError("n_probe must be at least 1.")
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.seed = seed
+        self.block_rows = block_rows
+        self.centroids: Optional[np.ndarray] = None
+        self._data: Optional[np.ndarray] = None
+        self._scales: Optional[np.ndarray] = None
+        # Row ids grouped by cell; cell c holds _order[_offsets[c]:_offsets[c + 1]]
+        self._order: Optional[np.ndarray] = None
+        self._offsets: Optional[np.ndarray] = None
+
+    @staticmethod
+    def _sq_dists(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+        d = (a * a).sum(axis=1)[:, None] - 2.0 * (a @ b.T) + (b * b).sum(axis=1)[None, :]
+        return np.maximum(d, 0.0)
+
+    def _kmeans(self, vectors: np.ndarray, n_lists: int, n_iter: int = 10) -> np.ndarray:
+        rng = np.random.default_rng(self.seed)
+        centroids = vectors[rng.choice(len(vectors), n_lists, replace=False)].copy()
+        for _ in range(n_iter):
+            assign = self._sq_dists(vectors, centroids).argmin(axis=1)
+            counts = np.bincount(assign, minlength=n_lists)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, vectors)
+            nonempty = counts > 0
+            centroids[nonempty] = sums[nonempty] / counts[nonempty, None]
+        return centroids
+
+    def _nearest_cells(self, data: np.ndarray, scales: Optional[np.ndarray]) -> np.ndarray:
+        assign = np.empty(len(data), dtype=np.int64)
+        for start, block in iter_blocks(data, scales, self.block_rows):
+            assign[start:start + len(block)] = self._sq_dists(block, self.centroids).argmin(axis=1)
+        return assign
+
+    def _set_lists(self, assign: np.ndarray) -> None:
+        self._order = np.argsort(assign, kind="stable")
+        counts = np.bincount(assign, minlength=len(self.centroids))
+        self._offsets = np.concatenate([[0], np.cumsum(counts)])
+
+    def _assignments(self) -> np.ndarray:
+        # Inverse of _set_lists: the cell of every row
+        assign = np.empty(len(self._order), dtype=np.int64)
+        assign[self._order] = np.repeat(np.arange(len(self.centroids)), np.diff(self._offsets))
+        return assign
+
+    def get_params(self) -> dict:
+        return {"n_lists": self.n_lists, "n_probe": self.n_probe, "seed": self.seed}
+
+    def state_arrays(self) -> Dict[str, np.ndarray]:
+        return {"centroids": self.centroids, "order": self._order, "offsets": self._offsets}
+
+    def fit(
+        self,
+        vectors: np.ndarray,
+        centroids: Optional[np.ndarray] = None,
+        scales: Optional[np.ndarray] = None,
+        order: Optional[np.ndarray] = None,
+        offsets: Optional[np.ndarray] = None,
+    ) -> "IVFIndex":
+        """
+        Partition `vectors` into cells. Passing previously saved `centroids` skips k-means,
+        and their saved cell lists (`order`, `offsets`) skip assigning the vectors too.
+        """
+        self._data = vectors if vectors.dtype != np.float64 else vectors.astype(np.float32)
+        self._scales = scales
+        if centroids is not None:
+            self.centroids = np.asarray(centroids, dtype=np.float32)
+        else:
+            n_lists = self.n_lists or max(1, int(round(np.sqrt(len(self._data)))))
+            n_lists = min(n_lists, len(self._data))
+            self.centroids = self._kmeans(dequantize(self._data, self._scales), n_lists)
+        if order is not None and offsets is not None and len(order) == len(self._data):
+            self._order, self._offsets = order, offsets
+        else:
+            self._set_lists(self._nearest_cells(self._data, self._scales))
+        return self
+
+    def add(self, vectors: np.ndarray, scales: Optional[np.ndarray] = None) -> None:
+        """
+        Append vectors to their nearest existing cells (centroids are not moved).
+        New rows are stored at the index's precision, as in DotIndex.add.
+        """
+        vectors, scales = quantize(dequantize(vectors, scales), precision_of(self._data))
+        assign = np.concatenate([self._assignments(), self._nearest_cells(vectors, scales)])
+        self._data = np.concatenate([self._data, vectors])
+        if self._scales is not None:
+            self._scales = np.concatenate([self._scales, scales])
+        self._set_lists(assign)
+
+    def kneighbors(self, queries: np.ndarray, n_neighbors: int = KNN_NEIGHBORS) -> Tuple[np.ndarray, np.ndarray]:
+        queries = np.asarray(queries, dtype=np.float32)
+        k = min(n_neighbors, len(self._data))
+        n_probe = min(self.n_probe, len(self.centroids))
+        cell_order = np.argsort(self._sq_dists(queries, self.centroids), axis=1)
+        sizes = np.diff(self._offsets)
+
+        distances = np.empty((len(queries), k), dtype=np.float64)
+        indices = np.empty((len(queries), k), dtype=np.int64)
+        for q in range(len(queries)):
+            # Probe the closest cells, widening until there are at least k candidates
+            n_cells = n_probe
+            while sizes[cell_order[q, :n_cells]].sum() < k:
+                n_cells += 1
+            cand = np.concatenate(
+                [self._order[self._offsets[c]:self._offsets[c + 1]] for c in cell_order[q, :n_cells]]
+            )
+            # Direct differences: the expanded form loses float32 precision for close pairs
+            rows = dequantize(self._data[cand], None if self._scales is None else self._scales[cand])
+            diff = rows - queries[q]
+            d = np.einsum("ij,ij->i", diff, diff)
+            top = np.argpartition(d, k - 1)[:k] if len(d) > k else np.arange(len(d))
+            top = top[np.argsort(d[top], kind="stable")]
+            distances[q] = np.sqrt(d[top])
+            indices[q] = cand[top]
+        return distances, indices
+
+
+class DotIndex:
+    """
+    Brute-force search as BLAS matrix multiplies plus an `argpartition` top-k.
+    Ranks by |x|^2 - 2 q.x (exact Euclidean order), then recomputes the k winning
+    distances from direct differences. With L2-normalised embeddings this is plain
+    cosine-similarity search, and faster than scikit-learn for our corpus sizes.
+    Vectors are kept at their stored precision (float16 / int8 + scales, possibly
+    memory-mapped) and dequantised `block_rows` at a time during search; a float32
+    matrix that fits in one block is searched with a single multiply. The row norms are
+    saved with the model, so loading a saved index does not read the matrix.
+    """
+
+    name = "dot"
+    approximate = False
+
+    def __init__(self, block_rows: int = QUANT_BLOCK_ROWS):
+        self.block_rows = block_rows
+        self._data: Optional[np.ndarray] = None
+        self._scales: Optional[np.ndarray] = None
+        self._sq_norms: Optional[np.ndarray] = None
+
+    def get_params(self) -> dict:
+        return {"block_rows": self.block_rows}
+
+    def state_arrays(self) -> Dict[str, np.ndarray]:
+        return {"sq_norms": self._sq_norms}
+
+    def fit(
+        self, vectors: np.ndarray, scales: Optional[np.ndarray] = None, sq_norms: Optional[np.ndarray] = None
+    ) -> "DotIndex":
+        """
+        Index `vectors` as they are stored. Passing previously saved `sq_norms` skips the
+        pass over the matrix.
+        """
+        self._data = vectors if vectors.dtype != np.float64 else vectors.astype(np.float32)
+        self._scales = scales
+        if sq_norms is not None and len(sq_norms) == len(vectors):
+            self._sq_norms = sq_norms
+            return self
+        self._sq_norms = np.empty(len(vectors), dtype=np.float32)
+        for start, block in iter_blocks(self._data, self._scales, self.block_rows):
+            self._sq_norms[start:start + len(block)] = np.einsum("ij,ij->i", block, block)
+        return self
+
+    def add(self, vectors: np.ndarray, scales: Optional[np.ndarray] = None) -> None:
+        # New rows are stored at the index's precision, whatever precision they arrive in
+        vectors, scales = quantize(dequantize(vectors, scales), precision_of(self._data))
+        sq_norms = np.concatenate([self._sq_norms, DotIndex().fit(vectors, scales)._sq_norms])
+        data = np.concatenate([self._data, vectors])
+        if self._scales is not None:
+            scales = np.concatenate([self._scales, scales])
+        self.fit(data, scales, sq_norms=sq_norms)
+
+    def kneighbors(self, queries: np.ndarray, n_neighbors: int = KNN_NEIGHBORS) -> Tuple[np.ndarray, np.ndarray]:
+        queries = np.asarray(queries, dtype=np.float32)
+        k = min(n_neighbors, len(self._data))
+        best_scores = np.full((len(queries), 0), np.inf, dtype=np.float32)
+        best_idx = np.empty((len(queries), 0), dtype=np.int64)
+        for start, block in iter_blocks(self._data, self._scales, self.block_rows):
+            scores = self._sq_norms[None, start:start + len(block)] - 2.0 * (queries @ block.T)
+            kb = min(k, scores.shape[1])
+            part = np.argpartition(scores, kb - 1, axis=1)[:, :kb] if kb < scores.shape[1] else \
+                np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+            best_scores = np.concatenate([best_scores, np.take_along_axis(scores, part, axis=1)], axis=1)
+            best_idx = np.concatenate([best_idx, part + start], axis=1)
+            if best_scores.shape[1] > k:
+                keep = np.argpartition(best_scores, k - 1, axis=1)[:, :k]
+                best_scores = np.take_along_axis(best_scores, keep, axis=1)
+                best_idx = np.take_along_axis(best_idx, keep, axis=1)
+
+        flat = best_idx.ravel()
+        rows = dequantize(self._data[flat], None if self._scales is None else self._scales[flat])
+        diff = rows.reshape(len(queries), k, -1) - queries[:, None, :]
+        sq = np.einsum("qkd,qkd->qk", diff, diff)
+        order = np.argsort(sq, axis=1, kind="stable")
+        return np.sqrt(np.take_along_axis(sq, order, axis=1)), np.take_along_axis(best_idx, order, axis=1)
+
+
+class ExactIndex(DotIndex):
+    """
+    Exact Euclidean search: the blocked brute-force search of DotIndex over the stored
+    matrix, under the backend name that non-cosine models use by default. Searching the
+    (memory-mapped) matrix in place, rather than a tree built from a float32 copy of it,
+    keeps `--precision` savings and lets shard workers share the artifact's pages.
+    """
+
+    name = "exact"
+
+
+INDEX_BACKENDS = {
+    ExactIndex.name: ExactIndex,
+    IVFIndex.name: IVFIndex,
+    DotIndex.name: DotIndex,
+}
+
+
+class CentroidPrefilter:
+    """
+    Two-stage search over the labelled training matrix.
+    Stage 1 scores every label's prototype (the mean of its stored vectors; unit length
+    for cosine models) with one small matrix product. Stage 2 runs exact k-NN only over
+    the examples of each query's `n_candidates` closest labels, so query cost follows
+    the size of a few labels rather than of the whole training set.
+    Rows are kept sorted by label (a copy of the matrix at its stored precision), so each
+    label's examples are one contiguous slice.
+    Each label also stores its radius (largest distance from the prototype to one of its
+    examples); by the triangle inequality no example of a label is closer to a query than
+    (prototype distance - radius), which gives an exact early reject: a query whose bound
+    exceeds `reject_distance` for every label cannot have a neighbour within it.
+    All distances here are Euclidean in the stored space.
+    """
+
+    def __init__(
+        self,
+        embeddings: np.ndarray,
+        scales: Optional[np.ndarray],
+        label_codes: np.ndarray,
+        n_labels: int,
+        normalize: bool = False,
+    ):
+        self._embeddings, self._scales_unsorted = embeddings, scales
+        self.order = np.argsort(label_codes, kind="stable")
+        counts = np.bincount(label_codes, minlength=n_labels)
+        self.offsets = np.concatenate([[0], np.cumsum(counts)])
+        self._data = embeddings[self.order]
+        self._scales = None if scales is None else scales[self.order]
+        self.prototypes = np.zeros((n_labels, embeddings.shape[1]), dtype=np.float32)
+        self.radii = np.zeros(n_labels, dtype=np.float32)
+        self.empty = counts == 0
+        self._sq_norms = np.empty(len(self._data), dtype=np.float32)
+        for label in np.flatnonzero(~self.empty):
+            lo, hi = self.offsets[label], self.offsets[label + 1]
+            block = self._block(lo, hi)
+            prototype = block.mean(axis=0)
+            if normalize:
+                prototype = l2_normalize(prototype[None, :])[0]
+            self.prototypes[label] = prototype
+            self.radii[label] = np.sqrt(((block - prototype) ** 2).sum(axis=1).max())
+            self._sq_norms[lo:hi] = np.einsum("ij,ij->i", block, block)
+        self._proto_sq = np.einsum("ij,ij->i", self.prototypes, self.prototypes)
+
+    def _block(self, lo: int, hi: int) -> np.ndarray:
+        return dequantize(self._data[lo:hi], None if self._scales is None else self._scales[lo:hi])
+
+    def search(
+        self,
+        queries: np.ndarray,
+        n_neighbors: int,
+        n_candidates: int,
+        reject_distance: Optional[float] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (distances, indices) of the `n_neighbors` nearest examples among each query's
+        candidate labels, nearest first; indices point into the unsorted matrix.
+        Rejected queries (see class docstring) are not searched: every column holds their
+        smallest lower bound and the first example of their closest label.
+        """
+        queries = np.asarray(queries, dtype=np.float32)
+        n, k = len(queries), n_neighbors
+        q_sq = np.einsum("ij,ij->i", queries, queries)
+        proto_dist = np.sqrt(np.maximum(q_sq[:, None] - 2.0 * (queries @ self.prototypes.T) + self._proto_sq, 0.0))
+        proto_dist[:, self.empty] = np.inf
+        m = min(n_candidates, int((~self.empty).sum()))
+        top = np.argpartition(proto_dist, m - 1, axis=1)[:, :m]
+
+        out_d = np.full((n, m * k), np.inf, dtype=np.float32)
+        out_i = np.full((n, m * k), -1, dtype=np.int64)
+        rejected = np.zeros(n, dtype=bool)
+        if reject_distance is not None:
+            bounds = np.maximum(proto_dist - self.radii, 0.0).min(axis=1)
+            rejected = bounds > reject_distance
+            nearest = proto_dist.argmin(axis=1)
+            out_d[rejected] = bounds[rejected, None]
+            out_i[rejected] = self.order[self.offsets[nearest[rejected]]][:, None]
+
+        for label in np.unique(top[~rejected]):
+            rows, slots = np.nonzero((top == label) & ~rejected[:, None])
+            lo, hi = self.offsets[label], self.offsets[label + 1]
+            sq = self._sq_norms[None, lo:hi] - 2.0 * (queries[rows] @ self._block(lo, hi).T) + q_sq[rows, None]
+            kk = min(k, hi - lo)
+            part = np.argpartition(sq, kk - 1, axis=1)[:, :kk] if kk < hi - lo else \
+                np.broadcast_to(np.arange(hi - lo), sq.shape)
+            cols = slots[:, None] * k + np.arange(kk)
+            out_d[rows[:, None], cols] = np.sqrt(np.maximum(np.take_along_axis(sq, part, axis=1), 0.0))
+            out_i[rows[:, None], cols] = self.order[lo + part]
+
+        keep = np.argsort(out_d, axis=1, kind="stable")[:, :k]
+        distances = np.take_along_axis(out_d, keep, axis=1)
+        indices = np.take_along_axis(out_i, keep, axis=1)
+
+        # Candidate labels with fewer than k examples between them: search all labels
+        short = ~rejected & (indices < 0).any(axis=1)
+        if short.any():
+            distances[short], indices[short] = self.search(queries[short], k, len(self.prototypes))
+
+        # Recompute the winners' distances from direct differences (the expansion above
+        # loses precision for near neighbours), as DotIndex does
+        searched = np.flatnonzero(~rejected & ~short)
+        if len(searched):
+            idx = indices[searched]
+            flat = idx.ravel()
+            rows = dequantize(
+                self._embeddings[flat], None if self._scales_unsorted is None else self._scales_unsorted[flat]
+            )
+            diff = rows.reshape(len(searched), k, -1) - queries[searched][:, None, :]
+            exact = np.sqrt(np.einsum("qkd,qkd->qk", diff, diff))
+            order = np.argsort(exact, axis=1, kind="stable")
+            distances[searched] = np.take_along_axis(exact, order, axis=1)
+            indices[searched] = np.take_along_axis(idx, order, axis=1)
+        return distances, indices
+
+
+def l2_normalize(vecs: np.ndarray) -> np.ndarray:
+    """
+    Scale each row to unit length (all-zero rows are left as zeros).
+    """
+    vecs = np.asarray(vecs, dtype=np.float32)
+    norms = np.linalg.norm(vecs, axis=1, keepdims=True)
+    return vecs / np.where(norms > 0, norms, 1.0)
+
+
+def make_index(backend: str = INDEX_BACKEND, **params):
+    """
+    Construct an (unfitted) neighbour index by backend name.
+    """
+    if backend not in INDEX_BACKENDS:
+        raise ValueError(f"Unknown index backend {backend!r}; choose from {sorted(INDEX_BACKENDS)}.")
+    return INDEX_BACKENDS[backend](**params)
+
+
+def index_recall(
+    index, vectors: np.ndarray, k: int = KNN_NEIGHBORS, n_queries: int = 200, seed: int = 0
+) -> Dict[str, float]:
+    """
+    Measure `index` against the exact backend on a sample of `vectors` used as queries.
+    Returns recall@k (fraction of the exact top-k that the index also returned) and the
+    mean per-query latency of both backends in milliseconds.
+    """
+    rng = np.random.default_rng(seed)
+    queries = vectors[rng.choice(len(vectors), min(n_queries, len(vectors)), replace=False)]
+    exact = ExactIndex().fit(vectors)
+
+    start = time.perf_counter()
+    _, exact_idx = exact.kneighbors(queries, n_neighbors=k)
+    exact_ms = (time.perf_counter() - start) * 1000 / len(queries)
+    start = time.perf_counter()
+    _, approx_idx = index.kneighbors(queries, n_neighbors=k)
+    approx_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    hits = sum(len(set(a) & set(e)) for a, e in zip(approx_idx.tolist(), exact_idx.tolist()))
+    return {"recall": hits / exact_idx.size, "exact_ms": exact_ms, "approx_ms": approx_ms}
+
+
 class KNNModelWrapper:
     """
-    Wraps a SentenceTransformer embedding model + a KNN classifier.
+    Wraps an embedder (see embedders.py) + a KNN classifier.
     Provides train, predict, save, and load functionality.
+    `model_name` picks the embedder and must match the saved model's; `embedder_options`
+    (threads, batch_size, max_seq_length, device) are passed to the embedder when it is loaded.
+    Neighbour search goes through a pluggable index (see INDEX_BACKENDS); `index=None`
+    means "whatever the saved model used" on load, and INDEX_BACKEND when training.
+    With metric="cosine", embeddings are L2-normalised when stored and reported distances
+    are cosine distances (1 - cosine similarity), the scale `calibrate` reports for them;
+    the index then defaults to the "dot" backend.
+    `precision` sets how the training matrix is stored (float32, float16, or int8 with
+    per-row scales in `embedding_scales`); None means "as saved" on load.
+    With `candidate_labels` = M, searches are two-stage (see CentroidPrefilter): label
+    prototypes are scored first and k-NN runs over the examples of the M closest labels
+    only, which is approximate when M is smaller than the number of labels.
     """
 
-    def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
-        self.embedder = SentenceTransformer(model_name)
-        self.knn: Optional[KNeighborsClassifier] = None
+    def __init__(
+        self,
+        model_name: str = EMBEDDER_MODEL,
+        index: Optional[str] = None,
+        index_params: Optional[dict] = None,
+        metric: Optional[str] = None,
+        precision: Optional[str] = None,
+        candidate_labels: Optional[int] = None,
+        embedder_options: Optional[dict] = None,
+    ):
+        if metric is not None and metric not in METRICS:
+            raise ValueError(f"metric must be one of {METRICS}, got {metric!r}")
+        if precision is not None and precision not in EMBEDDING_PRECISIONS:
+            raise ValueError(f"precision must be one of {EMBEDDING_PRECISIONS}, got {precision!r}")
+        if candidate_labels is not None and candidate_labels < 1:
+            raise ValueError("candidate_labels must be at least 1.")
+        self.precision = precision
+        self.candidate_labels = candidate_labels
+        self._prefilter: Optional[CentroidPrefilter] = None
+        self.model_name = model_name
+        self.embedder_options = {k: v for k, v in (embedder_options or {}).items() if v is not None}
+        self.metric = metric
+        self.index_backend = index
+        self.index_params = dict(index_params or {})
+        self._embedder = None
+        self.knn = None
         self.examples: List[str] = []
-        self.labels: List[str] = []
+        # Labels are kept as integer codes into a table of distinct label names
+        self.label_table: List[str] = []
+        self.label_codes: np.ndarray = np.empty(0, dtype=np.int32)
         self.embeddings: Optional[np.ndarray] = None
+        self.embedding_scales: Optional[np.ndarray] = None
+        # Recall of an approximate index vs exact search (see `index_recall`), measured
+        # when the model is saved and stored in the artifact; None if not measured
+        self.index_stats: Optional[Dict[str, float]] = None
+
+    @property
+    def labels(self) -> List[str]:
+        """
+        The label of each example, in example order.
+        """
+        return [self.label_table[c] for c in self.label_codes.tolist()]
+
+    def _append_labels(self, labels: List[str]) -> None:
+        index = {name: i for i, name in enumerate(self.label_table)}
+        codes = []
+        for label in labels:
+            if label not in index:
+                index[label] = len(self.label_table)
+                self.label_table.append(label)
+            codes.append(index[label])
+        self.label_codes = np.concatenate([self.label_codes, np.asarray(codes, dtype=np.int32)])
+
+    @property
+    def embedder(self):
+        """
+        The embedder, loaded on first use rather than at construction.
+        """
+        if self._embedder is None:
+            self._embedder = _load_embedder(self.model_name, **self.embedder_options)
+        return self._embedder
+
+    @property
+    def embedder_key(self) -> str:
+        """
+        Identity of the vectors this wrapper's embedder produces: the model name, plus the
+        sequence length if inputs are truncated differently from the model's default.
+        """
+        max_seq_length = self.embedder_options.get("max_seq_length")
+        return f"{self.model_name}@{max_seq_length}" if max_seq_length else self.model_name
 
     def train(self, examples: List[str], labels: List[str]) -> None:
         """
@@ -37,70 +548,322 @@ class KNNModelWrapper:
         """
         if not examples or not labels or len(examples) != len(labels):
             raise ValueError("Examples and labels must be non-empty and of the same length.")
+        self.train_embeddings(self.encode(list(examples)), labels, examples)
+
+    def train_embeddings(self, vecs: np.ndarray, labels: List[str], examples: Optional[List[str]] = None) -> None:
+        """
+        Same as `train`, for examples that are already embedded: `vecs` is raw embedder
+        output (e.g. from the embedding cache), one row per label. Without `examples`,
+        each example's text is left empty.
+        """
+        if len(vecs) == 0 or len(vecs) != len(labels):
+            raise ValueError("Embeddings and labels must be non-empty and of the same length.")
+
+        self.examples = list(examples) if examples is not None else [""] * len(vecs)
+        self.label_table = []
+        self.label_codes = np.empty(0, dtype=np.int32)
+        self._append_labels(labels)
+        self.metric = self.metric or EMBEDDING_METRIC
+        self.precision = self.precision or EMBEDDING_PRECISION
+        # Embeddings matrix of shape (n_examples, embedding_dim), stored at `precision`
+        self.embeddings, self.embedding_scales = quantize(self.normalise(vecs), self.precision)
+        # Build the neighbour index over the embeddings
+        self.index_backend = self.index_backend or ("dot" if self.metric == "cosine" else INDEX_BACKEND)
+        self._fit_index(self.index_backend, self.index_params)
+
+    def add_examples(self, examples: List[str], labels: List[str]) -> None:
+        """
+        Incrementally add labelled examples to a trained model.
+        Only the new `examples` are embedded; their vectors are appended to the stored
+        embeddings matrix and the neighbour index is refitted on the result, which gives
+        the same neighbours as a full `train` on the combined data at O(new) embedding
+        cost (the IVF backend files new vectors into its existing cells).
+        """
+        if len(examples) != len(labels):
+            raise ValueError("Examples and labels must be of the same length.")
+        if not examples:
+            return
+        if self.knn is None or self.embeddings is None:
+            self.train(list(examples), list(labels))
+            return
+
+        new_vecs, new_scales = quantize(self.normalise(self.encode(list(examples))), self.precision)
+        self.examples = list(self.examples) + list(examples)
+        self._append_labels(labels)
+        self.embeddings = np.vstack([self.embeddings, new_vecs])
+        if new_scales is not None:
+            self.embedding_scales = np.concatenate([self.embedding_scales, new_scales])
+        self.knn.add(new_vecs, scales=new_scales)
+        self._prefilter = None
+        self.index_stats = None
+
+    def _fit_index(self, backend: str, params: dict, state: Optional[Dict[str, np.ndarray]] = None) -> None:
+        self._prefilter = None
+        self.index_stats = None
+        self.knn = make_index(backend, **params).fit(self.embeddings, scales=self.embedding_scales, **(state or {}))
+
+    def embedding_matrix(self) -> np.ndarray:
+        """
+        The stored training embeddings as a float32 matrix (dequantised if needed).
+        """
+        return dequantize(self.embeddings, self.embedding_scales)
 
-        self.examples = examples
-        self.labels = labels
-        # Compute embeddings matrix of shape (n_examples, embedding_dim)
-        self.embeddings = self.embedder.encode(examples, convert_to_numpy=True)
-        # Initialize and train KNN
-        self.knn = KNeighborsClassifier(n_neighbors=KNN_NEIGHBORS)
-        self.knn.fit(self.embeddings, labels)
+    def embedding_matrix_rows(self, rows: np.ndarray) -> np.ndarray:
+        """
+        The stored embeddings of `rows` as float32, without dequantising the whole matrix.
+        """
+        return dequantize(self.embeddings[rows], None if self.embedding_scales is None else self.embedding_scales[rows])
+
+    def normalise(self, vecs: np.ndarray) -> np.ndarray:
+        """
+        Bring raw embedder output into the stored space (unit length for cosine).
+        """
+        return l2_normalize(vecs) if self.metric == "cosine" else vecs
 
     def predict_with_confidence(self, text: str) -> Tuple[str, float]:
         """
         Returns (predicted_label, mean_distance_to_neighbors).
-        Uses `kneighbors` to get distances and labels of nearest neighbors.
+        Convenience wrapper around `predict_batch` for a single text.
+        """
+        labels, distances = self.predict_batch([text])
+        return str(labels[0]), float(distances[0])
+
+    def predict_batch(
+        self, texts: List[str], batch_size: int = PREDICT_BATCH_SIZE
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Classify many texts at once.
+        Texts are encoded in length-bucketed batches (see `encode`) and searched
+        `batch_size` at a time, rather than one embedder and one `kneighbors` call per text.
+        Returns (labels, mean_distances) as two arrays of length len(texts).
+        """
+        return self.predict_embeddings(self.encode(texts), batch_size=batch_size)
+
+    def encode(self, texts: List[str], batch_size: Optional[int] = None) -> np.ndarray:
+        """
+        Embed `texts` with the embedder through the encoding scheduler (see
+        embedders.encode_scheduled). The embedder's batch_size option (--embed-batch-size)
+        caps the texts per forward pass when set, else `batch_size`, else ENCODE_MAX_BATCH.
+        Returns an (n, dim) float32 matrix.
+        """
+        if not texts:
+            return np.empty((0, self.embeddings.shape[1] if self.embeddings is not None else 0), dtype=np.float32)
+        max_items = self.embedder_options.get("batch_size") or batch_size or ENCODE_MAX_BATCH
+        return encode_scheduled(self.embedder, list(texts), max_items=max_items)
+
+    def predict_embeddings(
+        self, vecs: np.ndarray, batch_size: int = PREDICT_BATCH_SIZE, reject_above: Optional[float] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Same as `predict_batch`, but for raw vectors that are already embedded
+        (e.g. taken from the embedding cache).
+        In two-stage mode, a `reject_above` distance (the confidence threshold) lets
+        vectors with no possible neighbour within it skip the k-NN search; their reported
+        distance is a lower bound above `reject_above` (see `nearest_embeddings`).
+        """
+        return self.predict_from_neighbors(
+            *self.nearest_embeddings(vecs, KNN_NEIGHBORS, batch_size=batch_size, reject_above=reject_above)
+        )
+
+    def prefilter(self) -> CentroidPrefilter:
+        """
+        The label prototypes for two-stage search, built on first use after each change
+        to the training data.
+        """
+        if self._prefilter is None:
+            self._prefilter = CentroidPrefilter(
+                self.embeddings,
+                self.embedding_scales,
+                self.label_codes,
+                len(self.label_table),
+                normalize=self.metric == "cosine",
+            )
+        return self._prefilter
+
+    def nearest_embeddings(
+        self,
+        vecs: np.ndarray,
+        n_neighbors: int = KNN_NEIGHBORS,
+        batch_size: int = PREDICT_BATCH_SIZE,
+        reject_above: Optional[float] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find the `n_neighbors` nearest training examples of each raw vector, nearest first
+        (at most as many as there are examples).
+        Returns (distances, indices), each of shape (len(vecs), n_neighbors). Distances are
+        in the model's metric (cosine distance for cosine models); indices point into
+        `examples` / `label_codes`.
+        With `candidate_labels` set, the search is two-stage, and vectors farther than
+        `reject_above` from every label's examples are not searched at all: each of their
+        columns holds a lower bound on the distance and an example of the closest label.
         """
         if self.knn is None or self.embeddings is None:
             raise RuntimeError("Model has not been trained or loaded.")
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1.")
+        n_neighbors = min(n_neighbors, len(self.embeddings))
+        out_distances = np.empty((len(vecs), n_neighbors), dtype=np.float64)
+        out_indices = np.empty((len(vecs), n_neighbors), dtype=np.int64)
 
-        vec = self.embedder.encode([text], convert_to_numpy=True)
-        distances, indices = self.knn.kneighbors(vec, n_neighbors=KNN_NEIGHBORS)
-        # distances shape: (1, k), indices shape: (1, k)
-        distances = distances[0]  # (k,)
-        indices = indices[0]      # (k,)
-        # majority vote for label among neighbors
-        neighbor_labels = [self.labels[i] for i in indices]
-        # simple majority vote:
-        label = max(set(neighbor_labels), key=neighbor_labels.count)
+        two_stage = self.candidate_labels is not None
+        if two_stage and reject_above is not None:
+            # Stored-space Euclidean distance; for unit vectors 1 - cos = |a - b|^2 / 2
+            reject_above = float(np.sqrt(2 * reject_above)) if self.metric == "cosine" else reject_above
+        for start in range(0, len(vecs), batch_size):
+            chunk = self.normalise(vecs[start:start + batch_size])
+            if two_stage:
+                distances, indices = self.prefilter().search(
+                    chunk, n_neighbors, self.candidate_labels, reject_distance=reject_above
+                )
+            else:
+                distances, indices = self.knn.kneighbors(chunk, n_neighbors=n_neighbors)
+            if self.metric == "cosine":
+                # For unit vectors, |a - b|^2 / 2 == 1 - cos(a, b)
+                distances = distances ** 2 / 2
+            out_distances[start:start + len(chunk)] = distances
+            out_indices[start:start + len(chunk)] = indices
+        return out_distances, out_indices
+
+    def predict_from_neighbors(self, distances: np.ndarray, indices: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (labels, mean_distances) from the output of `nearest_embeddings`. Only the first
+        KNN_NEIGHBORS columns vote, so one wider search can serve both predictions and
+        nearest-example lookups.
+        """
+        distances, indices = distances[:, :KNN_NEIGHBORS], indices[:, :KNN_NEIGHBORS]
+        label_names = np.asarray(self.label_table, dtype=object)
+        # distances, indices shape: (n, k)
+        winners = _vote(self.label_codes[indices], len(label_names))
         # measure confidence as average distance
-        mean_dist = float(np.mean(distances))
-        return label, mean_dist
+        return label_names[winners], distances.mean(axis=1)
 
-    def save(self, model_path: Path = Path(MODEL_FILE), embeddings_path: Path = Path(EMBEDDINGS_FILE)) -> None:
+    def save(self, path: Path = Path(MODEL_ARTIFACT_FILE)) -> None:
         """
-        Persist the trained KNN model and the embeddings/labels to disk.
+        Persist the trained model as a single artifact (see artifact.py): the embeddings
+        matrix at its storage precision (plus per-row scales for int8), label codes and any
+        index state as raw arrays, plus a header holding the label table, examples, metric,
+        index backend and the embedder model name. An approximate index has its recall
+        measured here (once per change of the model) and stored with it. The written file
+        is read back and checked against its checksums, since `load` skips that check.
         """
         if self.knn is None or self.embeddings is None:
             raise RuntimeError("Nothing to save; model is not trained.")
 
-        # Save KNN classifier (which includes examples order implicitly via embeddings)
-        joblib.dump(self.knn, model_path)
-        # Save embeddings so that we can potentially inspect them later
-        np.save(embeddings_path, self.embeddings)
-        # Save examples & labels (in case we need to reload them)
-        meta = {"examples": self.examples, "labels": self.labels}
-        Path("model_metadata.json").write_text(json.dumps(meta, indent=2), encoding="utf-8")
+        if self.knn.approximate and self.index_stats is None:
+            self.index_stats = index_recall(self.knn, self.embedding_matrix())
+        header = {
+            "model_name": self.model_name,
+            "metric": self.metric,
+            "index": {"backend": self.knn.name, "params": self.knn.get_params(), "recall": self.index_stats},
+            "label_table": self.label_table,
+            "examples": self.examples,
+        }
+        arrays = {"embeddings": self.embeddings, "label_codes": self.label_codes}
+        if self.embedding_scales is not None:
+            arrays["embedding_scales"] = self.embedding_scales
+        arrays.update({f"index.{name}": arr for name, arr in self.knn.state_arrays().items()})
+        write_artifact(path, header, arrays)
+        read_artifact(path, verify=True)
+
+    def load(self, path: Path = Path(MODEL_ARTIFACT_FILE), verify: bool = False) -> None:
+        """
+        Load a model saved by `save`. The embeddings are memory-mapped rather than read,
+        and every backend searches them in place with the index state saved next to them,
+        so this is near-instant and processes sharing one artifact share its pages.
+        Requesting a different index, its parameters or precision rebuilds the index.
+        Falls back to the legacy knn_model.joblib + embeddings.npy + model_metadata.json
+        files when `path` does not exist. Raises ValueError (ArtifactError) if the artifact
+        is corrupt, or was built with a different embedder model or metric than requested.
+        """
+        path = Path(path)
+        if not path.exists() and Path(MODEL_FILE).exists():
+            self._load_legacy(Path(MODEL_FILE), Path(EMBEDDINGS_FILE))
+            return
+        if not path.exists():
+            raise FileNotFoundError(f"No saved model found at {path}.")
+
+        header, arrays = read_artifact(path, verify=verify)
+        if header.get("model_name") != self.model_name:
+            raise ArtifactError(
+                f"Saved model was built with embedder {header.get('model_name')!r}, not {self.model_name!r}."
+            )
+        self._check_metric(header.get("metric", "euclidean"))
+
+        requantised = self._set_embeddings(arrays["embeddings"], arrays.get("embedding_scales"))
+        self.label_codes = arrays["label_codes"]
+        self.label_table = list(header["label_table"])
+        self.examples = list(header["examples"])
+
+        index_info = header.get("index", {})
+        stored = index_info.get("backend")
+        wanted = self.index_backend or stored or INDEX_BACKEND
+        if stored == wanted and not self.index_params and not requantised:
+            # The saved index state matches the stored rows, so nothing is rebuilt
+            state = {k[len("index."):]: v for k, v in arrays.items() if k.startswith("index.")}
+            self._fit_index(wanted, index_info.get("params", {}), state)
+            self.index_stats = index_info.get("recall")
+        else:
+            self._fit_index(wanted, self.index_params)
+        self.index_backend = wanted
+
+    def _set_embeddings(self, data: np.ndarray, scales: Optional[np.ndarray]) -> bool:
+        """
+        Adopt a loaded matrix, re-quantising it only if a different precision was requested.
+        Returns whether it was re-quantised.
+        """
+        stored = precision_of(data)
+        if self.precision is None or self.precision == stored:
+            self.precision = stored
+            self.embeddings, self.embedding_scales = data, scales
+            return False
+        self.embeddings, self.embedding_scales = quantize(dequantize(data, scales), self.precision)
+        return True
+
+    def _check_metric(self, stored_metric: str) -> None:
+        if self.metric is not None and self.metric != stored_metric:
+            raise ValueError(
+                f"Saved model uses the {stored_metric} metric; retrain to switch to {self.metric}."
+            )
+        self.metric = stored_metric
+
+    def _load_legacy(self, model_path: Path, embeddings_path: Path) -> None:
+      """
+      Load the pre-artifact format. model_metadata.json is looked for next to the model
+      file, then in the current directory.
+      """
+      import joblib
 
-    def load(self, model_path: Path = Path(MODEL_FILE), embeddings_path: Path = Path(EMBEDDINGS_FILE)) -> None:
       if not model_path.exists():
           raise FileNotFoundError(f"No saved model found at {model_path}.")
       self.knn = joblib.load(model_path)
 
       if embeddings_path.exists():
-          self.embeddings = np.load(embeddings_path)
+          self.precision = self.precision or EMBEDDING_PRECISION
+          self.embeddings, self.embedding_scales = quantize(np.load(embeddings_path), self.precision)
       else:
           raise FileNotFoundError(f"No embeddings file found at {embeddings_path}.")
 
-      meta_path = Path("model_metadata.json")
+      meta_path = model_path.parent / METADATA_FILE
+      if not meta_path.exists():
+          meta_path = Path(METADATA_FILE)
       if meta_path.exists():
           meta = json.loads(meta_path.read_text(encoding="utf-8"))
           self.examples = meta.get("examples", [])
-          self.labels   = meta.get("labels", [])
+          self.label_table = []
+          self.label_codes = np.empty(0, dtype=np.int32)
+          self._append_labels(meta.get("labels", []))
+          stored_metric = meta.get("metric", "euclidean")
       else:
           raise FileNotFoundError("model_metadata.json is missing; cannot load labels/examples.")
 
+      self._check_metric(stored_metric)
 
+      # The pickled object may be a KNeighborsClassifier (before pluggable indexes) or an
+      # index from an older layout, so the index is always rebuilt from the embeddings.
+      stored = getattr(self.knn, "name", None)
+      wanted = self.index_backend or stored or INDEX_BACKEND
+      self._fit_index(wanted, self.index_params)
+      self.index_backend = wanted
 
     def is_trained(self) -> bool:
         return self.knn is not None
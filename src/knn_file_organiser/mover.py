@@ -0,0 +1,318 @@
+import itertools
+import json
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from . import profiling
+from .config import MOVE_JOURNAL_FILE, MOVE_WORKERS
+from .io_utils import unique_target
+
+# Journal records are JSON lines of the form {"run": <run id>, "event": <event>, ...}:
+#   start  – a run began; "kind" is "organise" or "undo" ("of" names the run being undone)
+#   move   – about to move "src" to "dst" (written before the file is touched)
+#   done   – that move completed
+#   failed – that move failed with "error"
+#   end    – the run finished; every move it started has a done/failed record
+
+
+class MoveJournal:
+    """
+    Append-only log of every file move, one JSON record per line.
+    Records are flushed as they are written, so after a crash the journal shows which
+    moves were in flight (see `recover_journal`) and which completed (see `undo_run`).
+    Safe to append to from several threads.
+    """
+
+    def __init__(self, path: Path = Path(MOVE_JOURNAL_FILE)):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._file = None
+
+    def append(self, record: dict) -> None:
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, "a", encoding="utf-8")
+                # Start on a fresh line after a torn record
+                if self._file.tell():
+                    with open(self.path, "rb") as f:
+                        f.seek(-1, os.SEEK_END)
+                        if f.read(1) != b"\n":
+                            self._file.write("\n")
+            self._file.write(line)
+            self._file.flush()
+
+    def __iter__(self) -> Iterator[dict]:
+        """
+        The records in the journal, oldest first, read a line at a time so the journal
+        never has to fit in memory. A torn line (from a crash while it was being written)
+        is skipped.
+        """
+        if not self.path.exists():
+            return
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+    def read(self) -> List[dict]:
+        """
+        All records in the journal, oldest first (see `__iter__`).
+        """
+        return list(self)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+                self._file.close()
+                self._file = None
+
+
+_run_counter = itertools.count(1)
+
+
+def new_run_id() -> str:
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{next(_run_counter)}"
+
+
+class MoveExecutor:
+    """
+    Moves files on a thread pool, recording each move in a `MoveJournal`.
+    Target names are chosen when a move is submitted: a name that already exists in the
+    target directory, or that an earlier pending move will take, gets a " (n)" suffix
+    instead of being overwritten. Each target directory is created once per run, and
+    `targets` maps each submitted file to its target path (unless `track_targets` is
+    False). With `max_pending`, `submit` blocks while that many moves are queued, so
+    memory stays bounded however many files a run moves.
+    Failed moves are reported as they happen and only counted (`failed`).
+    `close()` waits for all moves, ends the run in the journal and prints throughput.
+    """
+
+    def __init__(
+        self,
+        dest: Optional[Path],
+        journal: Optional[MoveJournal] = None,
+        workers: int = MOVE_WORKERS,
+        kind: str = "organise",
+        max_pending: Optional[int] = None,
+        track_targets: bool = True,
+        **run_info,
+    ):
+        self.dest = dest
+        self.track_targets = track_targets
+        self.journal = journal
+        self.run_id = new_run_id()
+        self.moved = 0
+        self.bytes_moved = 0
+        self.failed = 0
+        self.targets: Dict[Path, Path] = {}
+        self._lock = threading.Lock()
+        self._dirs = set()
+        self._reserved = set()
+        self._pool = ThreadPoolExecutor(max_workers=workers) if workers > 0 else None
+        self._slots = threading.BoundedSemaphore(max_pending) if max_pending and self._pool is not None else None
+        self._start = time.perf_counter()
+        self._record("start", kind=kind, dest=None if dest is None else str(dest), **run_info)
+
+    def _record(self, event: str, **fields) -> None:
+        if self.journal is not None:
+            self.journal.append({"run": self.run_id, "event": event, **fields})
+
+    def _ensure_dir(self, directory: Path) -> None:
+        if directory not in self._dirs:
+            directory.mkdir(parents=True, exist_ok=True)
+            self._dirs.add(directory)
+
+    def submit(self, file_path: Path, category: str) -> Path:
+        """
+        Queue a move of `file_path` into `dest / category`. Returns the path it will have.
+        """
+        target_dir = self.dest / category
+        self._ensure_dir(target_dir)
+        target = unique_target(target_dir, file_path.name, self._reserved)
+        self._submit(file_path, target)
+        return target
+
+    def submit_to(self, file_path: Path, target: Path) -> None:
+        """
+        Queue a move of `file_path` to exactly `target`. The move fails, rather than
+        overwriting, if `target` already exists.
+        """
+        self._ensure_dir(target.parent)
+        if os.path.lexists(target) or target in self._reserved:
+            self._fail(file_path, target, "target already exists")
+            return
+        self._reserved.add(target)
+        self._submit(file_path, target)
+
+    def _submit(self, src: Path, dst: Path) -> None:
+        if self.track_targets:
+            self.targets[src] = dst
+        if self._pool is None:
+            self._move(src, dst)
+        else:
+            if self._slots is not None:
+                self._slots.acquire()
+            self._pool.submit(self._move, src, dst)
+
+    def _move(self, src: Path, dst: Path) -> None:
+        try:
+            self._move_file(src, dst)
+        finally:
+            # Once moved, the file itself holds its name; a failed move frees it
+            with self._lock:
+                self._reserved.discard(dst)
+            if self._slots is not None:
+                self._slots.release()
+
+    def _move_file(self, src: Path, dst: Path) -> None:
+        self._record("move", src=str(src), dst=str(dst))
+        start = time.perf_counter()
+        try:
+            size = os.lstat(src).st_size
+            shutil.move(str(src), str(dst))
+        except Exception as e:
+            self._fail(src, dst, str(e))
+            return
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.moved += 1
+            self.bytes_moved += size
+            profiling.observe("move", elapsed)
+            profiling.add_time("move", elapsed)
+            profiling.count("files_moved")
+            profiling.count("bytes_moved", size)
+        self._record("done", src=str(src), dst=str(dst))
+
+    def _fail(self, src: Path, dst: Path, error: str) -> None:
+        with self._lock:
+            self.failed += 1
+            profiling.count("move_failures")
+            print(f"[ERROR] Unable to move {src} → {dst}: {error}")
+        self._record("failed", src=str(src), dst=str(dst), error=error)
+
+    def close(self) -> Dict[str, float]:
+        """
+        Wait for queued moves to finish, end the run and report on it.
+        Returns the run's stats (moved, failed, bytes, seconds).
+        """
+        if self._pool is not None:
+            with profiling.stage("move_wait"):
+                self._pool.shutdown(wait=True)
+            self._pool = None
+        elapsed = time.perf_counter() - self._start
+        self._record("end", moved=self.moved, failed=self.failed)
+        if self.journal is not None:
+            self.journal.close()
+        if self.moved or self.failed:
+            rate = self.moved / elapsed if elapsed > 0 else 0.0
+            print(
+                f"[INFO] Moved {self.moved} file(s), {self.bytes_moved / 1e6:.1f} MB in {elapsed:.2f}s "
+                f"({rate:.1f} files/s); {self.failed} failed."
+            )
+        return {"moved": self.moved, "failed": self.failed, "bytes": self.bytes_moved, "seconds": elapsed}
+
+    def __enter__(self) -> "MoveExecutor":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def recover_journal(journal: MoveJournal) -> int:
+    """
+    Finish the moves of runs that were interrupted (no "end" record).
+    A move that was in flight is completed if its source still exists (replacing any
+    partial copy at its target, which was unused when the move was planned) and marked
+    done if only the target exists. Returns the number of moves resolved.
+    """
+    # One pass over the journal: only runs that have not ended are tracked, and only
+    # their moves without a done/failed record, so memory does not grow with the journal
+    open_runs: Dict[str, Set[Tuple[str, str]]] = {}
+    for r in journal:
+        run_id, event = r["run"], r["event"]
+        if event == "start":
+            open_runs[run_id] = set()
+        elif event == "end":
+            open_runs.pop(run_id, None)
+        elif run_id in open_runs:
+            if event == "move":
+                open_runs[run_id].add((r.get("src"), r.get("dst")))
+            elif event in ("done", "failed"):
+                open_runs[run_id].discard((r.get("src"), r.get("dst")))
+    in_flight = [(run_id, src, dst) for run_id, moves in open_runs.items() for src, dst in moves]
+
+    for run_id, src, dst in in_flight:
+        record = {"run": run_id, "src": src, "dst": dst}
+        if os.path.lexists(src):
+            try:
+                shutil.move(src, dst)
+                journal.append(dict(record, event="done"))
+            except Exception as e:
+                journal.append(dict(record, event="failed", error=str(e)))
+        elif os.path.lexists(dst):
+            journal.append(dict(record, event="done"))
+        else:
+            journal.append(dict(record, event="failed", error="file missing at source and target"))
+    for run_id in open_runs:
+        journal.append({"run": run_id, "event": "end", "recovered": True})
+    journal.close()
+    if in_flight:
+        print(f"[INFO] Recovered {len(in_flight)} interrupted move(s) from {journal.path}.")
+    return len(in_flight)
+
+
+def undo_run(journal: MoveJournal, run_id: Optional[str] = None, workers: int = MOVE_WORKERS) -> Dict[str, float]:
+    """
+    Move every file of an organise run back to where it came from, newest move first.
+    `run_id` defaults to the most recent organise run that has not been undone.
+    The undo is journaled as a run of its own; files whose original path is taken again
+    are left in place and reported as failures. Directories emptied by the undo are removed.
+    """
+    recover_journal(journal)
+    # Two streaming passes: run starts first, then the moves of the run being undone
+    starts = [r for r in journal if r["event"] == "start"]
+    undone = {r.get("of") for r in starts if r.get("kind") == "undo"}
+    if run_id is None:
+        candidates = [r["run"] for r in starts if r.get("kind") == "organise" and r["run"] not in undone]
+        if not candidates:
+            print(f"[INFO] Nothing to undo in {journal.path}.")
+            return {"moved": 0, "failed": 0, "bytes": 0, "seconds": 0.0}
+        run_id = candidates[-1]
+    elif not any(r["run"] == run_id for r in starts):
+        raise ValueError(f"No run {run_id!r} in {journal.path}.")
+
+    # Moves already reversed by an earlier (partial) undo of this run
+    undo_runs = {r["run"] for r in starts if r.get("of") == run_id}
+    done_moves, reversed_moves = [], set()
+    for r in journal:
+        if r["event"] != "done":
+            continue
+        if r["run"] == run_id:
+            done_moves.append((r["src"], r["dst"]))
+        elif r["run"] in undo_runs:
+            reversed_moves.add(r["src"])
+    moves = [(Path(src), Path(dst)) for src, dst in done_moves if dst not in reversed_moves]
+
+    print(f"[INFO] Undoing run {run_id}: {len(moves)} move(s).")
+    executor = MoveExecutor(None, journal, workers=workers, kind="undo", of=run_id)
+    try:
+        for src, dst in reversed(moves):
+            executor.submit_to(dst, src)
+    finally:
+        stats = executor.close()
+    for directory in sorted({dst.parent for _, dst in moves}, key=lambda p: len(p.parts), reverse=True):
+        try:
+            directory.rmdir()
+        except OSError:
+            pass
+    return stats
@@ -1,117 +1,780 @@
 import os
 import json
+import tempfile
+import time
+from dataclasses import dataclass
 from pathlib import Path
-from typing import List
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional, Tuple
 
+import numpy as np
+
+from . import profiling
+from .cache import EmbeddingCache
 from .config import (
-    DEFAULT_THRESHOLD,
     DEFAULT_DEST,
     UNCATEGORISED_LABEL,
+    DUPLICATES_LABEL,
+    LABELS_FILE,
+    PREDICT_BATCH_SIZE,
+    CACHE_FILE,
+    MODEL_ARTIFACT_FILE,
+    MODEL_FILE,
+    EXTRACT_WORKERS,
+    EXTRACT_TIMEOUT,
+    EMBEDDING_PRECISION,
+    EMBEDDER_MODEL,
+    MOVE_WORKERS,
+    MOVE_JOURNAL_FILE,
+    WATCH_INTERVAL,
+    WATCH_DEBOUNCE,
+    STREAM_QUEUE_FILE,
+    STREAM_MAX_PENDING_MOVES,
+    default_threshold,
 )
+from .clustering import cluster_embeddings, representatives
+from .dedup import DuplicateFinder, NearDuplicateIndex, hard_link_copies
+from .extractors import EXTRACTOR_VERSION, char_budget
 from .io_utils import (
-    list_all_files,
-    extract_text_from_file,
-    move_file_to_category,
+    iter_files,
     load_or_initialize_labels,
-    append_to_labels_json,
 )
+from .label_queue import LabelQueue
+from .label_store import LabelStore
 from .model_utils import KNNModelWrapper
+from .mover import MoveExecutor, MoveJournal, recover_journal
+from .pipeline import extract_stream
+from .watcher import exclude_dest, watch_changes
 
 
-def run_organiser(
-    source: Path,
-    dest: Path,
-    threshold: float = DEFAULT_THRESHOLD,
-    dry_run: bool = False,
-    retrain: bool = False,
-) -> None:
+def _batched(items: Iterable, size: int) -> Iterator[list]:
     """
-    1. Load or initialize (examples, labels).
-    2. Train (if --retrain) or load existing KNN model (with embeddings and metadata).
-    3. Scan ALL files under `source` and compute (predicted_label, mean_distance) for each.
-       - If mean_distance <= threshold: move immediately to <dest>/<predicted_label>
-       - If mean_distance > threshold: collect into to_label list (DO NOT move yet)
-    4. Once the confident files are moved, prompt you to label each file in to_label (while it still resides under source):
-       - If you type a new label: move that file from source → dest/<new_label> and append to labels.json
-       - If you press Enter (skip): move that file from source → dest/Uncategorised
+    Yield successive lists of at most `size` items from `items`.
+    """
+    it = iter(items)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _lookup_cache(files: Iterable[Path], cache: Optional[EmbeddingCache], batch_size: int) -> Iterator[tuple]:
+    """
+    Yield (file_path, cached_entry_or_None) for each file, querying the cache in batches.
+    """
+    for batch in _batched(files, batch_size):
+        profiling.count("files", len(batch))
+        if cache is not None:
+            with profiling.stage("cache_lookup"):
+                hits = cache.get_many(batch)
+            profiling.count("cache_hits", sum(hit is not None for hit in hits))
+        else:
+            hits = [None] * len(batch)
+        yield from zip(batch, hits)
+
+
+def _embed_stream(
+    files: Iterable[Path],
+    knn_wrapper: KNNModelWrapper,
+    cache: Optional[EmbeddingCache],
+    batch_size: int,
+    workers: int,
+    extract_timeout: float,
+    max_chars: Optional[int] = None,
+) -> Iterator[Tuple[List[Path], np.ndarray]]:
+    """
+    Yield (batch_of_files, embedding_matrix) pairs, `batch_size` files at a time.
+    Files with a fresh cache entry skip text extraction and the embedder entirely;
+    the rest are extracted by the pipeline's extraction stage (in parallel when
+    `workers` > 0), embedded in one batch, and written back to the cache.
+    """
+    stream = extract_stream(
+        _lookup_cache(files, cache, batch_size),
+        workers=workers,
+        timeout=extract_timeout,
+        prefetch=2 * batch_size,
+        max_chars=max_chars,
+    )
+    for batch in _batched(stream, batch_size):
+        misses = [i for i, (_, hit, _) in enumerate(batch) if hit is None]
+        texts = [batch[i][2] for i in misses]
+        start = time.perf_counter()
+        new_vecs = knn_wrapper.encode(texts, batch_size=batch_size)
+        if texts:
+            elapsed = time.perf_counter() - start
+            profiling.add_time("encode", elapsed)
+            # Texts are encoded together, so each one is charged an equal share of the batch
+            for _ in texts:
+                profiling.observe("encode", elapsed / len(texts))
+
+        rows = [hit[1] if hit is not None else None for _, hit, _ in batch]
+        for i, vec in zip(misses, new_vecs):
+            rows[i] = vec
+        if cache is not None and misses:
+            with profiling.stage("cache_write"):
+                cache.put_many([(batch[i][0], text, vec) for i, text, vec in zip(misses, texts, new_vecs)])
+        yield [file_path for file_path, _, _ in batch], np.vstack(rows)
+
+
+def _cache_model_key(knn_wrapper: KNNModelWrapper, max_chars: int) -> str:
+    """
+    Embedding cache key for the embedder plus the extraction settings, so changing the
+    extractors or the token budget re-extracts files instead of reusing stale text.
+    """
+    return f"{knn_wrapper.embedder_key}|x{EXTRACTOR_VERSION}:{max_chars}"
+
+
+@dataclass
+class RunOptions:
+    """
+    Settings shared by organising, watching, sharded runs and calibration: which model
+    to build or load, how files are scanned, extracted and embedded, and how they are
+    moved. cli.py builds one from the command line; the defaults are the CLI's.
+    """
+    # The model (see KNNModelWrapper and `prepare_model`); a threshold of None means the
+    # default for the model's metric
+    model_name: str = EMBEDDER_MODEL
+    embedder_options: Optional[dict] = None
+    index: Optional[str] = None
+    index_params: Optional[dict] = None
+    metric: Optional[str] = None
+    precision: Optional[str] = None
+    candidate_labels: Optional[int] = None
+    retrain: bool = False
+    threshold: Optional[float] = None
+    # Extraction and embedding (see `_embed_stream`)
+    batch_size: int = PREDICT_BATCH_SIZE
+    use_cache: bool = True
+    cache_path: Path = Path(CACHE_FILE)
+    workers: int = EXTRACT_WORKERS
+    extract_timeout: float = EXTRACT_TIMEOUT
+    token_budget: Optional[int] = None
+    # Which files are scanned (see io_utils.iter_files)
+    include: Optional[List[str]] = None
+    exclude: Optional[List[str]] = None
+    extensions: Optional[List[str]] = None
+    max_depth: Optional[int] = None
+    symlinks: str = "files"
+    # Moves (see mover.py)
+    dry_run: bool = False
+    move_workers: int = MOVE_WORKERS
+    journal_path: Path = Path(MOVE_JOURNAL_FILE)
+
+    @property
+    def max_chars(self) -> int:
+        return char_budget(self.token_budget)
+
+    def make_model(self) -> KNNModelWrapper:
+        """
+        The model these options describe, not yet loaded or trained.
+        """
+        return KNNModelWrapper(
+            model_name=self.model_name,
+            index=self.index,
+            index_params=self.index_params,
+            metric=self.metric,
+            precision=self.precision,
+            candidate_labels=self.candidate_labels,
+            embedder_options=self.embedder_options,
+        )
+
+    def open_cache(self, knn_wrapper: KNNModelWrapper) -> Optional[EmbeddingCache]:
+        """
+        The embedding cache for `knn_wrapper`'s vectors, or None if `use_cache` is off.
+        """
+        if not self.use_cache:
+            return None
+        return EmbeddingCache(
+            self.cache_path,
+            model_name=_cache_model_key(knn_wrapper, self.max_chars),
+            precision=self.precision or EMBEDDING_PRECISION,
+        )
+
+
+def _resolve_pending(
+    pending: List[Tuple[Path, np.ndarray]],
+    knn_wrapper: KNNModelWrapper,
+    threshold: float,
+    mover: Optional[MoveExecutor],
+    dry_run: bool,
+) -> List[Tuple[Path, np.ndarray]]:
+    """
+    Re-classify files still waiting for a manual label using their stored embeddings.
+    Files that are now within `threshold` are queued on `mover` for their predicted
+    category; the rest are returned, in order, to keep waiting.
     """
+    if not pending:
+        return pending
+    predicted_labels, mean_distances = knn_wrapper.predict_embeddings(
+        np.vstack([vec for _, vec in pending]), reject_above=threshold
+    )
+    still_pending = []
+    for (file_path, vec), predicted_label, mean_distance in zip(pending, predicted_labels, mean_distances):
+        if mean_distance > threshold:
+            still_pending.append((file_path, vec))
+        elif dry_run:
+            print(f"  [DRY-RUN] {file_path.name} → [{predicted_label}] (learned)")
+        else:
+            print(f"  [INFO] {file_path.name} → [{predicted_label}] (learned)")
+            mover.submit(file_path, str(predicted_label))
+    return still_pending
 
+
+def _label_one_by_one(
+    pending: List[Tuple[Path, np.ndarray]],
+    knn_wrapper: KNNModelWrapper,
+    threshold: float,
+    mover: Optional[MoveExecutor],
+    dry_run: bool,
+    label_store: Optional[LabelStore],
+) -> bool:
+    """
+    Prompt for a label for each file in `pending`. A new label moves the file to
+    <dest>/<label>, is stored, and is learned straight away, after which the files still
+    waiting are re-checked (see `_resolve_pending`); Enter sends the file to
+    Uncategorised. Returns whether the model learned anything.
+    """
+    model_changed = False
+    while pending:
+        file_path, _ = pending[0]
+        pending = pending[1:]
+        print(f"\nFile: {file_path.name}")
+        new_label = input("  Enter a label (or press Enter to skip → send to 'Uncategorised'): ").strip()
+        if new_label:
+            # Move from source → dest/<new_label> and save to labels.json
+            is_new = True
+            if dry_run:
+                print(f"  [DRY-RUN] {file_path.name} → [{new_label}]")
+            else:
+                mover.submit(file_path, new_label)
+                # False if this exact (name, label) pair is already stored
+                is_new = label_store.append(file_path.name, new_label)
+            if is_new:
+                # Learn from the answer straight away, then re-check the files still waiting
+                knn_wrapper.add_examples([file_path.name], [new_label])
+                model_changed = True
+                pending = _resolve_pending(pending, knn_wrapper, threshold, mover, dry_run)
+        else:
+            # Move from source → dest/Uncategorised
+            if dry_run:
+                print(f"  [DRY-RUN] {file_path.name} → [{UNCATEGORISED_LABEL}]")
+            else:
+                mover.submit(file_path, UNCATEGORISED_LABEL)
+    return model_changed
+
+
+def _label_pending(
+    pending: List[Tuple[Path, np.ndarray]],
+    knn_wrapper: KNNModelWrapper,
+    threshold: float,
+    mover: Optional[MoveExecutor],
+    dry_run: bool,
+    label_store: Optional[LabelStore],
+    group_labels: bool = False,
+) -> bool:
+    """
+    Offer `pending` files for labelling: as groups first with `group_labels` (see
+    `_label_groups`), then one by one. Returns whether the model learned anything.
+    """
+    model_changed = False
+    if group_labels and len(pending) > 1:
+        pending, model_changed = _label_groups(pending, knn_wrapper, threshold, mover, dry_run, label_store)
+    return _label_one_by_one(pending, knn_wrapper, threshold, mover, dry_run, label_store) or model_changed
+
+
+def _label_queue(
+    queue: LabelQueue,
+    knn_wrapper: KNNModelWrapper,
+    threshold: float,
+    mover: Optional[MoveExecutor],
+    dry_run: bool,
+    label_store: Optional[LabelStore],
+    group_labels: bool = False,
+) -> bool:
+    """
+    Labelling phase of a streaming run: the on-disk queue is offered a page at a time,
+    each page as an in-memory run offers its whole list (see `_label_pending`). After a
+    page that taught the model something, the rest of the queue is re-checked page by
+    page and files it now classifies within `threshold` are moved. Returns whether the model learned anything.
+    """
+    model_changed = False
+    for page in queue.pages():
+        page_changed = _label_pending(page, knn_wrapper, threshold, mover, dry_run, label_store, group_labels)
+        queue.remove(file_path for file_path, _ in page)
+        if page_changed:
+            model_changed = True
+            for rest in queue.pages():
+                still = {file_path for file_path, _ in _resolve_pending(rest, knn_wrapper, threshold, mover, dry_run)}
+                queue.remove(file_path for file_path, _ in rest if file_path not in still)
+    return model_changed
+
+
+def _label_groups(
+    pending: List[Tuple[Path, np.ndarray]],
+    knn_wrapper: KNNModelWrapper,
+    threshold: float,
+    mover: Optional[MoveExecutor],
+    dry_run: bool,
+    label_store: Optional[LabelStore],
+) -> Tuple[List[Tuple[Path, np.ndarray]], bool]:
+    """
+    Offer the files waiting for a label as groups of similar files (see clustering.py),
+    largest first, with one prompt per group showing its most typical filenames.
+    A label applies to the whole group: its files are queued for <dest>/<label>, their
+    names go to the label store in one batch and the model learns them together, after
+    which the files still waiting are re-checked as in `_resolve_pending`. Enter sends the
+    group to Uncategorised; "?" leaves its files to be asked about one at a time.
+    Returns (files to ask about one at a time, whether the model learned anything).
+    """
+    with profiling.stage("clustering"):
+        vecs = knn_wrapper.normalise(np.vstack([vec for _, vec in pending]))
+        groups = [[pending[i] for i in rows] for rows in cluster_embeddings(vecs, threshold, knn_wrapper.metric)]
+    individual: List[Tuple[Path, np.ndarray]] = []
+    model_changed = False
+    while groups and len(groups[0]) > 1:
+        group = groups.pop(0)
+        group_vecs = knn_wrapper.normalise(np.vstack([vec for _, vec in group]))
+        shown = representatives(group_vecs, np.arange(len(group)), metric=knn_wrapper.metric)
+        print(f"\nGroup of {len(group)} similar files:")
+        for i in shown:
+            print(f"  {group[i][0].name}")
+        if len(group) > len(shown):
+            print(f"  ... and {len(group) - len(shown)} more")
+        answer = input(
+            f"  Enter a label for all of them (Enter → '{UNCATEGORISED_LABEL}', ? → label them one by one): "
+        ).strip()
+        if answer == "?":
+            individual.extend(group)
+            continue
+        category = answer or UNCATEGORISED_LABEL
+        for file_path, _ in group:
+            if dry_run:
+                print(f"  [DRY-RUN] {file_path.name} → [{category}]")
+            else:
+                mover.submit(file_path, category)
+        if not answer:
+            continue
+        names = list(dict.fromkeys(file_path.name for file_path, _ in group))
+        if label_store is not None:
+            names = [name for name in names if (name, answer) not in label_store]
+            label_store.extend(names, [answer] * len(names))
+        if names:
+            knn_wrapper.add_examples(names, [answer] * len(names))
+            model_changed = True
+            waiting = individual + [item for g in groups for item in g]
+            still = {file_path for file_path, _ in _resolve_pending(waiting, knn_wrapper, threshold, mover, dry_run)}
+            individual = [item for item in individual if item[0] in still]
+            groups = [kept for kept in ([item for item in g if item[0] in still] for g in groups) if kept]
+            groups.sort(key=len, reverse=True)
+    # Files that matched no other file are asked about on their own
+    return individual + [item for g in groups for item in g], model_changed
+
+
+def _place_duplicates(
+    duplicates: List[Tuple[Path, Path, bool]],
+    policy: str,
+    mover: Optional[MoveExecutor],
+    dry_run: bool,
+) -> List[Tuple[Path, Path]]:
+    """
+    Handle (file, original, exact) duplicates once their originals have been queued:
+      skip – leave the file where it is
+      move – move it to <dest>/Duplicates
+      link – move it into its original's category folder; exact copies are hard-linked
+             to the original once the moves finish (see `dedup.hard_link_copies`)
+    A "link" duplicate whose original was not moved goes to Duplicates instead.
+    Returns the (original_target, copy_target) pairs to hard-link.
+    """
+    link_pairs = []
+    for file_path, original, exact in duplicates:
+        kind = "duplicate" if exact else "near-duplicate"
+        if policy == "skip":
+            print(f"[INFO] {file_path.name} is a {kind} of {original.name}; left in place.")
+            continue
+        if policy == "link" and dry_run:
+            print(f"[DRY-RUN] {file_path.name} → [same folder as {original.name}] ({kind})")
+            continue
+        original_target = None if mover is None else mover.targets.get(original)
+        if policy == "link" and original_target is not None:
+            target = mover.submit(file_path, str(original_target.parent.relative_to(mover.dest)))
+            if exact:
+                link_pairs.append((original_target, target))
+        elif dry_run:
+            print(f"[DRY-RUN] {file_path.name} → [{DUPLICATES_LABEL}] ({kind} of {original.name})")
+        else:
+            mover.submit(file_path, DUPLICATES_LABEL)
+    return link_pairs
+
+
+def prepare_model(knn_wrapper: KNNModelWrapper, retrain: bool = False, read_only: bool = False) -> None:
+    """
+    Load or initialize (examples, labels), then train `knn_wrapper` (if `retrain` or no saved
+    model exists) or load the saved model into it, picking up any examples appended to
+    labels.json since it was saved.
+    With `read_only`, the saved model is never written: a model that has to be trained or
+    extended only exists in memory, and a saved model built with a different embedder or
+    metric than requested raises ValueError instead of being retrained.
+    """
     # 1. Load or initialize labels
     examples, labels = load_or_initialize_labels()
-
-    knn_wrapper = KNNModelWrapper()
-    model_exists = Path("knn_model.joblib").exists()
+    model_exists = Path(MODEL_ARTIFACT_FILE).exists() or Path(MODEL_FILE).exists()
 
     # 2. Train or load
+    if model_exists and not retrain:
+        print("[INFO] Loading existing KNN model from disk...")
+        try:
+            knn_wrapper.load()
+        except ValueError as e:
+            if read_only:
+                raise
+            print(f"[INFO] {e} Retraining...")
+            retrain = True
     if retrain or not model_exists:
         if not examples or not labels:
             raise RuntimeError("No training examples found (labels.json or training_labels.json).")
         print(f"[INFO] Training new KNN model on {len(examples)} examples...")
         knn_wrapper.train(examples, labels)
-        # This will write out:
-        #   - knn_model.joblib
-        #   - embeddings.npy
-        #   - model_metadata.json
-        knn_wrapper.save()
+        if not read_only:
+            # This will write out knn_model.kfo (embeddings, label codes and metadata in one file)
+            knn_wrapper.save()
     else:
-        print("[INFO] Loading existing KNN model from disk...")
-        # This load() must now read both knn_model.joblib AND embeddings.npy (Option 1 change).
-        knn_wrapper.load()
+        # Pick up examples appended to labels.json since the model was saved,
+        # embedding only the new rows instead of retraining from scratch.
+        n_known = len(knn_wrapper.examples)
+        if (
+            len(examples) > n_known
+            and examples[:n_known] == knn_wrapper.examples
+            and labels[:n_known] == knn_wrapper.labels
+        ):
+            print(f"[INFO] Adding {len(examples) - n_known} new labelled example(s) to the model...")
+            knn_wrapper.add_examples(examples[n_known:], labels[n_known:])
+            if not read_only:
+                knn_wrapper.save()
+
+    # Recall is measured when an approximate index is saved, not on every start
+    stats = knn_wrapper.index_stats
+    if knn_wrapper.knn.approximate and stats is not None:
+        print(
+            f"[INFO] '{knn_wrapper.index_backend}' index recall@3 vs exact: {stats['recall']:.3f} "
+            f"({stats['approx_ms']:.3f} ms/query vs {stats['exact_ms']:.3f} ms/query)"
+        )
+
+
+def run_organiser(
+    source: Path,
+    dest: Path,
+    options: Optional[RunOptions] = None,
+    duplicates: str = "off",
+    near_duplicates: Optional[float] = None,
+    group_labels: bool = False,
+    stream: bool = False,
+    queue_path: Path = Path(STREAM_QUEUE_FILE),
+) -> None:
+    """
+    1. Load or initialize (examples, labels).
+    2. Train (if --retrain) or load existing KNN model (with embeddings and metadata).
+       This happens lazily, when the first batch of files is ready (see `prepare_model`).
+       `options` (see RunOptions) picks the embedder, metric, index backend and storage
+       precision; approximate backends report their recall against exact search, and
+       switching the metric of a saved model retrains it. When `options.threshold` is
+       None, the default for the model's metric is used.
+    3. Scan files under `source` lazily (filtered by the options' include/exclude/extensions/
+       max_depth/symlinks, see `iter_files`) and compute (predicted_label, mean_distance)
+       for each, `batch_size` files at a time. Unchanged files reuse their text/embedding
+       from the embedding cache (unless `use_cache` is False). Content is extracted from
+       PDFs, Word and text files (see extractors.py) up to `token_budget` embedder tokens;
+       PDFs and Word files are parsed by `workers` processes while earlier batches are embedded.
+       - If mean_distance <= threshold: move immediately to <dest>/<predicted_label>
+       - If mean_distance > threshold: collect into to_label list (DO NOT move yet)
+    4. Once the confident files are moved, prompt you to label each file in to_label (while it still resides under source):
+       - If you type a new label: move that file from source → dest/<new_label> and append to labels.json.
+         The model learns the new example immediately, and any remaining files it now
+         classifies within `threshold` are moved without prompting.
+       - If you press Enter (skip): move that file from source → dest/Uncategorised
+       With `group_labels`, similar files are offered as groups first, one prompt per
+       group (see `_label_groups`).
+    Moves run on `move_workers` threads and are recorded in the journal at `journal_path`,
+    which is used to finish the moves of an interrupted run and to undo a run
+    (see mover.py). A file never overwrites one already in its category folder.
+    Unless `duplicates` is "off", files with the same content as an earlier file are
+    neither extracted nor classified, and files whose embedding has at least
+    `near_duplicates` cosine similarity to an earlier one (if given) are not classified
+    on their own; both are handled by the `duplicates` policy once the originals have
+    been placed (see `_place_duplicates` and dedup.py).
+    With `stream`, memory stays bounded however large the tree is: confident files are
+    moved as soon as their batch is classified, and files waiting for a label are kept in
+    an on-disk queue at `queue_path` and read back a page at a time (see
+    `label_queue.LabelQueue`), which also lets an interrupted run resume where it
+    stopped. Duplicate detection is not available in this mode, since it indexes every
+    file. `dest` is never scanned, even when it lies inside `source`.
+    """
+    if stream and duplicates != "off":
+        raise ValueError("Duplicate detection indexes every file, so it cannot be combined with streaming.")
+    options = options or RunOptions()
+    threshold = options.threshold
+    dry_run = options.dry_run
+
+    # 1./2. Labels and the KNN model are only loaded (or trained) once the first batch of
+    # files needs classifying, so a run over an empty tree never touches the model.
+    knn_wrapper = options.make_model()
 
     # 3. Scan and classify (but do NOT move low-confidence yet)
-    all_files = list_all_files(source)
-    print(f"[INFO] Found {len(all_files)} files under {source}.")
+    # Files are streamed from the directory walk straight into classification
+    all_files = profiling.timed_iter("scan", iter_files(
+        source,
+        include=options.include,
+        exclude=exclude_dest(source, dest, options.exclude),
+        extensions=options.extensions,
+        max_depth=options.max_depth,
+        symlinks=options.symlinks,
+    ))
+    finder = None
+    near_index = None
+    near_dups: List[Tuple[Path, Path]] = []
+    if duplicates != "off":
+        finder = DuplicateFinder()
+        all_files = finder.filter(all_files)
+        if near_duplicates is not None:
+            near_index = NearDuplicateIndex(near_duplicates)
+    n_files = 0
 
     confident_moves: List[(Path, str)] = []
     to_label: List[Path] = []
+    to_label_vecs: List[np.ndarray] = []
 
-    for file_path in all_files:
-        text = extract_text_from_file(file_path)
-        predicted_label, mean_distance = knn_wrapper.predict_with_confidence(text)
-
-        if mean_distance > threshold:
-            # collect in to_label (do NOT move yet)
-            to_label.append(file_path)
-        else:
-            # confident → move immediately
-            confident_moves.append((file_path, predicted_label))
+    cache = options.open_cache(knn_wrapper)
 
-    # 4. Move all the confidently classified files now
-    for file_path, category in confident_moves:
+    queue = None
+    mover = None
+    if stream:
         if dry_run:
-            print(f"[DRY-RUN] {file_path.name} → [{category}]")
-        else:
-            move_file_to_category(file_path, dest, category)
-
-    # 5. Handle the “uncategorised” list
-    if to_label:
-        print(f"\n[INFO] {len(to_label)} file(s) need manual labeling.")
-        resp = input("Would you like to label them now? [y/N]: ").strip().lower()
-        if resp == "y":
-            for file_path in to_label:
-                print(f"\nFile: {file_path.name}")
-                new_label = input("  Enter a label (or press Enter to skip → send to 'Uncategorised'): ").strip()
-                if new_label:
-                    # Move from source → dest/<new_label> and save to labels.json
+            # Nothing moves in a dry run, so there is nothing to resume
+            with tempfile.NamedTemporaryFile(suffix=".sqlite", delete=False) as tmp:
+                queue_path = Path(tmp.name)
+        queue = LabelQueue(queue_path, run_key=f"{source}|{dest}|{knn_wrapper.embedder_key}")
+        if queue.resumed:
+            print(f"[INFO] Resuming an interrupted run: {len(queue)} file(s) are already waiting for a label.")
+            all_files = (file_path for file_path in all_files if file_path not in queue)
+        if not dry_run:
+            journal = MoveJournal(options.journal_path)
+            recover_journal(journal)
+            mover = MoveExecutor(
+                dest,
+                journal,
+                workers=options.move_workers,
+                max_pending=STREAM_MAX_PENDING_MOVES,
+                track_targets=False,
+                source=str(source),
+            )
+
+    try:
+        for batch, vecs in _embed_stream(
+            all_files, knn_wrapper, cache, options.batch_size, options.workers, options.extract_timeout, options.max_chars
+        ):
+            if not knn_wrapper.is_trained():
+                with profiling.stage("model_load"):
+                    prepare_model(knn_wrapper, retrain=options.retrain)
+                if threshold is None:
+                    threshold = default_threshold(knn_wrapper.metric)
+            with profiling.stage("search"):
+                predicted_labels, mean_distances = knn_wrapper.predict_embeddings(
+                    vecs, batch_size=options.batch_size, reject_above=threshold
+                )
+            n_files += len(batch)
+            if near_index is not None:
+                with profiling.stage("dedup"):
+                    near_originals = near_index.add(batch, vecs)
+            else:
+                near_originals = [None] * len(batch)
+
+            spilled = []
+            for file_path, vec, predicted_label, mean_distance, near_original in zip(
+                batch, vecs, predicted_labels, mean_distances, near_originals
+            ):
+                if near_original is not None:
+                    # classified with its original, once that has been placed
+                    near_dups.append((file_path, near_original))
+                elif mean_distance > threshold and queue is not None:
+                    spilled.append((file_path, vec))
+                elif mean_distance > threshold:
+                    # collect in to_label (do NOT move yet)
+                    to_label.append(file_path)
+                    to_label_vecs.append(vec)
+                elif queue is not None:
+                    # streaming: move now rather than once the scan is over
                     if dry_run:
-                        print(f"  [DRY-RUN] {file_path.name} → [{new_label}]")
+                        print(f"[DRY-RUN] {file_path.name} → [{predicted_label}]")
                     else:
-                        move_file_to_category(file_path, dest, new_label)
-                        append_to_labels_json(file_path.name, new_label)
+                        mover.submit(file_path, str(predicted_label))
                 else:
-                    # Move from source → dest/Uncategorised
-                    if dry_run:
-                        print(f"  [DRY-RUN] {file_path.name} → [{UNCATEGORISED_LABEL}]")
-                    else:
-                        move_file_to_category(file_path, dest, UNCATEGORISED_LABEL)
-        else:
-            # User chose not to label—send all to Uncategorised
-            for file_path in to_label:
-                if dry_run:
-                    print(f"[DRY-RUN] {file_path.name} → [{UNCATEGORISED_LABEL}]")
+                    # confident → move immediately
+                    confident_moves.append((file_path, str(predicted_label)))
+            if spilled:
+                queue.push_many(spilled)
+
+        duplicate_files = []
+        if finder is not None:
+            # Near duplicates first: an exact copy of a near duplicate follows it
+            duplicate_files = [(f, o, False) for f, o in near_dups] + [(f, o, True) for f, o in finder.duplicates]
+            n_files += len(finder.duplicates)
+        print(f"[INFO] Found {n_files} files under {source}.")
+        if duplicate_files:
+            print(
+                f"[INFO] {len(finder.duplicates)} exact and {len(near_dups)} near duplicate(s) "
+                f"will be handled by the '{duplicates}' policy."
+            )
+        if cache is not None:
+            print(f"[INFO] Embedding cache: {cache.hits} hit(s), {cache.misses} miss(es).")
+            cache.close()
+
+        # Moves are queued on a thread pool and journaled; the pool is drained at the end
+        if mover is None and not dry_run and n_files:
+            journal = MoveJournal(options.journal_path)
+            recover_journal(journal)
+            mover = MoveExecutor(dest, journal, workers=options.move_workers, source=str(source))
+
+        # 4. Move all the confidently classified files now
+        for file_path, category in confident_moves:
+            if dry_run:
+                print(f"[DRY-RUN] {file_path.name} → [{category}]")
+            else:
+                mover.submit(file_path, category)
+
+        # 5. Handle the “uncategorised” list
+        n_waiting = len(queue) if queue is not None else len(to_label)
+        if n_waiting:
+            if not knn_wrapper.is_trained():
+                # A resumed run whose files were all queued before it was interrupted
+                with profiling.stage("model_load"):
+                    prepare_model(knn_wrapper, retrain=options.retrain)
+                if threshold is None:
+                    threshold = default_threshold(knn_wrapper.metric)
+            print(f"\n[INFO] {n_waiting} file(s) need manual labeling.")
+            resp = input("Would you like to label them now? [y/N]: ").strip().lower()
+            if resp == "y":
+                labelling_started = time.perf_counter()
+                label_store = None if dry_run else LabelStore(Path(LABELS_FILE))
+                if queue is not None:
+                    model_changed = _label_queue(queue, knn_wrapper, threshold, mover, dry_run, label_store, group_labels)
                 else:
-                    move_file_to_category(file_path, dest, UNCATEGORISED_LABEL)
-    else:
-        print("[INFO] No files needed manual labeling.")
+                    model_changed = _label_pending(
+                        list(zip(to_label, to_label_vecs)), knn_wrapper, threshold, mover, dry_run, label_store, group_labels
+                    )
+                if label_store is not None:
+                    label_store.close()
+                if model_changed and not dry_run:
+                    knn_wrapper.save()
+                # Includes time spent waiting for answers
+                profiling.add_time("labelling", time.perf_counter() - labelling_started)
+            else:
+                # User chose not to label—send all to Uncategorised
+                pages = queue.pages() if queue is not None else [[(file_path, None) for file_path in to_label]]
+                for page in pages:
+                    for file_path, _ in page:
+                        if dry_run:
+                            print(f"[DRY-RUN] {file_path.name} → [{UNCATEGORISED_LABEL}]")
+                        else:
+                            mover.submit(file_path, UNCATEGORISED_LABEL)
+                    if queue is not None:
+                        queue.remove(file_path for file_path, _ in page)
+        else:
+            print("[INFO] No files needed manual labeling.")
+
+        # 6. Duplicates follow their (now placed) originals
+        link_pairs = _place_duplicates(duplicate_files, duplicates, mover, dry_run)
+    finally:
+        if mover is not None:
+            mover.close()
+        if queue is not None:
+            # An emptied queue means the run is complete; otherwise it is kept to resume from
+            queue.close(delete=dry_run or not len(queue))
 
+    if link_pairs:
+        linked = hard_link_copies(link_pairs)
+        print(f"[INFO] Hard-linked {linked} of {len(link_pairs)} duplicate(s) to their originals.")
     print("[INFO] Done.")
+
+
+def watch_organiser(
+    source: Path,
+    dest: Path,
+    options: Optional[RunOptions] = None,
+    interval: float = WATCH_INTERVAL,
+    debounce: float = WATCH_DEBOUNCE,
+    max_polls: Optional[int] = None,
+) -> None:
+    """
+    Long-running counterpart of `run_organiser`.
+    The model is loaded (or trained) once, then `source` is polled every `interval`
+    seconds (see `watcher.watch_changes`); new or changed files are classified in
+    micro-batches as soon as they have been stable for `debounce` seconds, and confident
+    ones are moved to <dest>/<predicted_label>. Files the model is unsure about are left
+    where they are and reported, since nobody is there to answer a prompt; a normal run
+    will offer them for labelling. Each micro-batch is journaled as its own run, so
+    `--undo` reverts the latest one. `dest` is never scanned, even when it lies inside
+    `source`. Runs until interrupted (or for `max_polls` polls). `options` are as for
+    `run_organiser`.
+    """
+    options = options or RunOptions()
+    dry_run = options.dry_run
+    knn_wrapper = options.make_model()
+    with profiling.stage("model_load"):
+        prepare_model(knn_wrapper, retrain=options.retrain)
+    threshold = options.threshold
+    if threshold is None:
+        threshold = default_threshold(knn_wrapper.metric)
+
+    cache = options.open_cache(knn_wrapper)
+    journal = None
+    if not dry_run:
+        journal = MoveJournal(options.journal_path)
+        recover_journal(journal)
+
+    changes = watch_changes(
+        source,
+        interval=interval,
+        debounce=debounce,
+        max_polls=max_polls,
+        include=options.include,
+        exclude=exclude_dest(source, dest, options.exclude),
+        extensions=options.extensions,
+        max_depth=options.max_depth,
+        symlinks=options.symlinks,
+    )
+    print(f"[INFO] Watching {source} (every {interval}s). Press Ctrl+C to stop.")
+    try:
+        for files in changes:
+            started = time.perf_counter()
+            mover = None if dry_run else MoveExecutor(dest, journal, workers=options.move_workers, source=str(source))
+            n_moved = n_unsure = 0
+            try:
+                for batch, vecs in _embed_stream(
+                    files, knn_wrapper, cache, options.batch_size, options.workers, options.extract_timeout,
+                    options.max_chars,
+                ):
+                    with profiling.stage("search"):
+                        predicted_labels, mean_distances = knn_wrapper.predict_embeddings(
+                            vecs, batch_size=options.batch_size, reject_above=threshold
+                        )
+                    for file_path, predicted_label, mean_distance in zip(batch, predicted_labels, mean_distances):
+                        if mean_distance > threshold:
+                            n_unsure += 1
+                            print(f"[INFO] {file_path.name} needs a label (distance {mean_distance:.3f}); left in place.")
+                        elif dry_run:
+                            print(f"[DRY-RUN] {file_path.name} → [{predicted_label}]")
+                        else:
+                            n_moved += 1
+                            mover.submit(file_path, str(predicted_label))
+            finally:
+                if mover is not None:
+                    mover.close()
+            print(
+                f"[INFO] Classified {len(files)} file(s) in {(time.perf_counter() - started) * 1000:.0f} ms: "
+                f"{n_moved} moved, {n_unsure} left for labelling."
+            )
+    except KeyboardInterrupt:
+        print("\n[INFO] Stopped watching.")
+    finally:
+        if cache is not None:
+            cache.close()
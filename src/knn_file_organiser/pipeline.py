@@ -0,0 +1,145 @@
+import multiprocessing
+import time
+from collections import deque
+from multiprocessing.pool import AsyncResult
+from pathlib import Path
+from typing import Any, Iterable, Iterator, Optional, Tuple
+
+from . import profiling
+from .config import EXTRACT_WORKERS, EXTRACT_TIMEOUT
+from .extractors import ExtractorEntry, lookup_extractor
+from .io_utils import extract_text, normalize_filename
+
+
+# Worker processes are spawned rather than forked: forking after torch or a tokenizer has
+# started threads can deadlock, and the extraction pool is restarted mid-run (after a
+# timeout), when the embedder is already loaded. shards.py uses the same context.
+PROCESS_CONTEXT = multiprocessing.get_context("spawn")
+
+
+def _extract(file_path: Path, entry: Optional[ExtractorEntry], max_chars: Optional[int] = None) -> str:
+    # Module-level so worker processes can unpickle it; `entry` is the file's extractor,
+    # looked up once by extract_stream
+    start = time.perf_counter()
+    text = extract_text(file_path, entry, max_chars)
+    elapsed = time.perf_counter() - start
+    profiling.observe("extract", elapsed)
+    profiling.add_time("extract", elapsed)
+    return text
+
+
+def _extract_profiled(
+    file_path: Path, entry: Optional[ExtractorEntry], max_chars: Optional[int] = None
+) -> Tuple[str, dict]:
+    # Worker-side counterpart of `_extract` for profiled runs: the worker's counters and
+    # timings are sent back with the text and merged into the parent's profiler
+    profiler = profiling.enable()
+    try:
+        return _extract(file_path, entry, max_chars), profiler.snapshot()
+    finally:
+        profiling.disable()
+
+
+def _collect(file_path: Path, result: AsyncResult, profiler) -> str:
+    # Text of a finished pool task; a failed extraction falls back to the filename
+    try:
+        text = result.get(0)
+    except Exception:
+        profiling.count("filename_fallbacks")
+        return normalize_filename(file_path)
+    if profiler is not None:
+        text, snapshot = text
+        profiler.merge(snapshot)
+    return text
+
+
+def extract_stream(
+    items: Iterable[Tuple[Path, Any]],
+    workers: int = EXTRACT_WORKERS,
+    timeout: float = EXTRACT_TIMEOUT,
+    prefetch: int = 128,
+    max_chars: Optional[int] = None,
+) -> Iterator[Tuple[Path, Any, Optional[str]]]:
+    """
+    Extraction stage of the classification pipeline.
+    Consumes (file_path, payload) pairs and yields (file_path, payload, text) in the same
+    order. Text is only extracted when payload is None (e.g. an embedding cache miss);
+    otherwise text is None. At most `max_chars` characters of content are extracted per
+    file (default: the configured token budget; see extractors.py).
+
+    With `workers` > 0, PDFs and other parsed documents are extracted in a process pool
+    while the caller embeds earlier results. At most `prefetch` items are held ahead of the consumer, so a slow embedder
+    applies backpressure to the scan. A file whose text is not ready `timeout` seconds
+    after the consumer starts waiting for it falls back to filename normalisation, and the
+    pool is restarted so the stuck worker cannot stall the run. The timeout is counted
+    from that wait, not from when a worker picked the file up, so a file extracted while
+    the consumer was busy may have run for longer.
+    """
+    if workers <= 0:
+        for file_path, payload in items:
+            if payload is not None:
+                yield file_path, payload, None
+            else:
+                yield file_path, payload, _extract(file_path, lookup_extractor(file_path), max_chars)
+        return
+
+    prefetch = max(prefetch, 1)
+    profiler = profiling.active()
+    extract = _extract if profiler is None else _extract_profiled
+    pool = None
+    # Each slot is [file_path, payload, str | AsyncResult | None, extractor entry]; the
+    # entry is kept so a task can be resubmitted without looking the file up again
+    window = deque()
+    source = iter(items)
+    exhausted = False
+    try:
+        while True:
+            while not exhausted and len(window) < prefetch:
+                item = next(source, None)
+                if item is None:
+                    exhausted = True
+                    break
+                file_path, payload = item
+                if payload is not None:
+                    window.append([file_path, payload, None, None])
+                    continue
+                entry = lookup_extractor(file_path)
+                if entry is not None and entry.in_process:
+                    if pool is None:
+                        pool = PROCESS_CONTEXT.Pool(workers)
+                    task = pool.apply_async(extract, (file_path, entry, max_chars))
+                    window.append([file_path, payload, task, entry])
+                else:
+                    window.append([file_path, payload, _extract(file_path, entry, max_chars), entry])
+
+            if not window:
+                return
+
+            file_path, payload, result, _ = window.popleft()
+            if isinstance(result, AsyncResult):
+                try:
+                    with profiling.stage("extract_wait"):
+                        result.wait(timeout)
+                    if not result.ready():
+                        raise multiprocessing.TimeoutError
+                    result = _collect(file_path, result, profiler)
+                except multiprocessing.TimeoutError:
+                    print(f"[WARN] Extraction of {file_path.name} timed out after {timeout}s; using its filename.")
+                    profiling.count("extract_timeouts")
+                    profiling.count("filename_fallbacks")
+                    result = normalize_filename(file_path)
+                    # Keep what the pool already finished; only work still pending on the
+                    # killed pool is resubmitted, in order
+                    for slot in window:
+                        if isinstance(slot[2], AsyncResult) and slot[2].ready():
+                            slot[2] = _collect(slot[0], slot[2], profiler)
+                    pool.terminate()
+                    pool = PROCESS_CONTEXT.Pool(workers)
+                    for slot in window:
+                        if isinstance(slot[2], AsyncResult):
+                            slot[2] = pool.apply_async(extract, (slot[0], slot[3], max_chars))
+            yield file_path, payload, result
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
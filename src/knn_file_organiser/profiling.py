@@ -0,0 +1,202 @@
+import json
+import sys
+import time
+from array import array
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional
+
+# Instrumentation hooks. Code under measurement calls the module-level `count`,
+# `observe` and `stage` helpers; with no profiler enabled they return straight away
+# (one global lookup), so instrumented code paths cost next to nothing in normal runs.
+
+_active: Optional["Profiler"] = None
+
+
+class Profiler:
+    """
+    Collects per-stage wall time, latency samples (seconds) and integer counters for one run.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = defaultdict(float)
+        self.samples: Dict[str, array] = defaultdict(lambda: array("d"))
+        self.counters: Dict[str, int] = defaultdict(int)
+
+    def merge(self, snapshot: dict) -> None:
+        """
+        Fold in a `snapshot()` taken in another process (e.g. an extraction worker).
+        """
+        for name, seconds in snapshot.get("stages", {}).items():
+            self.stages[name] += seconds
+        for name, values in snapshot.get("samples", {}).items():
+            self.samples[name].extend(values)
+        for name, n in snapshot.get("counters", {}).items():
+            self.counters[name] += n
+
+    def snapshot(self) -> dict:
+        return {
+            "stages": dict(self.stages),
+            "samples": {name: list(values) for name, values in self.samples.items()},
+            "counters": dict(self.counters),
+        }
+
+    def report(self) -> dict:
+        """
+        Machine-readable summary: stage seconds, latency percentiles in milliseconds,
+        counters and peak resident memory.
+        """
+        latency = {}
+        for name, values in sorted(self.samples.items()):
+            if not values:
+                continue
+            ordered = sorted(values)
+            pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+            latency[name] = {
+                "n": len(ordered),
+                "mean_ms": sum(ordered) / len(ordered) * 1000,
+                "p50_ms": pick(0.50),
+                "p90_ms": pick(0.90),
+                "p99_ms": pick(0.99),
+                "max_ms": ordered[-1] * 1000,
+            }
+        return {
+            "wall_seconds": time.perf_counter() - self.started,
+            "stages": dict(sorted(self.stages.items(), key=lambda kv: -kv[1])),
+            "latency": latency,
+            "counters": dict(sorted(self.counters.items())),
+            "peak_rss_bytes": peak_rss(),
+        }
+
+
+def enable() -> Profiler:
+    """
+    Start collecting into a fresh Profiler (replacing any active one) and return it.
+    """
+    global _active
+    _active = Profiler()
+    return _active
+
+
+def disable() -> Optional[Profiler]:
+    """
+    Stop collecting; returns the profiler that was active, if any.
+    """
+    global _active
+    profiler, _active = _active, None
+    return profiler
+
+
+def active() -> Optional[Profiler]:
+    return _active
+
+
+def count(name: str, n: int = 1) -> None:
+    if _active is not None:
+        _active.counters[name] += n
+
+
+def observe(name: str, seconds: float) -> None:
+    """
+    Record one latency sample (e.g. the extraction time of one file).
+    """
+    if _active is not None:
+        _active.samples[name].append(seconds)
+
+
+def add_time(name: str, seconds: float) -> None:
+    if _active is not None:
+        _active.stages[name] += seconds
+
+
+class _NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+@contextmanager
+def _timed_stage(name: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_time(name, time.perf_counter() - start)
+
+
+def stage(name: str):
+    """
+    Context manager adding the wall time of its body to stage `name`.
+    """
+    if _active is None:
+        return _NULL_STAGE
+    return _timed_stage(name)
+
+
+def timed_iter(name: str, items: Iterable) -> Iterator:
+    """
+    Pass `items` through, adding the time spent producing each one to stage `name`
+    (e.g. the directory walk, which is interleaved with the rest of the run).
+    """
+    if _active is None:
+        yield from items
+        return
+    it = iter(items)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(it)
+        except StopIteration:
+            add_time(name, time.perf_counter() - start)
+            return
+        add_time(name, time.perf_counter() - start)
+        yield item
+
+
+def peak_rss() -> Optional[Dict[str, int]]:
+    """
+    Peak resident set size in bytes of this process and of its (finished) child
+    processes, or None where the `resource` module is unavailable (Windows).
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    # ru_maxrss is in kilobytes on Linux, bytes on macOS
+    unit = 1 if sys.platform == "darwin" else 1024
+    return {
+        "self": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit,
+        "children": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * unit,
+    }
+
+
+def print_report(report: dict) -> None:
+    print(f"\n[PROFILE] Wall time: {report['wall_seconds']:.3f}s")
+    print("[PROFILE] Stages (seconds; overlapping stages can sum to more than wall time):")
+    for name, seconds in report["stages"].items():
+        print(f"  {name:<16} {seconds:10.3f}")
+    if report["latency"]:
+        print("[PROFILE] Per-file latency (ms):")
+        for name, s in report["latency"].items():
+            print(
+                f"  {name:<16} n={s['n']:<7} mean {s['mean_ms']:8.2f}  p50 {s['p50_ms']:8.2f}  "
+                f"p90 {s['p90_ms']:8.2f}  p99 {s['p99_ms']:8.2f}  max {s['max_ms']:8.2f}"
+            )
+    if report["counters"]:
+        print("[PROFILE] Counters:")
+        for name, n in report["counters"].items():
+            print(f"  {name:<16} {n:10d}")
+    rss = report["peak_rss_bytes"]
+    if rss is not None:
+        print(f"[PROFILE] Peak RSS: {rss['self'] / 2**20:.1f} MiB (largest worker: {rss['children'] / 2**20:.1f} MiB)")
+
+
+def write_report(report: dict, path: Path) -> None:
+    Path(path).write_text(json.dumps(report, indent=2), encoding="utf-8")
@@ -0,0 +1,57 @@
+from typing import Iterator, Optional, Tuple
+
+import numpy as np
+
+from .config import EMBEDDING_PRECISIONS, QUANT_BLOCK_ROWS
+
+
+def quantize(vecs: np.ndarray, precision: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    Store `vecs` (n, dim) at `precision`:
+      float32 / float16 – a plain cast; scales is None
+      int8              – each row scaled by max|x| / 127 and rounded; returns the int8
+                          matrix plus an (n,) float32 array of per-row scales
+    """
+    if precision not in EMBEDDING_PRECISIONS:
+        raise ValueError(f"precision must be one of {EMBEDDING_PRECISIONS}, got {precision!r}")
+    vecs = np.asarray(vecs, dtype=np.float32)
+    if precision != "int8":
+        return vecs.astype(precision, copy=False), None
+    scales = np.abs(vecs).max(axis=1) / 127.0 if len(vecs) else np.empty(0, dtype=np.float32)
+    scales = np.where(scales > 0, scales, 1.0).astype(np.float32)
+    data = np.rint(vecs / scales[:, None]).astype(np.int8)
+    return data, scales
+
+
+def dequantize(data: np.ndarray, scales: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Inverse of `quantize`: return the rows of `data` as float32.
+    """
+    if data.dtype == np.int8:
+        if scales is None:
+            raise ValueError("int8 embeddings need their per-row scales.")
+        return data.astype(np.float32) * np.asarray(scales, dtype=np.float32)[:, None]
+    return np.asarray(data, dtype=np.float32)
+
+
+def precision_of(data: np.ndarray) -> str:
+    """
+    The precision name for a stored matrix's dtype.
+    """
+    name = np.dtype(data.dtype).name
+    if name not in EMBEDDING_PRECISIONS:
+        raise ValueError(f"Unsupported embedding dtype {name!r}.")
+    return name
+
+
+def iter_blocks(
+    data: np.ndarray, scales: Optional[np.ndarray] = None, block_rows: int = QUANT_BLOCK_ROWS
+) -> Iterator[Tuple[int, np.ndarray]]:
+    """
+    Yield (start_row, float32_block) over `data`, dequantising at most `block_rows` rows
+    at a time so a quantised (or memory-mapped) matrix is never expanded in full.
+    float32 data is yielded as views without copying.
+    """
+    for start in range(0, len(data), block_rows):
+        stop = start + block_rows
+        yield start, dequantize(data[start:stop], None if scales is None else scales[start:stop])
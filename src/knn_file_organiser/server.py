@@ -0,0 +1,339 @@
+import http.client
+import json
+import os
+import queue
+import socket
+import socketserver
+import stat
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import List, Optional, Union
+
+from .config import KNN_NEIGHBORS, SERVER_MAX_BATCH, SERVER_MAX_WAIT_MS
+from .model_utils import KNNModelWrapper
+
+# Endpoints (JSON in and out):
+#   GET  /health     -> {"status": "ok", "examples": n, "labels": [...], "metric": ..., "threshold": t}
+#   POST /classify   {"texts": [...]} -> {"results": [{"label", "distance", "confident"}, ...]}
+#   POST /neighbors  {"texts": [...], "k": 5} -> {"results": [[{"example", "label", "distance"}, ...], ...]}
+# A single "text" may be sent instead of "texts".
+
+
+class _Request:
+    __slots__ = ("kind", "texts", "k", "future")
+
+    def __init__(self, kind: str, texts: List[str], k: int):
+        self.kind = kind
+        self.texts = texts
+        self.k = k
+        self.future = Future()
+
+
+class BatchQueue:
+    """
+    Coalesces concurrent classify/neighbour requests into dynamic batches.
+    A single worker thread takes the first waiting request, then keeps collecting until
+    the batch holds `max_batch` texts or `max_wait_ms` has passed since that first
+    request arrived. The whole batch costs one `encode` call and one neighbour search,
+    so throughput under load approaches that of offline batch classification while a
+    lone request waits at most `max_wait_ms` extra.
+    """
+
+    def __init__(
+        self,
+        knn_wrapper: KNNModelWrapper,
+        threshold: float,
+        max_batch: int = SERVER_MAX_BATCH,
+        max_wait_ms: float = SERVER_MAX_WAIT_MS,
+    ):
+        self.knn_wrapper = knn_wrapper
+        self.threshold = threshold
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.batches = 0
+        self.texts = 0
+        self._queue: "queue.Queue[Optional[_Request]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="batch-queue", daemon=True)
+        self._thread.start()
+
+    def submit(self, kind: str, texts: List[str], k: int = KNN_NEIGHBORS) -> Future:
+        """
+        Queue `texts` for "classify" or "neighbors". The returned Future resolves to one
+        result per text.
+        """
+        request = _Request(kind, list(texts), k)
+        if not request.texts:
+            request.future.set_result([])
+        else:
+            self._queue.put(request)
+        return request.future
+
+    def close(self) -> None:
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = [first]
+            n_texts = len(first.texts)
+            deadline = time.monotonic() + self.max_wait
+            stop = False
+            while n_texts < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    request = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if request is None:
+                    stop = True
+                    break
+                batch.append(request)
+                n_texts += len(request.texts)
+            self._process(batch)
+            if stop:
+                return
+
+    def _process(self, batch: List[_Request]) -> None:
+        knn = self.knn_wrapper
+        try:
+            texts = [text for request in batch for text in request.texts]
+            vecs = knn.encode(texts, batch_size=max(len(texts), 1))
+            k = max([KNN_NEIGHBORS] + [request.k for request in batch])
+            distances, indices = knn.nearest_embeddings(vecs, n_neighbors=k, batch_size=max(len(texts), 1))
+            labels, mean_distances = knn.predict_from_neighbors(distances, indices)
+        except Exception as e:
+            for request in batch:
+                request.future.set_exception(e)
+            return
+        self.batches += 1
+        self.texts += len(texts)
+
+        start = 0
+        for request in batch:
+            rows = range(start, start + len(request.texts))
+            start += len(request.texts)
+            if request.kind == "classify":
+                result = [
+                    {
+                        "label": str(labels[i]),
+                        "distance": float(mean_distances[i]),
+                        "confident": bool(mean_distances[i] <= self.threshold),
+                    }
+                    for i in rows
+                ]
+            else:
+                result = [
+                    [
+                        {
+                            "example": knn.examples[j],
+                            "label": knn.label_table[knn.label_codes[j]],
+                            "distance": float(d),
+                        }
+                        for d, j in zip(distances[i, :request.k], indices[i, :request.k])
+                    ]
+                    for i in rows
+                ]
+            request.future.set_result(result)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "knn-file-organiser"
+    protocol_version = "HTTP/1.1"
+
+    def _send(self, status: int, payload: dict) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        if self.path != "/health":
+            self._send(404, {"error": f"unknown endpoint {self.path}"})
+            return
+        batcher = self.server.batcher
+        knn = batcher.knn_wrapper
+        self._send(200, {
+            "status": "ok",
+            "examples": len(knn.examples),
+            "labels": list(knn.label_table),
+            "metric": knn.metric,
+            "threshold": batcher.threshold,
+            "batches": batcher.batches,
+            "texts": batcher.texts,
+        })
+
+    def do_POST(self) -> None:
+        kind = {"/classify": "classify", "/neighbors": "neighbors"}.get(self.path)
+        if kind is None:
+            self._send(404, {"error": f"unknown endpoint {self.path}"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+            texts = body["texts"] if "texts" in body else [body["text"]]
+            k = int(body.get("k", KNN_NEIGHBORS))
+            if not isinstance(texts, list) or not all(isinstance(t, str) for t in texts) or k < 1:
+                raise ValueError
+        except (ValueError, KeyError, TypeError):
+            self._send(400, {"error": 'expected {"texts": [str, ...]} (and optionally "k" >= 1)'})
+            return
+        try:
+            results = self.server.batcher.submit(kind, texts, k).result()
+        except Exception as e:
+            self._send(500, {"error": str(e)})
+            return
+        self._send(200, {"results": results})
+
+    def address_string(self) -> str:
+        # Unix socket peers have no address
+        return self.client_address[0] if self.client_address else "unix"
+
+    def log_message(self, format, *args) -> None:
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class _TCPHandler(_Handler):
+    # Headers and body go out in separate writes; without TCP_NODELAY, Nagle's algorithm
+    # and the client's delayed ACK add ~40 ms to every keep-alive response
+    disable_nagle_algorithm = True
+
+
+class _TCPHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Room for bursts of concurrent clients connecting at once
+    request_queue_size = 128
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    # A full Unix socket backlog fails connect() with EAGAIN instead of making it wait
+    request_queue_size = 128
+
+    def server_bind(self) -> None:
+        socketserver.UnixStreamServer.server_bind(self)
+        self.server_name, self.server_port = "localhost", 0
+
+
+def make_server(
+    batcher: BatchQueue,
+    host: str = "127.0.0.1",
+    port: int = 0,
+    socket_path: Optional[Path] = None,
+    verbose: bool = False,
+):
+    """
+    Create (but do not start) an HTTP server answering from `batcher`, on `socket_path`
+    if given, else on host:port (port 0 picks a free one; see `server.server_address`).
+    A stale socket left at `socket_path` (one nothing accepts connections on) is
+    replaced; a socket another server is listening on, or any other file, raises
+    FileExistsError rather than being deleted.
+    """
+    if socket_path is not None:
+        socket_path = Path(socket_path)
+        if os.path.lexists(socket_path):
+            if not stat.S_ISSOCK(os.lstat(socket_path).st_mode):
+                raise FileExistsError(f"{socket_path} exists and is not a socket; refusing to replace it.")
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(str(socket_path))
+            except (ConnectionRefusedError, FileNotFoundError):
+                socket_path.unlink(missing_ok=True)
+            else:
+                raise FileExistsError(f"{socket_path} is in use by another server.")
+            finally:
+                probe.close()
+        server = _UnixHTTPServer(str(socket_path), _Handler)
+    else:
+        server = _TCPHTTPServer((host, port), _TCPHandler)
+    server.batcher = batcher
+    server.verbose = verbose
+    return server
+
+
+def serve(
+    knn_wrapper: KNNModelWrapper,
+    threshold: float,
+    host: str = "127.0.0.1",
+    port: int = 0,
+    socket_path: Optional[Path] = None,
+    max_batch: int = SERVER_MAX_BATCH,
+    max_wait_ms: float = SERVER_MAX_WAIT_MS,
+) -> None:
+    """
+    Serve classification requests from one loaded model until interrupted.
+    """
+    batcher = BatchQueue(knn_wrapper, threshold, max_batch=max_batch, max_wait_ms=max_wait_ms)
+    server = make_server(batcher, host=host, port=port, socket_path=socket_path)
+    where = socket_path if socket_path is not None else "http://%s:%d" % server.server_address[:2]
+    print(f"[INFO] Serving {len(knn_wrapper.examples)} examples on {where}. Press Ctrl+C to stop.")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n[INFO] Stopped serving.")
+    finally:
+        server.server_close()
+        batcher.close()
+        if socket_path is not None:
+            Path(socket_path).unlink(missing_ok=True)
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path: str, timeout: float):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self) -> None:
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class Client:
+    """
+    Minimal standard-library client for the server, over TCP (`url`, e.g.
+    "http://127.0.0.1:8765") or a Unix socket (`socket_path`). One keep-alive
+    connection per client; use one client per thread.
+    """
+
+    def __init__(self, url: Optional[str] = None, socket_path: Optional[Union[str, Path]] = None, timeout: float = 30.0):
+        if socket_path is not None:
+            self._conn = _UnixHTTPConnection(str(socket_path), timeout)
+        elif url is not None:
+            host_port = url.split("://", 1)[-1].rstrip("/")
+            host, _, port = host_port.partition(":")
+            self._conn = http.client.HTTPConnection(host, int(port or 80), timeout=timeout)
+        else:
+            raise ValueError("Either url or socket_path is required.")
+
+    def _request(self, method: str, path: str, payload: Optional[dict] = None):
+        body = None if payload is None else json.dumps(payload).encode("utf-8")
+        headers = {} if body is None else {"Content-Type": "application/json"}
+        self._conn.request(method, path, body=body, headers=headers)
+        response = self._conn.getresponse()
+        data = json.loads(response.read() or b"{}")
+        if response.status != 200:
+            raise RuntimeError(f"{method} {path} failed ({response.status}): {data.get('error')}")
+        return data
+
+    def health(self) -> dict:
+        return self._request("GET", "/health")
+
+    def classify(self, texts: List[str]) -> List[dict]:
+        return self._request("POST", "/classify", {"texts": list(texts)})["results"]
+
+    def neighbors(self, texts: List[str], k: int = KNN_NEIGHBORS) -> List[List[dict]]:
+        return self._request("POST", "/neighbors", {"texts": list(texts), "k": k})["results"]
+
+    def close(self) -> None:
+        self._conn.close()
@@ -0,0 +1,278 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from fnmatch import fnmatch
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from . import profiling
+from .config import (
+    LABELS_FILE,
+    SHARD_WORKERS,
+    UNCATEGORISED_LABEL,
+    default_threshold,
+)
+from .embedders import limit_threads
+from .io_utils import iter_files
+from .label_store import LabelStore
+from .model_utils import KNNModelWrapper
+from .mover import MoveExecutor, MoveJournal, recover_journal
+from .organiser import RunOptions, _embed_stream, _label_pending, prepare_model
+from .pipeline import PROCESS_CONTEXT
+from .watcher import exclude_dest
+
+# Sharded runs organise several source roots, or the top-level subtrees of one, with a
+# pool of worker processes. Workers only extract, embed and classify; prompting, moving
+# and journaling stay in the parent, so a sharded run is still a single journaled run
+# (one `--undo` reverts it) with one merged report.
+# The parent prepares (and if needed saves) the model before starting the workers, which
+# are spawned rather than forked (see pipeline.PROCESS_CONTEXT). Each worker memory-maps
+# the saved artifact and searches the matrix in place with the index state saved next to
+# it (see model_utils.ExactIndex), so the training matrix is held once, in pages the OS
+# shares between processes. The embedder is not shared: each worker loads its own, with
+# its share of the thread budget.
+
+
+class Shard(NamedTuple):
+    """
+    A unit of directory work: the tree under `root`, the files directly in `root`
+    (`files_only`), or the tree under its top-level directory `subdir`.
+    """
+    root: Path
+    subdir: Optional[str] = None
+    files_only: bool = False
+
+    def __str__(self) -> str:
+        if self.subdir:
+            return str(self.root / self.subdir)
+        return f"{self.root} (top level)" if self.files_only else str(self.root)
+
+
+def plan_shards(
+    sources: List[Path],
+    workers: int,
+    dest: Optional[Path] = None,
+    exclude: Optional[List[str]] = None,
+    max_depth: Optional[int] = None,
+    symlinks: str = "files",
+) -> List[Shard]:
+    """
+    One shard per root when there are at least as many roots as `workers`. Otherwise
+    each root is split into the files directly in it plus one shard per top-level
+    directory that the scan would enter (see `io_utils.iter_files`), so a single large
+    root still keeps every worker busy; shards are handed out as workers become free.
+    """
+    if len(sources) >= workers or max_depth == 0:
+        return [Shard(Path(root)) for root in sources]
+    shards = []
+    for root in sources:
+        root = Path(root)
+        patterns = exclude_dest(root, dest, exclude) if dest is not None else list(exclude or [])
+        shards.append(Shard(root, files_only=True))
+        try:
+            with os.scandir(root) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError:
+            continue
+        for entry in entries:
+            try:
+                if entry.is_symlink() and symlinks != "follow":
+                    continue
+                if not entry.is_dir():
+                    continue
+            except OSError:
+                continue
+            if any(fnmatch(entry.name, pat) for pat in patterns):
+                continue
+            shards.append(Shard(root, subdir=entry.name))
+    return shards
+
+
+# The model and run settings of this worker process (set by _init_worker)
+_worker: Dict = {}
+
+
+def _init_worker(wrapper_options: dict, threads: int, options: RunOptions, threshold: float, dest: Path) -> None:
+    limit_threads(threads)
+    # Maps the artifact the parent prepared; the embedder is loaded on first use
+    knn_wrapper = KNNModelWrapper(**wrapper_options)
+    knn_wrapper.load()
+    _worker.update(options=options, threshold=threshold, dest=dest, knn_wrapper=knn_wrapper)
+
+
+def _classify_shard(shard: Shard) -> Tuple[dict, List[Tuple[Path, str]], List[Tuple[Path, np.ndarray]]]:
+    """
+    Classify the files of `shard` in a worker process. Returns the shard's report, the
+    confident (file, label) pairs and the (file, embedding) pairs left to label.
+    """
+    knn_wrapper: KNNModelWrapper = _worker["knn_wrapper"]
+    options: RunOptions = _worker["options"]
+    threshold = _worker["threshold"]
+    started = time.perf_counter()
+    cache = options.open_cache(knn_wrapper)
+    files = iter_files(
+        shard.root,
+        include=options.include,
+        exclude=exclude_dest(shard.root, _worker["dest"], options.exclude),
+        extensions=options.extensions,
+        max_depth=0 if shard.files_only else options.max_depth,
+        symlinks=options.symlinks,
+        subdir=shard.subdir,
+    )
+    n_files = 0
+    confident: List[Tuple[Path, str]] = []
+    to_label: List[Tuple[Path, np.ndarray]] = []
+    try:
+        for batch, vecs in _embed_stream(
+            files, knn_wrapper, cache, options.batch_size, options.workers, options.extract_timeout, options.max_chars
+        ):
+            predicted_labels, mean_distances = knn_wrapper.predict_embeddings(
+                vecs, batch_size=options.batch_size, reject_above=threshold
+            )
+            n_files += len(batch)
+            for file_path, vec, predicted_label, mean_distance in zip(batch, vecs, predicted_labels, mean_distances):
+                if mean_distance > threshold:
+                    to_label.append((file_path, vec))
+                else:
+                    confident.append((file_path, str(predicted_label)))
+    finally:
+        if cache is not None:
+            cache.close()
+    report = {
+        "shard": str(shard),
+        "files": n_files,
+        "confident": len(confident),
+        "to_label": len(to_label),
+        "cache_hits": cache.hits if cache is not None else 0,
+        "cache_misses": cache.misses if cache is not None else 0,
+        "seconds": time.perf_counter() - started,
+        "pid": os.getpid(),
+    }
+    return report, confident, to_label
+
+
+def run_sharded(
+    sources: List[Path],
+    dest: Path,
+    options: Optional[RunOptions] = None,
+    shard_workers: int = SHARD_WORKERS,
+    group_labels: bool = False,
+) -> dict:
+    """
+    Organise the files under each of `sources` into `dest`, classifying shards of the
+    trees (see `plan_shards`) in up to `shard_workers` processes that share one model
+    (see above). Confident files are moved as each shard's results arrive; the files
+    the model is unsure about, from all shards, are then offered for labelling as in
+    `run_organiser`. The embedder's `threads` option (default: all cores) is divided
+    between the workers, and each extracts text with `options.workers` processes of its
+    own (0 = inline, the default here). Returns the merged report: per-shard results
+    plus totals.
+    """
+    options = options or RunOptions(workers=0)
+    dry_run = options.dry_run
+    knn_wrapper = options.make_model()
+    with profiling.stage("model_load"):
+        prepare_model(knn_wrapper, retrain=options.retrain)
+    threshold = options.threshold
+    if threshold is None:
+        threshold = default_threshold(knn_wrapper.metric)
+
+    shards = plan_shards(sources, shard_workers, dest, options.exclude, options.max_depth, options.symlinks)
+    processes = max(1, min(shard_workers, len(shards)))
+    threads = max(1, (knn_wrapper.embedder_options.get("threads") or os.cpu_count() or 1) // processes)
+    # Workers load the model as the parent resolved it, not as the options asked for it
+    wrapper_options = dict(
+        model_name=options.model_name,
+        index=knn_wrapper.index_backend,
+        index_params=options.index_params,
+        metric=knn_wrapper.metric,
+        precision=knn_wrapper.precision,
+        candidate_labels=options.candidate_labels,
+        embedder_options=dict(knn_wrapper.embedder_options, threads=threads),
+    )
+    print(
+        f"[INFO] Organising {len(sources)} source(s) as {len(shards)} shard(s) "
+        f"on {processes} process(es), {threads} embedder thread(s) each."
+    )
+
+    journal = None
+    if not dry_run:
+        journal = MoveJournal(options.journal_path)
+        recover_journal(journal)
+    reports: List[dict] = []
+    to_label: List[Tuple[Path, np.ndarray]] = []
+    started = time.perf_counter()
+    mover = None
+    try:
+        with ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=PROCESS_CONTEXT,
+            initializer=_init_worker,
+            initargs=(wrapper_options, threads, options, threshold, dest),
+        ) as pool:
+            futures = [pool.submit(_classify_shard, shard) for shard in shards]
+            for future in as_completed(futures):
+                report, confident, unsure = future.result()
+                reports.append(report)
+                print(
+                    f"[INFO] {report['shard']}: {report['files']} file(s), {report['confident']} confident, "
+                    f"{report['to_label']} to label ({report['seconds']:.2f}s)."
+                )
+                if mover is None and not dry_run and report["files"]:
+                    mover = MoveExecutor(dest, journal, workers=options.move_workers, sources=[str(s) for s in sources])
+                for file_path, category in confident:
+                    if dry_run:
+                        print(f"[DRY-RUN] {file_path.name} → [{category}]")
+                    else:
+                        mover.submit(file_path, category)
+                to_label.extend(unsure)
+        elapsed = time.perf_counter() - started
+
+        reports.sort(key=lambda r: r["shard"])
+        totals = {key: sum(r[key] for r in reports) for key in ("files", "confident", "to_label", "cache_hits", "cache_misses")}
+        merged = dict(
+            totals,
+            sources=[str(s) for s in sources],
+            processes=processes,
+            threads_per_worker=threads,
+            seconds=elapsed,
+            shards=reports,
+        )
+        rate = totals["files"] / elapsed if elapsed > 0 else 0.0
+        print(
+            f"[INFO] Classified {totals['files']} file(s) in {elapsed:.2f}s ({rate:.1f} files/s): "
+            f"{totals['confident']} confident, {totals['to_label']} to label."
+        )
+        if options.use_cache:
+            print(f"[INFO] Embedding cache: {totals['cache_hits']} hit(s), {totals['cache_misses']} miss(es).")
+
+        if to_label:
+            print(f"\n[INFO] {len(to_label)} file(s) need manual labeling.")
+            resp = input("Would you like to label them now? [y/N]: ").strip().lower()
+            if resp == "y":
+                labelling_started = time.perf_counter()
+                label_store = None if dry_run else LabelStore(Path(LABELS_FILE))
+                model_changed = _label_pending(
+                    to_label, knn_wrapper, threshold, mover, dry_run, label_store, group_labels
+                )
+                if label_store is not None:
+                    label_store.close()
+                if model_changed and not dry_run:
+                    knn_wrapper.save()
+                profiling.add_time("labelling", time.perf_counter() - labelling_started)
+            else:
+                for file_path, _ in to_label:
+                    if dry_run:
+                        print(f"[DRY-RUN] {file_path.name} → [{UNCATEGORISED_LABEL}]")
+                    else:
+                        mover.submit(file_path, UNCATEGORISED_LABEL)
+        else:
+            print("[INFO] No files needed manual labeling.")
+    finally:
+        if mover is not None:
+            mover.close()
+
+    print("[INFO] Done.")
+    return merged
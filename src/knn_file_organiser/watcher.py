@@ -0,0 +1,95 @@
+import glob
+import os
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .config import WATCH_INTERVAL, WATCH_DEBOUNCE
+from .io_utils import iter_files
+
+
+def exclude_dest(source: Path, dest: Path, exclude: Optional[List[str]] = None) -> List[str]:
+    """
+    `exclude` plus a pattern for `dest` when it lies inside `source`, so files that were
+    just organised are not picked up again by the scan.
+    """
+    exclude = list(exclude or [])
+    try:
+        rel = Path(dest).resolve().relative_to(Path(source).resolve())
+    except ValueError:
+        return exclude
+    if rel.parts:
+        exclude.append(glob.escape(rel.as_posix()))
+    return exclude
+
+
+def snapshot(source: Path, **scan_options) -> Dict[Path, Tuple[int, int]]:
+    """
+    Map each file under `source` (as listed by `iter_files(source, **scan_options)`)
+    to its (size, mtime_ns). Files that vanish mid-scan are left out.
+    """
+    snap = {}
+    for file_path in iter_files(source, **scan_options):
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            continue
+        snap[file_path] = (st.st_size, st.st_mtime_ns)
+    return snap
+
+
+def watch_changes(
+    source: Path,
+    interval: float = WATCH_INTERVAL,
+    debounce: float = WATCH_DEBOUNCE,
+    initial: bool = True,
+    max_polls: Optional[int] = None,
+    **scan_options,
+) -> Iterator[List[Path]]:
+    """
+    Poll `source` every `interval` seconds by comparing scandir snapshots and yield
+    micro-batches of files that are new or changed.
+    A file is only yielded once its size and mtime have stayed the same for `debounce`
+    seconds, so files that are still being written or copied are not picked up half-done;
+    everything that settles in the same poll is yielded together. With `initial`, files
+    already present when watching starts count as new. A file that disappears and comes
+    back is reported again. Stops after `max_polls` polls (default: never).
+    The baseline snapshot is taken when this is called, not on the first `next()`.
+    """
+    known: Dict[Path, Tuple[int, int]] = {} if initial else snapshot(source, **scan_options)
+    return _poll(source, known, interval, debounce, max_polls, scan_options)
+
+
+def _poll(
+    source: Path,
+    known: Dict[Path, Tuple[int, int]],
+    interval: float,
+    debounce: float,
+    max_polls: Optional[int],
+    scan_options: dict,
+) -> Iterator[List[Path]]:
+    # path -> (signature, monotonic time it was first seen with that signature)
+    settling: Dict[Path, Tuple[Tuple[int, int], float]] = {}
+    polls = 0
+    while max_polls is None or polls < max_polls:
+        started = time.monotonic()
+        current = snapshot(source, **scan_options)
+        for file_path, sig in current.items():
+            if known.get(file_path) == sig:
+                continue
+            seen = settling.get(file_path)
+            if seen is None or seen[0] != sig:
+                settling[file_path] = (sig, started)
+        for file_path in [p for p in settling if p not in current]:
+            del settling[file_path]
+        for file_path in [p for p in known if p not in current]:
+            del known[file_path]
+
+        ready = sorted(p for p, (_, since) in settling.items() if started - since >= debounce)
+        for file_path in ready:
+            known[file_path] = settling.pop(file_path)[0]
+        polls += 1
+        if ready:
+            yield ready
+        if max_polls is None or polls < max_polls:
+            time.sleep(max(0.0, interval - (time.monotonic() - started)))
@@ -0,0 +1,57 @@
+import re
+import zlib
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+
+class HashingEmbedder:
+    """
+    Tiny offline stand-in for SentenceTransformer: a hashed bag-of-words vector.
+    Texts sharing words end up close together, which is all the tests need.
+    """
+
+    def __init__(self, model_name: str = "stub", dim: int = 256):
+        self.model_name = model_name
+        self.dim = dim
+        self.calls = []
+
+    def encode(self, texts, batch_size=32, convert_to_numpy=True, **kwargs):
+        self.calls.append(list(texts))
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in re.findall(r"\w+", text.lower()):
+                out[row, zlib.crc32(word.encode()) % self.dim] += 1.0
+        return out
+
+
+@pytest.fixture
+def stub_embedder(monkeypatch):
+    """
+    Make model_utils load HashingEmbedder instead of a SentenceTransformer.
+    """
+    from knn_file_organiser import model_utils
+    monkeypatch.setattr(model_utils, "_load_embedder", HashingEmbedder)
+    return HashingEmbedder
+
+
+def _make_pdf(path: Path, text: str) -> Path:
+    import fitz
+
+    doc = fitz.open()
+    page = doc.new_page()
+    page.insert_text((72, 72), text)
+    doc.save(str(path))
+    doc.close()
+    return path
+
+
+@pytest.fixture
+def mixed_files(tmp_path):
+    files = []
+    for i in range(6):
+        files.append(_make_pdf(tmp_path / f"doc_{i}.pdf", f"invoice number {i}"))
+        files.append(tmp_path / f"Photo_{i}.jpg")
+        files[-1].write_text("x")
+    return files
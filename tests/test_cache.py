@@ -0,0 +1,57 @@
+import os
+import numpy as np
+from knn_file_organiser.cache import EmbeddingCache
+
+def test_cache_roundtrip_and_invalidation(tmp_path):
+    f = tmp_path / "a.txt"
+    f.write_text("hello")
+    with EmbeddingCache(tmp_path / "c.sqlite", model_name="m1") as cache:
+        assert cache.get_many([f]) == [None]
+        cache.put_many([(f, "hello", np.arange(4, dtype=np.float32))])
+        text, vec = cache.get_many([f])[0]
+        assert text == "hello" and vec.tolist() == [0, 1, 2, 3]
+
+    # survives reopening, but not a different embedder
+    with EmbeddingCache(tmp_path / "c.sqlite", model_name="m1") as cache:
+        assert cache.get_many([f])[0] is not None
+    with EmbeddingCache(tmp_path / "c.sqlite", model_name="m2") as cache:
+        assert cache.get_many([f]) == [None]
+
+    # a modified file is a miss
+    f.write_text("hello again")
+    st = os.stat(f)
+    os.utime(f, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    with EmbeddingCache(tmp_path / "c.sqlite", model_name="m1") as cache:
+        assert cache.get_many([f]) == [None]
+
+def test_cache_lru_eviction(tmp_path):
+    files = []
+    for i in range(3):
+        files.append(tmp_path / f"{i}.txt")
+        files[-1].write_text(str(i))
+    with EmbeddingCache(tmp_path / "c.sqlite", model_name="m", max_entries=2) as cache:
+        cache.put_many([(files[0], "0", np.zeros(2))])
+        cache.put_many([(files[1], "1", np.zeros(2))])
+        cache.get_many([files[0]])  # 0 is now more recently used than 1
+        cache.put_many([(files[2], "2", np.zeros(2))])
+        assert len(cache) == 2
+        hits = [h is not None for h in cache.get_many(files)]
+        assert hits == [True, False, True]
+
+def test_cache_precision(tmp_path):
+    f = tmp_path / "a.txt"
+    f.write_text("hello")
+    vec = np.linspace(-1, 1, 16).astype(np.float32)
+    with EmbeddingCache(tmp_path / "c.sqlite", model_name="m", precision="int8") as cache:
+        cache.put_many([(f, "hello", vec)])
+    # readable whatever precision the reader is configured with
+    with EmbeddingCache(tmp_path / "c.sqlite", model_name="m") as cache:
+        _, out = cache.get_many([f])[0]
+    assert out.dtype == np.float32
+    np.testing.assert_allclose(out, vec, atol=1 / 127)
+
+def test_cache_allows_concurrent_processes(tmp_path):
+    cache = EmbeddingCache(tmp_path / "cache.sqlite")
+    assert cache._conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert cache._conn.execute("PRAGMA busy_timeout").fetchone()[0] > 0
+    cache.close()
@@ -0,0 +1,84 @@
+import json
+
+import numpy as np
+import pytest
+
+from knn_file_organiser.calibrate import leave_one_out, recommend_threshold, run_calibration, sweep_thresholds
+from knn_file_organiser.model_utils import KNNModelWrapper
+from knn_file_organiser.organiser import RunOptions
+
+EXAMPLES = [
+    "bank statement April", "bank statement May", "bank account summary",
+    "passport scanned ID", "passport photo ID", "scanned driver ID",
+    "university transcript", "university degree transcript", "degree certificate",
+]
+LABELS = ["Finance"] * 3 + ["Identification"] * 3 + ["Education"] * 3
+
+
+def test_sweep_thresholds_and_recommend():
+    distances = np.array([0.5, 0.1, 0.3, 0.3, 0.9])
+    correct = np.array([True, True, False, True, False])
+    curve = sweep_thresholds(distances, correct)
+    np.testing.assert_allclose(curve["threshold"], [0.1, 0.3, 0.5, 0.9])
+    np.testing.assert_array_equal(curve["covered"], [1, 3, 4, 5])
+    np.testing.assert_allclose(curve["coverage"], [0.2, 0.6, 0.8, 1.0])
+    np.testing.assert_allclose(curve["accuracy"], [1.0, 2 / 3, 3 / 4, 3 / 5])
+    assert recommend_threshold(curve, 0.75) == 2
+    assert recommend_threshold(curve, 1.0) == 0
+    assert recommend_threshold(sweep_thresholds(distances, np.zeros(5, bool)), 0.5) is None
+
+
+@pytest.mark.parametrize("metric", ["euclidean", "cosine"])
+def test_leave_one_out_matches_brute_force(stub_embedder, metric):
+    knn = KNNModelWrapper(metric=metric)
+    knn.train(EXAMPLES, LABELS)
+    predicted, means = leave_one_out(knn, batch_size=4)
+
+    vecs = knn.embedding_matrix()
+    full = np.linalg.norm(vecs[:, None, :] - vecs[None, :, :], axis=2)
+    if metric == "cosine":
+        full = full ** 2 / 2
+    np.fill_diagonal(full, np.inf)
+    expected = np.sort(full, axis=1)[:, :3].mean(axis=1)
+    np.testing.assert_allclose(means, expected, atol=1e-5)
+    assert (predicted == np.array(LABELS)).mean() >= 2 / 3
+
+
+def test_run_calibration_on_labelled_tree(stub_embedder, tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "labels.json").write_text(json.dumps({"examples": EXAMPLES, "labels": LABELS}))
+    tree = tmp_path / "Organised"
+    for label, name in [("Finance", "bank statement June"), ("Identification", "passport ID renewal"),
+                        ("Education", "degree transcript copy"), ("Uncategorised", "bank statement")]:
+        (tree / label).mkdir(parents=True)
+        (tree / label / f"{name}.txt").write_text(name)
+
+    result = run_calibration(source=tree, options=RunOptions(threshold=0.5, use_cache=False, workers=0),
+                             target_accuracy=1.0, json_path=tmp_path / "curve.json")
+    assert result["files"] == 3  # the Uncategorised folder has no label to check against
+    assert result["recommended"]["accuracy"] == 1.0
+    assert json.loads((tmp_path / "curve.json").read_text())["curve"]["covered"][-1] == 3
+    assert "Recommended --threshold" in capsys.readouterr().out
+    assert not (tmp_path / "knn_model.kfo").exists()  # trained in memory only
+
+
+def test_run_calibration_never_writes_the_model(stub_embedder, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "labels.json").write_text(json.dumps({"examples": EXAMPLES, "labels": LABELS}))
+    knn = KNNModelWrapper()
+    knn.train(EXAMPLES[:-1], LABELS[:-1])
+    knn.save()
+    saved = (tmp_path / "knn_model.kfo").read_bytes()
+
+    # The extra labelled example is used, but only in memory
+    assert run_calibration(target_accuracy=0.5)["files"] == len(EXAMPLES)
+    run_calibration(options=RunOptions(retrain=True), target_accuracy=0.5)
+    with pytest.raises(ValueError):
+        run_calibration(options=RunOptions(metric="cosine"))
+    assert (tmp_path / "knn_model.kfo").read_bytes() == saved
+
+
+def test_calibrate_subcommand_args():
+    from knn_file_organiser.cli import parse_args
+    args = parse_args(["calibrate", "--target-accuracy", "0.8", "--metric", "cosine"])
+    assert (args.command, args.source, args.target_accuracy, args.metric) == ("calibrate", None, 0.8, "cosine")
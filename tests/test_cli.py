@@ -0,0 +1,69 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from knn_file_organiser.config import CACHE_FILE, MODEL_ARTIFACT_FILE
+
+SRC = str(Path(__file__).resolve().parents[1] / "src")
+HEAVY = ("torch", "sentence_transformers", "sklearn", "fitz", "joblib")
+
+CHECK = """
+import sys
+sys.argv = ["knn-file-organiser"] + {argv!r}
+from knn_file_organiser.cli import main
+try:
+    main()
+except SystemExit:
+    pass
+print("LOADED=" + ",".join(m for m in {heavy!r} if m in sys.modules))
+"""
+
+
+def _loaded_modules(argv, cwd):
+    out = subprocess.run(
+        [sys.executable, "-c", CHECK.format(argv=argv, heavy=HEAVY)],
+        cwd=cwd, capture_output=True, text=True, env={"PYTHONPATH": SRC}, check=True,
+    ).stdout
+    line = [l for l in out.splitlines() if l.startswith("LOADED=")][-1]
+    return [m for m in line[len("LOADED="):].split(",") if m]
+
+
+@pytest.mark.parametrize("argv", [["--help"], ["--version"]])
+def test_help_and_version_skip_heavy_imports(argv, tmp_path):
+    assert _loaded_modules(argv, tmp_path) == []
+
+
+def test_empty_source_run_skips_heavy_imports_and_model(tmp_path):
+    (tmp_path / "src").mkdir()
+    assert _loaded_modules(["--source", "src", "--dest", "out"], tmp_path) == []
+    assert not (tmp_path / MODEL_ARTIFACT_FILE).exists()
+    assert not (tmp_path / CACHE_FILE).exists()
+
+
+def test_watch_subcommand_args():
+    from knn_file_organiser.cli import parse_args
+    args = parse_args(["watch", "--source", "in", "--interval", "0.1", "--dry-run"])
+    assert (args.command, args.interval, args.dry_run, args.undo) == ("watch", 0.1, True, None)
+    assert parse_args(["--source", "in"]).command == "run"
+
+
+def test_duplicate_args():
+    from knn_file_organiser.cli import parse_args
+    args = parse_args(["--duplicates", "link", "--near-duplicates"])
+    assert (args.duplicates, args.near_duplicates) == ("link", 0.98)
+    with pytest.raises(SystemExit):
+        parse_args(["--near-duplicates", "0.9"])
+
+
+def test_sharded_args():
+    from knn_file_organiser.cli import parse_args
+    args = parse_args(["--source", "a", "--source", "b"])
+    assert (args.sources, args.source, args.sharded) == ([Path("a"), Path("b")], Path("a"), True)
+    assert args.workers is None  # so sharding can tell an explicit --workers from the default
+    assert not parse_args([]).sharded
+    with pytest.raises(SystemExit):
+        parse_args(["--shard-workers", "2", "--stream"])
+    with pytest.raises(SystemExit):
+        parse_args(["watch", "--source", "a", "--source", "b"])
@@ -0,0 +1,60 @@
+import json
+
+import numpy as np
+import pytest
+
+from knn_file_organiser.clustering import cluster_embeddings, minibatch_kmeans, representatives
+from knn_file_organiser.organiser import RunOptions, run_organiser
+
+
+def _blobs(n_per, centres, scale=0.05, seed=0):
+    rng = np.random.default_rng(seed)
+    centres = np.asarray(centres, dtype=np.float32)
+    vecs = np.vstack([c + rng.normal(scale=scale, size=(n, len(c))) for c, n in zip(centres, n_per)])
+    return vecs.astype(np.float32), np.repeat(np.arange(len(centres)), n_per)
+
+
+@pytest.mark.parametrize("max_centroids", [256, 8])
+def test_cluster_embeddings_recovers_blobs(max_centroids):
+    vecs, truth = _blobs([30, 12, 5], np.eye(3) * 4)
+    groups = cluster_embeddings(vecs, max_distance=1.0, max_centroids=max_centroids)
+    assert [len(g) for g in groups] == [30, 12, 5]
+    assert all(len(set(truth[g])) == 1 for g in groups)
+    # A cut-off below the noise level leaves every file on its own
+    assert len(cluster_embeddings(vecs[:20], max_distance=1e-6)) == 20
+
+
+def test_minibatch_kmeans_and_representatives():
+    vecs, truth = _blobs([40, 40], [[0, 0], [10, 0]])
+    centroids, assign = minibatch_kmeans(vecs, 2, batch_size=16, n_iter=20)
+    assert len(centroids) == 2 and len(set(zip(assign, truth))) == 2
+    rows = np.flatnonzero(truth == 0)
+    shown = representatives(vecs, rows, n=3)
+    mean = vecs[rows].mean(axis=0)
+    assert np.linalg.norm(vecs[shown[0]] - mean) == np.linalg.norm(vecs[rows] - mean, axis=1).min()
+
+
+def test_run_organiser_group_labels(tmp_path, monkeypatch, stub_embedder):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "labels.json").write_text(
+        '{"examples": ["bank statement", "credit card statement", "passport scan", "driver license"],'
+        ' "labels": ["Finance", "Finance", "ID", "ID"]}'
+    )
+    src = tmp_path / "src"
+    src.mkdir()
+    for name in ["gym receipt june", "gym receipt may", "gym receipt april", "holiday photo beach", "holiday photo snow"]:
+        (src / f"{name}.txt").write_text(name)
+    prompts = []
+    answers = iter(["y", "Gym", ""])
+    monkeypatch.setattr("builtins.input", lambda prompt="": prompts.append(prompt) or next(answers))
+
+    dest = tmp_path / "organised"
+    run_organiser(src, dest, RunOptions(threshold=1.5, use_cache=False, workers=0), group_labels=True)
+
+    assert len(prompts) == 3  # one per group, not one per file
+    assert sorted(p.name for p in (dest / "Gym").iterdir()) == [
+        "gym receipt april.txt", "gym receipt june.txt", "gym receipt may.txt"
+    ]
+    assert len(list((dest / "Uncategorised").iterdir())) == 2
+    labels = json.loads((tmp_path / "labels.json").read_text())
+    assert labels["labels"].count("Gym") == 3
@@ -0,0 +1,86 @@
+import os
+
+import numpy as np
+import pytest
+
+from knn_file_organiser import model_utils
+from knn_file_organiser.dedup import DuplicateFinder, NearDuplicateIndex, hard_link_copies
+from knn_file_organiser.organiser import RunOptions, run_organiser
+
+
+def test_duplicate_finder(tmp_path):
+    files = {
+        "a.bin": b"A" * 100 + b"1",
+        "b.bin": b"A" * 100 + b"2",  # same size and prefix, different tail
+        "a (1).bin": b"A" * 100 + b"1",
+        "other.bin": b"short",
+        "empty1.txt": b"",
+        "empty2.txt": b"",
+        "a-2.bin": b"A" * 100 + b"1",
+    }
+    for name, data in files.items():
+        (tmp_path / name).write_bytes(data)
+    finder = DuplicateFinder(partial_bytes=16, chunk_bytes=7)
+    originals = list(finder.filter(tmp_path / name for name in files))
+    assert [p.name for p in originals] == ["a.bin", "b.bin", "other.bin", "empty1.txt", "empty2.txt"]
+    assert [(d.name, o.name) for d, o in finder.duplicates] == [("a (1).bin", "a.bin"), ("a-2.bin", "a.bin")]
+    # "other.bin" has a unique size, so it was never read
+    assert tmp_path / "other.bin" not in finder._partial
+
+
+def test_near_duplicate_index_blocks(tmp_path):
+    rng = np.random.default_rng(0)
+    base = rng.normal(size=(5, 8)).astype(np.float32)
+    paths = [tmp_path / f"f{i}" for i in range(8)]
+    index = NearDuplicateIndex(similarity=0.99, block_rows=2)
+    assert index.add(paths[:5], base) == [None] * 5
+    batch = np.vstack([base[3] * 2.0, rng.normal(size=(1, 8)), base[1] + 1e-3])
+    out = index.add(paths[5:], batch)
+    assert out == [paths[3], None, paths[1]]
+    # Within one batch, the later near copy points at the earlier file
+    assert index.add([tmp_path / "x", tmp_path / "y"], np.vstack([batch[1] * 0 + 7, batch[1] * 0 + 7.01])) == [
+        None,
+        tmp_path / "x",
+    ]
+
+
+def test_hard_link_copies(tmp_path):
+    original = tmp_path / "a.pdf"
+    copy = tmp_path / "b.pdf"
+    original.write_bytes(b"same")
+    copy.write_bytes(b"same")
+    assert hard_link_copies([(original, copy), (original, tmp_path / "missing" / "c.pdf")]) == 1
+    assert os.path.samefile(original, copy)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["a.pdf", "b.pdf"]
+
+
+@pytest.mark.parametrize("policy", ["skip", "link", "move"])
+def test_run_organiser_duplicates(tmp_path, monkeypatch, stub_embedder, policy):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "labels.json").write_text(
+        '{"examples": ["bank statement", "credit card statement", "passport scan", "driver license"],'
+        ' "labels": ["Finance", "Finance", "ID", "ID"]}'
+    )
+    monkeypatch.setattr("builtins.input", lambda *args: "n")
+    src = tmp_path / "src"
+    (src / "old").mkdir(parents=True)
+    (src / "bank statement.txt").write_text("bank statement April")
+    (src / "old" / "bank statement.txt").write_text("bank statement April")
+    (src / "passport scan.txt").write_text("passport scan page 1")
+
+    embedders = []
+    monkeypatch.setattr(model_utils, "_load_embedder", lambda name: embedders.append(stub_embedder(name)) or embedders[-1])
+    dest = tmp_path / "organised"
+    run_organiser(src, dest, RunOptions(threshold=0.5, use_cache=False, workers=0), duplicates=policy)
+
+    # The copy's content is never extracted or embedded
+    encoded = [text for calls in embedders[0].calls for text in calls]
+    assert sorted(encoded[:2]) == ["bank statement April", "passport scan page 1"]
+    assert len(encoded) == 2 + 4  # the files, then the training examples
+    [original] = [p for p in dest.glob("*/bank statement.txt") if p.parent.name != "Duplicates"]
+    if policy == "skip":
+        assert (src / "old" / "bank statement.txt").exists()
+    elif policy == "move":
+        assert (dest / "Duplicates" / "bank statement.txt").exists()
+    else:
+        assert os.path.samefile(original, original.with_name("bank statement (1).txt"))
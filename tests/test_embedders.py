@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+
+from knn_file_organiser import model_utils
+from knn_file_organiser.embedders import NgramEmbedder, encode_scheduled, make_embedder, plan_batches
+from knn_file_organiser.model_utils import KNNModelWrapper
+from knn_file_organiser.organiser import _cache_model_key
+
+from tests.conftest import HashingEmbedder
+
+
+def test_ngram_embedder_vectors():
+    embedder = make_embedder("hashing:256")
+    assert isinstance(embedder, NgramEmbedder)
+    texts = ["Bank Statement April", "bank statement april", "passport scan", ""]
+    vecs = embedder.encode(texts, batch_size=3)
+    assert vecs.shape == (4, 256) and vecs.dtype == np.float32
+    np.testing.assert_allclose(np.linalg.norm(vecs[:3], axis=1), 1.0, rtol=1e-5)
+    np.testing.assert_array_equal(vecs[0], vecs[1])
+    assert not vecs[3].any()
+    # Stateless: a text embeds the same whatever it is batched with
+    np.testing.assert_array_equal(embedder.encode(["passport scan"])[0], vecs[2])
+    with pytest.raises(ValueError):
+        make_embedder("hashing:big")
+
+
+def test_ngram_embedder_truncates_to_max_seq_length():
+    embedder = NgramEmbedder(dim=128, max_seq_length=2)
+    a, b = embedder.encode(["invoice 2024 electricity", "invoice 2024 water"])
+    np.testing.assert_array_equal(a, b)
+
+
+def test_wrapper_with_hashing_embedder(tmp_path):
+    knn = KNNModelWrapper(model_name="hashing", metric="cosine")
+    knn.train(
+        ["bank statement April", "bank statement May", "passport scan", "passport photo"],
+        ["Finance", "Finance", "ID", "ID"],
+    )
+    assert knn.predict_with_confidence("statement of bank account")[0] == "Finance"
+    knn.save(tmp_path / "m.kfo")
+    with pytest.raises(ValueError):
+        KNNModelWrapper().load(tmp_path / "m.kfo")
+
+
+def test_embedder_options_reach_the_loader(monkeypatch):
+    loaded = []
+    monkeypatch.setattr(model_utils, "_load_embedder", lambda name, **options: loaded.append((name, options)))
+    knn = KNNModelWrapper(model_name="hashing", embedder_options={"threads": 2, "batch_size": None, "max_seq_length": 64})
+    knn.embedder
+    assert loaded == [("hashing", {"threads": 2, "max_seq_length": 64})]
+    # Truncating inputs changes the vectors, so it is part of the cache key
+    assert _cache_model_key(knn, 100) != _cache_model_key(KNNModelWrapper(model_name="hashing"), 100)
+
+
+def test_embed_batch_size_option_wins_over_the_caller(monkeypatch):
+    embedder = HashingEmbedder()
+    monkeypatch.setattr(model_utils, "_load_embedder", lambda name, **options: embedder)
+    knn = KNNModelWrapper(model_name="hashing", embedder_options={"batch_size": 2})
+    knn.encode([f"document number {i}" for i in range(7)], batch_size=64)
+    assert max(len(call) for call in embedder.calls) == 2
+    embedder.calls.clear()
+    KNNModelWrapper(model_name="hashing").encode([f"document number {i}" for i in range(7)], batch_size=3)
+    assert max(len(call) for call in embedder.calls) == 3
+
+
+def test_plan_batches_caps_padded_tokens():
+    lengths = np.array([40, 3, 3, 500, 10, 4, 12, 3])
+    batches = plan_batches(lengths, max_tokens=32, max_items=3)
+    assert sorted(np.concatenate(batches).tolist()) == list(range(8))
+    assert [lengths[b].tolist() for b in batches] == [[3, 3, 3], [4, 10], [12], [40], [500]]
+
+
+def test_encode_scheduled_dedups_and_keeps_order():
+    embedder = HashingEmbedder()
+    texts = ["bank statement", "a much longer passport scan text " * 8, "bank statement", "id", "id"]
+    vecs = encode_scheduled(embedder, texts, max_tokens=64, max_items=8)
+    np.testing.assert_array_equal(vecs, embedder.encode(texts))
+    # Three distinct texts; the long one is embedded on its own, shortest first
+    assert embedder.calls[:2] == [["id", "bank statement"], [texts[1]]]
+
+
+def test_sentence_transformer_device_defaults_to_auto(monkeypatch):
+    import sys
+    import types
+
+    created = []
+    fake = types.ModuleType("sentence_transformers")
+    fake.SentenceTransformer = lambda name, device=None: created.append(device) or types.SimpleNamespace()
+    monkeypatch.setitem(sys.modules, "sentence_transformers", fake)
+    make_embedder("some-model")
+    make_embedder("some-model", device="cuda")
+    assert created == [None, "cuda"]
+    # The hashing backend takes the option but always runs on the CPU
+    assert isinstance(make_embedder("hashing", device="cuda"), NgramEmbedder)
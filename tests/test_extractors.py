@@ -0,0 +1,86 @@
+import zipfile
+
+import pytest
+
+from knn_file_organiser import extractors, profiling
+from knn_file_organiser.extractors import char_budget, extract_content, has_extractor, needs_process
+from knn_file_organiser.io_utils import extract_text_from_file
+
+from tests.conftest import _make_pdf
+
+
+def _make_docx(path, paragraphs):
+    ns = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+    body = "".join(f"<w:p><w:r><w:t>{p}</w:t></w:r></w:p>" for p in paragraphs)
+    with zipfile.ZipFile(path, "w") as zf:
+        zf.writestr("word/document.xml", f'<w:document xmlns:w="{ns}"><w:body>{body}</w:body></w:document>')
+    return path
+
+
+def test_plain_text_read_is_bounded(tmp_path):
+    path = tmp_path / "notes.md"
+    path.write_text("# Title\n\n" + "word " * 10000)
+    text = extract_content(path, max_chars=100)
+    assert text.startswith("# Title word word")
+    assert len(text) <= 100
+
+
+def test_binary_behind_text_extension_falls_back_to_filename(tmp_path):
+    path = tmp_path / "Tax_Return-2023.txt"
+    path.write_bytes(b"\x00\x01\x02binary")
+    assert extract_text_from_file(path) == "tax return 2023"
+
+
+def test_docx_paragraphs(tmp_path):
+    path = _make_docx(tmp_path / "letter.docx", ["Dear landlord,", "About the tenancy deposit."])
+    assert extract_content(path) == "Dear landlord, About the tenancy deposit."
+    assert needs_process(path)
+
+
+def test_pdf_stops_paging_once_budget_is_filled(tmp_path):
+    import fitz
+
+    path = tmp_path / "long.pdf"
+    doc = fitz.open()
+    for i in range(3):
+        doc.new_page().insert_text((72, 72), f"page {i} " + "lorem ipsum " * 20)
+    doc.save(str(path))
+    doc.close()
+
+    profiler = profiling.enable()
+    try:
+        text = extract_content(path, max_chars=50)
+    finally:
+        profiling.disable()
+    assert text.startswith("page 0 lorem ipsum")
+    assert len(text) <= 50
+    assert profiler.counters["pdf_pages"] == 1
+
+
+def test_extensionless_pdf_is_sniffed(tmp_path):
+    path = _make_pdf(tmp_path / "scan", "Electricity Bill")
+    assert has_extractor(path) and needs_process(path)
+    # PDF text keeps its case, like text and Word files
+    assert extract_content(path) == "Electricity Bill"
+    plain = tmp_path / "README"
+    plain.write_text("not a pdf")
+    assert not has_extractor(plain) and not needs_process(plain)
+
+
+def test_register_extractor(tmp_path, monkeypatch):
+    monkeypatch.setattr(extractors, "_BY_EXTENSION", dict(extractors._BY_EXTENSION))
+    path = tmp_path / "photo.jpg"
+    path.write_bytes(b"\xff\xd8\xff")
+    assert not has_extractor(path)
+
+    @extractors.register_extractor(".jpg")
+    def caption(file_path, max_chars):
+        return "beach at sunset"[:max_chars]
+
+    assert extract_text_from_file(path) == "beach at sunset"
+    assert extract_text_from_file(path, max_chars=5) == "beach"
+
+
+def test_char_budget():
+    assert char_budget(10) == 10 * extractors.CHARS_PER_TOKEN
+    assert char_budget() == extractors.EXTRACT_TOKEN_BUDGET * extractors.CHARS_PER_TOKEN
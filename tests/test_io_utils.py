@@ -23,3 +23,49 @@ def test_extract_text_from_txt(tmp_path):
     txt_path = tmp_path / "notes.txt"
     txt_path.write_text("Hello World")
     assert extract_text_from_file(txt_path) == "Hello World"
+
+@pytest.fixture
+def tree(tmp_path):
+    root = tmp_path / "root"
+    (root / "a" / "deep").mkdir(parents=True)
+    (root / "node_modules").mkdir()
+    for rel in ["top.pdf", "a/one.txt", "a/two.PDF", "a/deep/three.pdf", "node_modules/x.pdf"]:
+        (root / rel).write_text("x")
+    return root
+
+def _rel(paths, root):
+    return [p.relative_to(root).as_posix() for p in paths]
+
+def test_iter_files_matches_list_all_files(tree):
+    from knn_file_organiser.io_utils import iter_files, list_all_files
+    assert _rel(iter_files(tree), tree) == ["top.pdf", "a/one.txt", "a/two.PDF", "a/deep/three.pdf", "node_modules/x.pdf"]
+    assert sorted(iter_files(tree)) == sorted(p for p in tree.rglob("*") if p.is_file())
+    assert list_all_files(tree) == list(iter_files(tree))
+
+def test_iter_files_filters(tree):
+    from knn_file_organiser.io_utils import iter_files
+    assert _rel(iter_files(tree, extensions=["pdf"], exclude=["node_modules"]), tree) == [
+        "top.pdf", "a/two.PDF", "a/deep/three.pdf"]
+    assert _rel(iter_files(tree, max_depth=1), tree) == ["top.pdf", "a/one.txt", "a/two.PDF", "node_modules/x.pdf"]
+    assert _rel(iter_files(tree, include=["a/*"]), tree) == ["a/one.txt", "a/two.PDF", "a/deep/three.pdf"]
+
+def test_iter_files_symlink_policy(tree, tmp_path):
+    from knn_file_organiser.io_utils import iter_files
+    outside = tmp_path / "outside"
+    outside.mkdir()
+    (outside / "linked.pdf").write_text("x")
+    (tree / "link_dir").symlink_to(outside, target_is_directory=True)
+    (tree / "loop").symlink_to(tree, target_is_directory=True)
+    (tree / "link.pdf").symlink_to(tree / "top.pdf")
+    default = _rel(iter_files(tree), tree)
+    assert "link.pdf" in default and "link_dir/linked.pdf" not in default
+    assert "link.pdf" not in _rel(iter_files(tree, symlinks="skip"), tree)
+    followed = _rel(iter_files(tree, symlinks="follow"), tree)
+    assert "link_dir/linked.pdf" in followed
+    assert not any(p.startswith("loop/") for p in followed)
+
+def test_iter_files_subdir(tree):
+    from knn_file_organiser.io_utils import iter_files
+    # Patterns and depth stay relative to the root
+    assert _rel(iter_files(tree, subdir="a", include=["a/*"]), tree) == ["a/one.txt", "a/two.PDF", "a/deep/three.pdf"]
+    assert _rel(iter_files(tree, subdir="a", max_depth=1), tree) == ["a/one.txt", "a/two.PDF"]
@@ -0,0 +1,100 @@
+import json
+
+import numpy as np
+
+from knn_file_organiser.label_queue import LabelQueue
+from knn_file_organiser.model_utils import KNNModelWrapper
+from knn_file_organiser.organiser import RunOptions, run_organiser
+
+LABELS = (
+    '{"examples": ["bank statement", "credit card statement", "passport scan", "driver license"],'
+    ' "labels": ["Finance", "Finance", "ID", "ID"]}'
+)
+
+
+def test_label_queue_pages_and_resume(tmp_path):
+    files = [tmp_path / f"f{i}.txt" for i in range(5)]
+    for f in files:
+        f.write_text("x")
+    vecs = np.arange(15, dtype=np.float32).reshape(5, 3)
+    path = tmp_path / "queue.sqlite"
+
+    queue = LabelQueue(path, run_key="a")
+    assert not queue.resumed
+    queue.push_many(list(zip(files, vecs)))
+    queue.push_many([(files[0], vecs[1])])  # already queued: keeps its place and vector
+    assert len(queue) == 5 and files[0] in queue
+    files[3].unlink()
+    pages = list(queue.pages(rows=2))
+    assert [[p for p, _ in page] for page in pages] == [files[:2], [files[2]], [files[4]]]
+    np.testing.assert_array_equal(pages[0][0][1], vecs[0])
+    assert len(queue) == 4  # the missing file was dropped
+    queue.remove([files[0]])
+    queue.close()
+
+    files[4].unlink()
+    with LabelQueue(path, run_key="a") as queue:
+        # Counted after dropping the files that vanished while the queue was closed
+        assert queue.resumed and len(queue) == 2
+    # A queue left by another run is discarded
+    with LabelQueue(path, run_key="b") as queue:
+        assert not queue.resumed and len(queue) == 0
+
+
+def test_run_organiser_stream(tmp_path, monkeypatch, stub_embedder):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "labels.json").write_text(LABELS)
+    src = tmp_path / "src"
+    src.mkdir()
+    for name in ["bank statement april", "gym receipt june", "gym receipt may", "holiday photo beach"]:
+        (src / f"{name}.txt").write_text(name)
+    dest = src / "organised"  # inside source: must not be rescanned
+    queue_path = tmp_path / "label_queue.sqlite"
+
+    prompts = []
+
+    def answer(prompt=""):
+        if not prompts:
+            # Confident files are moved during the scan, before any prompt
+            assert (dest / "Finance" / "bank statement april.txt").exists()
+            assert len(LabelQueue(queue_path, run_key=run_key)) == 3
+        prompts.append(prompt)
+        return {1: "y", 2: "Gym", 3: "Gym"}.get(len(prompts), "")
+
+    run_key = f"{src}|{dest}|{KNNModelWrapper().embedder_key}"
+    monkeypatch.setattr("builtins.input", answer)
+    run_organiser(src, dest, RunOptions(threshold=2.0, use_cache=False, workers=0), stream=True, queue_path=queue_path)
+
+    assert len(prompts) == 4
+    assert sorted(p.name for p in (dest / "Gym").iterdir()) == ["gym receipt june.txt", "gym receipt may.txt"]
+    assert [p.name for p in (dest / "Uncategorised").iterdir()] == ["holiday photo beach.txt"]
+    assert "Gym" in json.loads((tmp_path / "labels.json").read_text())["labels"]
+    assert not queue_path.exists()
+
+
+def test_run_organiser_stream_resumes(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "labels.json").write_text(LABELS)
+    from knn_file_organiser import model_utils
+    from tests.conftest import HashingEmbedder
+
+    embedder = HashingEmbedder()
+    monkeypatch.setattr(model_utils, "_load_embedder", lambda *args, **kwargs: embedder)
+    src = tmp_path / "src"
+    src.mkdir()
+    for name in ["bank statement april", "gym receipt june"]:
+        (src / f"{name}.txt").write_text(name)
+    dest = tmp_path / "organised"
+    queue_path = tmp_path / "label_queue.sqlite"
+    # An interrupted run had already queued the gym receipt
+    with LabelQueue(queue_path, run_key=f"{src}|{dest}|{KNNModelWrapper().embedder_key}") as queue:
+        queue.push_many([(src / "gym receipt june.txt", embedder.encode(["gym receipt june"])[0])])
+    embedder.calls.clear()
+
+    monkeypatch.setattr("builtins.input", lambda prompt="": "n")
+    run_organiser(src, dest, RunOptions(threshold=2.0, use_cache=False, workers=0), stream=True, queue_path=queue_path)
+
+    assert not any("gym receipt june" in text for call in embedder.calls for text in call)
+    assert (dest / "Finance" / "bank statement april.txt").exists()
+    assert (dest / "Uncategorised" / "gym receipt june.txt").exists()
+    assert not queue_path.exists()
@@ -0,0 +1,64 @@
+import json
+
+from knn_file_organiser.io_utils import append_to_labels_json, load_or_initialize_labels
+from knn_file_organiser.label_store import LabelStore
+
+
+def _snapshot(path):
+    data = json.loads(path.read_text(encoding="utf-8"))
+    return list(zip(data["examples"], data["labels"]))
+
+
+def test_appends_go_to_the_log_until_compaction(tmp_path):
+    path = tmp_path / "labels.json"
+    path.write_text(json.dumps({"examples": ["bank statement"], "labels": ["Finance"]}))
+    store = LabelStore(path, compact_every=3)
+    assert store.append("passport scan", "ID")
+    assert not store.append("bank statement", "Finance")  # already stored
+    assert store.append("bank statement", "Bills")  # same example, other label
+    assert _snapshot(path) == [("bank statement", "Finance")]
+    assert len(store.log_path.read_text().splitlines()) == 2
+
+    assert LabelStore(path).load() == (
+        ["bank statement", "passport scan", "bank statement"],
+        ["Finance", "ID", "Bills"],
+    )
+    store.append("gym receipt", "Gym")  # third append compacts
+    assert not store.log_path.exists()
+    assert _snapshot(path)[-1] == ("gym receipt", "Gym")
+
+
+def test_torn_log_and_replay_after_compaction_crash(tmp_path):
+    path = tmp_path / "labels.json"
+    store = LabelStore(path)
+    store.append("passport scan", "ID")
+    store.close(compact=False)
+    log = store.log_path.read_text()
+    store = LabelStore(path)
+    store.compact()
+    # Crash between the snapshot rename and emptying the log: the log is replayed,
+    # and a half-written last record is skipped
+    store.log_path.write_text(log + '{"example": "tax ret')
+    store = LabelStore(path)
+    assert store.load() == (["passport scan"], ["ID"])
+    store.append("tax return", "Finance")
+    store.close()
+    assert _snapshot(path) == [("passport scan", "ID"), ("tax return", "Finance")]
+
+
+def test_import_export(tmp_path):
+    other = tmp_path / "other.json"
+    other.write_text(json.dumps({"examples": ["a", "b", "a"], "labels": ["X", "Y", "X"]}))
+    store = LabelStore(tmp_path / "labels.json")
+    assert store.import_json(other) == 2
+    store.close()
+    store.export_json(tmp_path / "out.json")
+    assert _snapshot(tmp_path / "out.json") == [("a", "X"), ("b", "Y")]
+
+
+def test_io_utils_wrappers(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "training_labels.json").write_text(json.dumps({"examples": ["seed"], "labels": ["S"]}))
+    assert load_or_initialize_labels() == (["seed"], ["S"])
+    append_to_labels_json("passport.pdf", "ID")
+    assert load_or_initialize_labels() == (["passport.pdf"], ["ID"])
@@ -1,16 +1,308 @@
+import numpy as np
 import pytest
-from knn_file_organiser.model_utils import train_knn, predict_label
+from knn_file_organiser.model_utils import KNNModelWrapper, _vote
 
 @pytest.fixture
 def simple_seed():
-    examples = ["bank statement April", "passport scanned ID", "university transcript"]
-    labels = ["Finance", "Identification", "Education"]
+    examples = [
+        "bank statement April", "bank statement May", "bank account summary",
+        "passport scanned ID", "passport photo ID", "scanned driver ID",
+        "university transcript", "university degree transcript", "degree certificate",
+    ]
+    labels = ["Finance"] * 3 + ["Identification"] * 3 + ["Education"] * 3
     return examples, labels
 
-def test_knn_predict_correct_label(tmp_path, simple_seed):
+def test_knn_predict_correct_label(stub_embedder, simple_seed):
     examples, labels = simple_seed
-    knn = train_knn(examples, labels)
+    knn = KNNModelWrapper()
+    knn.train(examples, labels)
     # ensure basic texts map to correct labels:
-    assert predict_label(knn, "recent bank statement") == "Finance"
-    assert predict_label(knn, "scan of passport") == "Identification"
-    assert predict_label(knn, "degree transcript PDF") == "Education"
+    assert knn.predict_with_confidence("recent bank statement")[0] == "Finance"
+    assert knn.predict_with_confidence("scan of passport")[0] == "Identification"
+    assert knn.predict_with_confidence("degree transcript PDF")[0] == "Education"
+
+def test_predict_batch_matches_single(stub_embedder, simple_seed):
+    examples, labels = simple_seed
+    knn = KNNModelWrapper()
+    knn.train(examples, labels)
+    texts = ["recent bank statement", "scan of passport", "degree transcript PDF", "bank ID"]
+    batch_labels, batch_dists = knn.predict_batch(texts, batch_size=3)
+    assert batch_labels.shape == (4,) and batch_dists.shape == (4,)
+    for text, label, dist in zip(texts, batch_labels, batch_dists):
+        single_label, single_dist = knn.predict_with_confidence(text)
+        assert label == single_label
+        assert dist == pytest.approx(single_dist, rel=1e-6)
+    # the whole batch goes to the embedder in a single encode call
+    assert len(knn.embedder.calls[1]) == 4
+
+def test_predict_batch_empty(stub_embedder, simple_seed):
+    knn = KNNModelWrapper()
+    knn.train(*simple_seed)
+    labels, dists = knn.predict_batch([])
+    assert len(labels) == 0 and len(dists) == 0
+
+def test_vote_majority_and_tie_break():
+    codes = np.array([[0, 1, 1], [2, 0, 1], [1, 0, 0]])
+    assert _vote(codes, 3).tolist() == [1, 2, 0]
+
+def test_add_examples_matches_full_train(stub_embedder, simple_seed):
+    examples, labels = simple_seed
+    incremental = KNNModelWrapper()
+    incremental.train(examples[:6], labels[:6])
+    incremental.add_examples(examples[6:], labels[6:])
+    # only the three new rows were embedded
+    assert len(incremental.embedder.calls[-1]) == 3
+
+    full = KNNModelWrapper()
+    full.train(examples, labels)
+    np.testing.assert_allclose(incremental.embeddings, full.embeddings)
+    texts = ["degree transcript PDF", "bank statement"]
+    assert incremental.predict_batch(texts)[0].tolist() == full.predict_batch(texts)[0].tolist()
+
+def test_train_embeddings_matches_train(stub_embedder, simple_seed):
+    examples, labels = simple_seed
+    knn = KNNModelWrapper(metric="cosine")
+    knn.train(examples, labels)
+    from_vectors = KNNModelWrapper(metric="cosine")
+    from_vectors.train_embeddings(knn.embedder.encode(examples), labels)
+    np.testing.assert_array_equal(from_vectors.embeddings, knn.embeddings)
+    assert from_vectors.labels == labels and from_vectors.examples == [""] * len(examples)
+    query = knn.normalise(knn.embedder.encode(["recent bank statement"]))
+    assert np.linalg.norm(query) == pytest.approx(1.0)
+    assert from_vectors.predict_embeddings(query)[0][0] == "Finance"
+
+
+def test_ivf_index_recall_and_add():
+    from knn_file_organiser.model_utils import IVFIndex, ExactIndex, index_recall
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(20, 16)) * 5
+    vectors = (centers[rng.integers(0, 20, 2000)] + rng.normal(size=(2000, 16))).astype(np.float32)
+
+    ivf = IVFIndex(n_probe=8).fit(vectors[:1500])
+    ivf.add(vectors[1500:])
+    assert index_recall(ivf, vectors, k=3)["recall"] > 0.9
+
+    # probing every cell is exact search
+    full = IVFIndex(n_lists=10, n_probe=10).fit(vectors)
+    queries = vectors[:50] + 0.1
+    d_full, i_full = full.kneighbors(queries, n_neighbors=3)
+    d_exact, i_exact = _sklearn_neighbors(vectors, queries, 3)
+    np.testing.assert_allclose(d_full, d_exact, rtol=1e-4)
+    assert (i_full == i_exact).all()
+
+    exact = ExactIndex().fit(vectors[:1500])
+    exact.add(vectors[1500:])
+    d_added, i_added = exact.kneighbors(queries, n_neighbors=3)
+    np.testing.assert_allclose(d_added, d_exact, rtol=1e-5)
+    assert (i_added == i_exact).all()
+
+def test_index_backend_persisted(stub_embedder, simple_seed, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    knn = KNNModelWrapper(index="ivf", index_params={"n_lists": 3, "n_probe": 3})
+    knn.train(*simple_seed)
+    knn.save(tmp_path / "m.kfo")
+
+    loaded = KNNModelWrapper()
+    loaded.load(tmp_path / "m.kfo")
+    assert loaded.index_backend == "ivf" and loaded.knn.n_lists == 3
+    assert loaded.predict_with_confidence("bank statement")[0] == "Finance"
+    # recall is measured once, at save, and read back with the index
+    assert knn.index_stats is not None and loaded.index_stats == knn.index_stats
+    # the cell lists are mapped from the artifact, not recomputed
+    assert isinstance(loaded.knn._order, np.memmap) and isinstance(loaded.knn._offsets, np.memmap)
+    loaded.add_examples(["bank account summary"], ["Finance"])
+    assert len(loaded.knn._order) == len(simple_seed[0]) + 1
+    assert loaded.predict_with_confidence("bank account summary")[0] == "Finance"
+
+    switched = KNNModelWrapper(index="exact")
+    switched.load(tmp_path / "m.kfo")
+    assert switched.knn.name == "exact"
+
+def _sklearn_neighbors(vectors, queries, k):
+    from sklearn.neighbors import NearestNeighbors
+    return NearestNeighbors().fit(vectors).kneighbors(queries, n_neighbors=k)
+
+@pytest.mark.parametrize("backend", ["dot", "exact"])
+def test_brute_force_index_matches_sklearn(backend):
+    from knn_file_organiser.model_utils import make_index
+    rng = np.random.default_rng(1)
+    vectors = rng.normal(size=(500, 16)).astype(np.float32)
+    queries = rng.normal(size=(40, 16)).astype(np.float32)
+    d_index, i_index = make_index(backend, block_rows=64).fit(vectors).kneighbors(queries, n_neighbors=5)
+    d_ref, i_ref = _sklearn_neighbors(vectors, queries, 5)
+    assert (i_index == i_ref).all()
+    np.testing.assert_allclose(d_index, d_ref, rtol=1e-5)
+
+def test_cosine_metric_distances(stub_embedder, simple_seed, tmp_path, monkeypatch):
+    from sklearn.metrics.pairwise import cosine_distances
+    monkeypatch.chdir(tmp_path)
+    examples, labels = simple_seed
+    knn = KNNModelWrapper(metric="cosine")
+    knn.train(examples, labels)
+    assert knn.index_backend == "dot"
+    np.testing.assert_allclose(np.linalg.norm(knn.embeddings, axis=1), 1.0, rtol=1e-5)
+
+    query = "recent bank statement"
+    label, dist = knn.predict_with_confidence(query)
+    expected = np.sort(cosine_distances(knn.embedder.encode([query]), knn.embedder.encode(examples))[0])[:3].mean()
+    assert label == "Finance"
+    assert dist == pytest.approx(expected, abs=1e-5)
+
+    knn.save(tmp_path / "m.kfo")
+    with pytest.raises(ValueError):
+        KNNModelWrapper(metric="euclidean").load(tmp_path / "m.kfo")
+    reloaded = KNNModelWrapper()
+    reloaded.load(tmp_path / "m.kfo")
+    assert reloaded.metric == "cosine"
+
+def test_artifact_roundtrip_is_memory_mapped(stub_embedder, simple_seed, tmp_path):
+    from knn_file_organiser.artifact import ArtifactError
+    knn = KNNModelWrapper()
+    knn.train(*simple_seed)
+    knn.save(tmp_path / "m.kfo")
+
+    loaded = KNNModelWrapper()
+    loaded.load(tmp_path / "m.kfo", verify=True)
+    assert isinstance(loaded.embeddings, np.memmap)
+    # the exact index searches the mapped matrix with its saved norms: nothing is rebuilt
+    assert loaded.knn._data is loaded.embeddings and isinstance(loaded.knn._sq_norms, np.memmap)
+    assert loaded.labels == simple_seed[1] and loaded.examples == simple_seed[0]
+    assert loaded.label_table == ["Finance", "Identification", "Education"]
+    assert loaded.predict_batch(["bank statement"])[0].tolist() == ["Finance"]
+
+    with pytest.raises(ArtifactError):
+        KNNModelWrapper(model_name="another-model").load(tmp_path / "m.kfo")
+
+    raw = bytearray((tmp_path / "m.kfo").read_bytes())
+    raw[-5] ^= 0xFF
+    (tmp_path / "m.kfo").write_bytes(bytes(raw))
+    KNNModelWrapper().load(tmp_path / "m.kfo")  # no checksum pass by default
+    with pytest.raises(ArtifactError):
+        KNNModelWrapper().load(tmp_path / "m.kfo", verify=True)
+
+def test_save_verifies_what_it_wrote(stub_embedder, simple_seed, tmp_path, monkeypatch):
+    from knn_file_organiser import model_utils
+    from knn_file_organiser.artifact import ArtifactError, write_artifact
+
+    def corrupting_write(path, header, arrays):
+        write_artifact(path, header, arrays)
+        raw = bytearray(path.read_bytes())
+        raw[-5] ^= 0xFF
+        path.write_bytes(bytes(raw))
+
+    monkeypatch.setattr(model_utils, "write_artifact", corrupting_write)
+    knn = KNNModelWrapper()
+    knn.train(*simple_seed)
+    with pytest.raises(ArtifactError):
+        knn.save(tmp_path / "m.kfo")
+
+def test_load_legacy_files(stub_embedder, simple_seed, tmp_path, monkeypatch):
+    import json, joblib
+    from sklearn.neighbors import KNeighborsClassifier
+    monkeypatch.chdir(tmp_path)
+    examples, labels = simple_seed
+    knn = KNNModelWrapper()
+    knn.train(examples, labels)
+    # what older versions wrote: a pickled classifier, embeddings.npy and model_metadata.json
+    joblib.dump(KNeighborsClassifier(n_neighbors=3).fit(knn.embeddings, labels), "knn_model.joblib")
+    np.save("embeddings.npy", knn.embeddings)
+    (tmp_path / "model_metadata.json").write_text(json.dumps({"examples": examples, "labels": labels}))
+
+    legacy = KNNModelWrapper()
+    legacy.load()
+    assert legacy.index_backend == "exact" and legacy.labels == labels
+    assert legacy.predict_batch(["scan of passport"])[0].tolist() == ["Identification"]
+
+@pytest.mark.parametrize("precision", ["float16", "int8"])
+@pytest.mark.parametrize("index", ["exact", "dot", "ivf"])
+def test_quantised_storage(stub_embedder, simple_seed, tmp_path, precision, index):
+    reference = KNNModelWrapper()
+    reference.train(*simple_seed)
+    knn = KNNModelWrapper(precision=precision, index=index)
+    knn.train(*simple_seed)
+    knn.add_examples(["bank transfer receipt"], ["Finance"])
+    reference.add_examples(["bank transfer receipt"], ["Finance"])
+    knn.save(tmp_path / "m.kfo")
+
+    loaded = KNNModelWrapper()
+    loaded.load(tmp_path / "m.kfo", verify=True)
+    assert loaded.precision == precision and loaded.embeddings.dtype == np.dtype(precision)
+    # every backend searches the stored matrix itself, not a float32 copy
+    assert loaded.knn._data is loaded.embeddings
+    texts = ["recent bank statement", "scan of passport", "degree transcript PDF"]
+    labels, dists = loaded.predict_batch(texts)
+    ref_labels, ref_dists = reference.predict_batch(texts)
+    assert labels.tolist() == ref_labels.tolist()
+    np.testing.assert_allclose(dists, ref_dists, rtol=0.02)
+
+    requantised = KNNModelWrapper(precision="float32")
+    requantised.load(tmp_path / "m.kfo")
+    assert requantised.embeddings.dtype == np.float32 and requantised.embedding_scales is None
+
+def test_dot_index_add_quantises_to_its_precision():
+    from knn_file_organiser.model_utils import DotIndex
+    from knn_file_organiser.quantise import quantize
+    rng = np.random.default_rng(3)
+    vectors = rng.normal(size=(60, 8)).astype(np.float32)
+
+    int8 = DotIndex().fit(*quantize(vectors[:40], "int8"))
+    int8.add(vectors[40:])  # float32 rows, no scales
+    assert int8._data.dtype == np.int8 and len(int8._scales) == 60
+    float16 = DotIndex().fit(*quantize(vectors[:40], "float16"))
+    float16.add(*quantize(vectors[40:], "int8"))
+    assert float16._data.dtype == np.float16 and float16._scales is None
+    for index in (int8, float16):
+        assert (index.kneighbors(vectors[40:], n_neighbors=1)[1][:, 0] == np.arange(40, 60)).all()
+
+def test_dot_index_blocked_int8_matches_exact():
+    from knn_file_organiser.model_utils import DotIndex
+    from knn_file_organiser.quantise import quantize, dequantize
+    rng = np.random.default_rng(2)
+    vectors = rng.normal(size=(1000, 32)).astype(np.float32)
+    data, scales = quantize(vectors, "int8")
+    assert np.abs(dequantize(data, scales) - vectors).max() <= scales.max() / 2 + 1e-6
+    queries = rng.normal(size=(20, 32)).astype(np.float32)
+    d_dot, i_dot = DotIndex(block_rows=64).fit(data, scales=scales).kneighbors(queries, n_neighbors=4)
+    d_exact, i_exact = _sklearn_neighbors(dequantize(data, scales), queries, 4)
+    assert (i_dot == i_exact).all()
+    np.testing.assert_allclose(d_dot, d_exact, rtol=1e-5)
+
+
+@pytest.mark.parametrize("metric", ["euclidean", "cosine"])
+@pytest.mark.parametrize("precision", ["float32", "int8"])
+def test_two_stage_search(metric, precision):
+    rng = np.random.default_rng(0)
+    n_labels, per = 30, 12
+    centers = rng.normal(size=(n_labels, 16)).astype(np.float32) * 3
+    vectors = np.repeat(centers, per, axis=0) + rng.normal(size=(n_labels * per, 16)).astype(np.float32)
+    queries = centers[rng.integers(0, n_labels, 50)] + rng.normal(size=(50, 16)).astype(np.float32)
+
+    def build(candidate_labels):
+        knn = KNNModelWrapper(index="dot", metric=metric, precision=precision, candidate_labels=candidate_labels)
+        knn.train_embeddings(vectors, [f"L{i}" for i in range(n_labels) for _ in range(per)])
+        return knn
+
+    exact, all_labels, few = build(None), build(n_labels), build(3)
+    d_exact, i_exact = exact.nearest_embeddings(queries, 5)
+    d_all, i_all = all_labels.nearest_embeddings(queries, 5)
+    assert (i_all == i_exact).all() and np.allclose(d_all, d_exact, atol=1e-5)
+    assert (few.nearest_embeddings(queries, 5)[1] == i_exact).mean() > 0.95
+    # More neighbours than the candidate labels hold falls back to all labels
+    assert (few.nearest_embeddings(queries[:3], 40)[1] == exact.nearest_embeddings(queries[:3], 40)[1]).all()
+
+    # The early reject never changes which side of the threshold a vector falls on
+    labels, mean = exact.predict_embeddings(np.vstack([queries, queries + 50]))
+    threshold = float(np.median(mean))
+    labels_2, mean_2 = few.predict_embeddings(np.vstack([queries, queries + 50]), reject_above=threshold)
+    assert ((mean <= threshold) == (mean_2 <= threshold)).all()
+    assert (labels_2[mean <= threshold] == labels[mean <= threshold]).all()
+    assert (mean_2 <= mean + 1e-5).all()
+
+
+def test_two_stage_follows_new_examples(stub_embedder, simple_seed):
+    examples, labels = simple_seed
+    knn = KNNModelWrapper(candidate_labels=1)
+    knn.train(examples, labels)
+    assert knn.predict_with_confidence("recent bank statement")[0] == "Finance"
+    knn.add_examples(["gym receipt may", "gym receipt june", "gym membership receipt"], ["Gym"] * 3)
+    assert knn.predict_with_confidence("gym receipt april")[0] == "Gym"
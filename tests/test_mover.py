@@ -0,0 +1,88 @@
+import json
+
+import pytest
+
+from knn_file_organiser.io_utils import unique_target
+from knn_file_organiser.mover import MoveExecutor, MoveJournal, recover_journal, undo_run
+
+
+@pytest.fixture
+def source(tmp_path):
+    src = tmp_path / "src"
+    (src / "sub").mkdir(parents=True)
+    for name in ("a.txt", "b.pdf", "sub/a.txt"):
+        (src / name).write_text(name)
+    return src
+
+
+def test_unique_target(tmp_path):
+    (tmp_path / "a.txt").write_text("x")
+    reserved = set()
+    assert unique_target(tmp_path, "a.txt", reserved) == tmp_path / "a (1).txt"
+    assert unique_target(tmp_path, "a.txt", reserved) == tmp_path / "a (2).txt"
+    assert unique_target(tmp_path, "b.txt", reserved) == tmp_path / "b.txt"
+
+
+@pytest.mark.parametrize("workers", [0, 4])
+def test_executor_never_overwrites(tmp_path, source, workers):
+    dest = tmp_path / "dest"
+    (dest / "Docs").mkdir(parents=True)
+    (dest / "Docs" / "a.txt").write_text("already here")
+    journal = MoveJournal(tmp_path / "journal.jsonl")
+    with MoveExecutor(dest, journal, workers=workers) as mover:
+        for f in (source / "a.txt", source / "sub" / "a.txt", source / "b.pdf"):
+            mover.submit(f, "Docs")
+    assert (dest / "Docs" / "a.txt").read_text() == "already here"
+    assert {(dest / "Docs" / n).read_text() for n in ("a (1).txt", "a (2).txt")} == {"a.txt", "sub/a.txt"}
+    assert mover.moved == 3 and not mover.failed
+    events = [r["event"] for r in journal.read()]
+    assert events[0] == "start" and events[-1] == "end"
+    assert events.count("move") == events.count("done") == 3
+
+
+def test_executor_reports_failures(tmp_path, capsys):
+    with MoveExecutor(tmp_path / "dest", workers=2) as mover:
+        mover.submit(tmp_path / "missing.txt", "Docs")
+    assert mover.failed == 1
+    assert "[ERROR] Unable to move" in capsys.readouterr().out
+
+
+def test_undo_restores_last_run(tmp_path, source):
+    dest = tmp_path / "dest"
+    journal = MoveJournal(tmp_path / "journal.jsonl")
+    with MoveExecutor(dest, journal) as mover:
+        mover.submit(source / "a.txt", "Docs")
+        mover.submit(source / "sub" / "a.txt", "Docs")
+    with MoveExecutor(dest, journal) as mover:
+        mover.submit(source / "b.pdf", "Papers")
+
+    stats = undo_run(journal)
+    assert stats["moved"] == 1 and (source / "b.pdf").exists()
+    assert not (dest / "Papers").exists()
+    undo_run(journal)
+    assert (source / "a.txt").read_text() == "a.txt"
+    assert (source / "sub" / "a.txt").read_text() == "sub/a.txt"
+    assert not dest.exists() or not any(dest.rglob("*.txt"))
+    assert undo_run(journal)["moved"] == 0
+
+
+def test_recover_interrupted_run(tmp_path, source):
+    dest = tmp_path / "dest"
+    (dest / "Docs").mkdir(parents=True)
+    journal_path = tmp_path / "journal.jsonl"
+    moved = dest / "Docs" / "b.pdf"
+    (source / "b.pdf").rename(moved)
+    # A run that crashed with two moves in flight: one finished on disk, one not started
+    records = [
+        {"run": "r1", "event": "start", "kind": "organise", "dest": str(dest)},
+        {"run": "r1", "event": "move", "src": str(source / "b.pdf"), "dst": str(moved)},
+        {"run": "r1", "event": "move", "src": str(source / "a.txt"), "dst": str(dest / "Docs" / "a.txt")},
+    ]
+    journal_path.write_text("".join(json.dumps(r) + "\n" for r in records) + '{"run": "r1", "ev')
+    journal = MoveJournal(journal_path)
+    assert recover_journal(journal) == 2
+    assert (dest / "Docs" / "a.txt").exists() and not (source / "a.txt").exists()
+    assert recover_journal(journal) == 0
+
+    undo_run(journal, run_id="r1")
+    assert (source / "a.txt").exists() and (source / "b.pdf").exists()
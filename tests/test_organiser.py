@@ -1,7 +1,7 @@
 import shutil
 import pytest
 from pathlib import Path
-from knn_file_organiser.organiser import run_organiser
+from knn_file_organiser.organiser import RunOptions, run_organiser
 
 @pytest.fixture
 def sample_files(tmp_path):
@@ -12,14 +12,41 @@ def sample_files(tmp_path):
     (src / "id_scan.txt").write_text("driver license scan")
     return src
 
-def test_run_organiser_dry_run(tmp_path, monkeypatch, sample_files):
-    # monkeypatch the model to always return "Finance" for any file
-    from knn_file_organiser import model_utils
-    class DummyKNN:
-        def predict(self, vecs): return ["Finance"]
-    monkeypatch.setattr(model_utils, "load_or_train_model", lambda *args, **kwargs: DummyKNN())
+def test_run_organiser_dry_run(tmp_path, monkeypatch, stub_embedder, sample_files):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "labels.json").write_text(
+        '{"examples": ["bank statement", "credit card statement", "passport scan", "driver license"],'
+        ' "labels": ["Finance", "Finance", "ID", "ID"]}'
+    )
+    monkeypatch.setattr("builtins.input", lambda *args: "n")
 
     dest = tmp_path / "organised"
-    run_organiser(source=sample_files, dest=dest, threshold=0.5, dry_run=True)
+    run_organiser(sample_files, dest, RunOptions(threshold=0.5, dry_run=True, use_cache=False, workers=0))
     # In dry_run mode, files should NOT be moved; dest folder should either not exist
     assert not dest.exists()
+    assert sorted(p.name for p in sample_files.iterdir()) == ["bank_doc.txt", "id_scan.txt"]
+    assert not (tmp_path / "move_journal.jsonl").exists()
+
+def test_resolve_pending_uses_new_labels(tmp_path, stub_embedder):
+    from knn_file_organiser.model_utils import KNNModelWrapper
+    from knn_file_organiser.organiser import _resolve_pending
+    knn = KNNModelWrapper()
+    knn.train(["passport scan", "passport photo", "driver licence"], ["ID", "ID", "ID"])
+    pending_files = [tmp_path / "gym receipt june.pdf", tmp_path / "unrelated words.jpg"]
+    for f in pending_files:
+        f.write_text("x")
+    vecs = knn.encode(["gym receipt june", "unrelated words"])
+    _, before = knn.predict_embeddings(vecs)
+
+    knn.add_examples(["gym receipt may", "gym receipt april", "gym membership receipt"], ["Gym"] * 3)
+    _, after = knn.predict_embeddings(vecs)
+    threshold = (after[0] + min(before[0], after[1])) / 2
+    assert after[0] < threshold < before[0]
+    assert after[1] > threshold
+
+    from knn_file_organiser.mover import MoveExecutor
+    dest = tmp_path / "organised"
+    with MoveExecutor(dest) as mover:
+        remaining = _resolve_pending(list(zip(pending_files, vecs)), knn, threshold, mover, dry_run=False)
+    assert [f for f, _ in remaining] == [pending_files[1]]
+    assert (dest / "Gym" / "gym receipt june.pdf").exists()
@@ -0,0 +1,74 @@
+import os
+import time
+from pathlib import Path
+
+import pytest
+
+from knn_file_organiser import extractors, pipeline
+from knn_file_organiser.pipeline import extract_stream
+from tests.conftest import _make_pdf
+
+
+@pytest.mark.parametrize("workers", [0, 2])
+def test_extract_stream_keeps_order(mixed_files, workers):
+    items = [(f, None) for f in mixed_files]
+    out = list(extract_stream(items, workers=workers, prefetch=3))
+    assert [f for f, _, _ in out] == mixed_files
+    assert out[0][2].strip() == "invoice number 0"
+    assert out[1][2] == "photo 0"
+
+
+def test_extract_stream_skips_cached(mixed_files):
+    items = [(f, "cached") for f in mixed_files[:2]]
+    assert list(extract_stream(items, workers=2)) == [(f, "cached", None) for f in mixed_files[:2]]
+
+
+def test_extract_stream_sniffs_extensionless_files_once(tmp_path, monkeypatch):
+    scan = _make_pdf(tmp_path / "scan", "Electricity Bill")
+    notes = tmp_path / "NOTES"
+    notes.write_text("not a pdf")
+    opened = []
+
+    def counting_open(path, *args, **kwargs):
+        opened.append(Path(path).name)
+        return open(path, *args, **kwargs)
+
+    monkeypatch.setattr(extractors, "open", counting_open, raising=False)
+    out = list(extract_stream([(scan, None), (notes, None)], workers=0))
+    assert [text for _, _, text in out] == ["Electricity Bill", "notes"]
+    assert sorted(opened) == ["NOTES", "scan"]
+
+
+def _slow_on_doc_1(file_path, entry, max_chars=None):
+    # Pool workers are spawned, so they import this function rather than inherit a patch;
+    # the call log path reaches them through the environment
+    log = os.environ.get("KFO_TEST_EXTRACT_LOG")
+    if log:
+        with open(log, "a") as f:
+            f.write(file_path.name + "\n")
+    if file_path.name == "doc_1.pdf":
+        time.sleep(30)
+    return "content of " + file_path.name
+
+
+def test_extract_stream_timeout_falls_back_to_filename(mixed_files, monkeypatch):
+    monkeypatch.setattr(pipeline, "_extract", _slow_on_doc_1)
+    items = [(f, None) for f in mixed_files if f.suffix == ".pdf"]
+    start = time.monotonic()
+    out = list(extract_stream(items, workers=2, timeout=3.0, prefetch=4))
+    assert time.monotonic() - start < 20
+    texts = [t for _, _, t in out]
+    assert texts[1] == "doc 1"
+    assert texts[0] == "content of doc_0.pdf" and texts[5] == "content of doc_5.pdf"
+
+
+def test_extract_stream_timeout_keeps_finished_work(mixed_files, monkeypatch, tmp_path):
+    log = tmp_path / "calls.log"
+    monkeypatch.setenv("KFO_TEST_EXTRACT_LOG", str(log))
+    monkeypatch.setattr(pipeline, "_extract", _slow_on_doc_1)
+    items = [(f, None) for f in mixed_files if f.suffix == ".pdf"]
+    out = list(extract_stream(items, workers=2, timeout=3.0, prefetch=4))
+    assert [t for _, _, t in out][2:4] == ["content of doc_2.pdf", "content of doc_3.pdf"]
+    # Files finished before the timeout are not extracted again on the new pool
+    calls = log.read_text().split()
+    assert calls.count("doc_2.pdf") == 1 and calls.count("doc_3.pdf") == 1
@@ -0,0 +1,48 @@
+import pytest
+
+from knn_file_organiser import profiling
+from knn_file_organiser.pipeline import extract_stream
+
+
+@pytest.fixture
+def profiler():
+    yield profiling.enable()
+    profiling.disable()
+
+
+def test_disabled_hooks_are_noops():
+    assert profiling.active() is None
+    profiling.count("files")
+    profiling.observe("extract", 0.1)
+    with profiling.stage("scan"):
+        pass
+    assert list(profiling.timed_iter("scan", [1, 2])) == [1, 2]
+    assert profiling.active() is None
+
+
+def test_report(profiler):
+    profiling.count("files", 3)
+    for ms in range(1, 101):
+        profiling.observe("extract", ms / 1000)
+    with profiling.stage("scan"):
+        pass
+    assert list(profiling.timed_iter("scan", range(3))) == [0, 1, 2]
+    report = profiler.report()
+    assert report["counters"] == {"files": 3}
+    assert report["latency"]["extract"]["n"] == 100
+    assert report["latency"]["extract"]["p50_ms"] == pytest.approx(51)
+    assert report["latency"]["extract"]["max_ms"] == pytest.approx(100)
+    assert "scan" in report["stages"]
+
+
+@pytest.mark.parametrize("workers", [0, 2])
+def test_extraction_counters_include_workers(mixed_files, profiler, workers):
+    import fitz
+
+    list(extract_stream([(f, None) for f in mixed_files], workers=workers))
+    report = profiler.report()
+    assert report["counters"]["pdf_pages"] == 6
+    # Only the text of the parsed pages counts, not the whole file
+    pdf_text = [fitz.open(str(f)).load_page(0).get_text() for f in mixed_files if f.suffix == ".pdf"]
+    assert report["counters"]["bytes_read"] == sum(len(text.encode("utf-8")) for text in pdf_text)
+    assert report["latency"]["extract"]["n"] == len(mixed_files)
@@ -0,0 +1,113 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from knn_file_organiser.model_utils import KNNModelWrapper
+from knn_file_organiser.server import BatchQueue, Client, make_server
+
+
+@pytest.fixture
+def model(stub_embedder):
+    knn = KNNModelWrapper()
+    knn.train(
+        ["bank statement", "bank statement april", "credit card bill", "passport scan", "passport photo", "driver licence"],
+        ["Finance", "Finance", "Finance", "ID", "ID", "ID"],
+    )
+    return knn
+
+
+@pytest.fixture(params=["tcp", "unix"])
+def client(request, model, tmp_path):
+    batcher = BatchQueue(model, threshold=1.0, max_batch=16, max_wait_ms=20)
+    socket_path = tmp_path / "kfo.sock" if request.param == "unix" else None
+    server = make_server(batcher, port=0, socket_path=socket_path)
+    thread = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+    thread.start()
+    if socket_path is not None:
+        connect = lambda: Client(socket_path=socket_path)
+    else:
+        connect = lambda: Client(url="http://%s:%d" % server.server_address[:2])
+    c = connect()
+    c.connect = connect
+    yield c, batcher
+    c.close()
+    server.shutdown()
+    server.server_close()
+    batcher.close()
+
+
+def test_classify_and_neighbors(client, model):
+    c, _ = client
+    texts = ["bank statement may", "passport scan 2"]
+    results = c.classify(texts)
+    labels, distances = model.predict_batch(texts)
+    assert [r["label"] for r in results] == labels.tolist()
+    assert [r["distance"] for r in results] == pytest.approx(distances.tolist())
+
+    neighbors = c.neighbors(["passport scan"], k=2)[0]
+    assert neighbors[0] == {"example": "passport scan", "label": "ID", "distance": pytest.approx(0, abs=1e-5)}
+    assert len(neighbors) == 2
+    assert c.health()["examples"] == 6
+
+
+def test_concurrent_requests_are_batched(client):
+    c, batcher = client
+
+    def one(i):
+        local = c.connect()
+        try:
+            return local.classify([f"bank statement {i}"])[0]["label"]
+        finally:
+            local.close()
+
+    with ThreadPoolExecutor(8) as pool:
+        labels = list(pool.map(one, range(32)))
+    assert labels == ["Finance"] * 32
+    assert batcher.texts == 32 and batcher.batches < 32
+
+
+def test_bad_request(client):
+    c, _ = client
+    with pytest.raises(RuntimeError, match="400"):
+        c._request("POST", "/classify", {"texts": "not a list"})
+
+
+def test_socket_path_only_replaces_sockets(model, tmp_path):
+    import socket
+
+    batcher = BatchQueue(model, threshold=1.0)
+    try:
+        data = tmp_path / "notes.txt"
+        data.write_text("keep me")
+        with pytest.raises(FileExistsError):
+            make_server(batcher, socket_path=data)
+        assert data.read_text() == "keep me"
+
+        # A socket left behind by an earlier server is replaced
+        stale = tmp_path / "kfo.sock"
+        sock = socket.socket(socket.AF_UNIX)
+        sock.bind(str(stale))
+        sock.close()
+        make_server(batcher, socket_path=stale).server_close()
+    finally:
+        batcher.close()
+
+
+def test_socket_in_use_is_not_taken_over(model, tmp_path):
+    batcher = BatchQueue(model, threshold=1.0)
+    socket_path = tmp_path / "kfo.sock"
+    first = make_server(batcher, socket_path=socket_path)
+    thread = threading.Thread(target=first.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+    thread.start()
+    try:
+        with pytest.raises(FileExistsError, match="in use"):
+            make_server(batcher, socket_path=socket_path)
+        # The first server still owns the path
+        c = Client(socket_path=socket_path)
+        assert c.health()["examples"] == 6
+        c.close()
+    finally:
+        first.shutdown()
+        first.server_close()
+        batcher.close()
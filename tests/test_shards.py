@@ -0,0 +1,90 @@
+import json
+import multiprocessing
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from knn_file_organiser.model_utils import KNNModelWrapper
+from knn_file_organiser.mover import MoveJournal
+from knn_file_organiser.organiser import RunOptions
+from knn_file_organiser.shards import Shard, plan_shards, run_sharded
+
+
+def test_plan_shards(tmp_path):
+    root = tmp_path / "root"
+    for rel in ["a/x.txt", "b/y.txt", "skip/z.txt", "organised/w.txt"]:
+        (root / rel).parent.mkdir(parents=True, exist_ok=True)
+        (root / rel).write_text("x")
+    (root / "top.txt").write_text("x")
+    other = tmp_path / "other"
+    other.mkdir()
+
+    # A single root is split so that several workers have something to do
+    assert plan_shards([root], 4, dest=root / "organised", exclude=["skip"]) == [
+        Shard(root, files_only=True), Shard(root, subdir="a"), Shard(root, subdir="b"),
+    ]
+    # Enough roots: one shard each
+    assert plan_shards([root, other], 2) == [Shard(root), Shard(other)]
+
+
+def test_run_sharded(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "labels.json").write_text(
+        '{"examples": ["bank statement", "credit card statement", "passport scan", "driver license"],'
+        ' "labels": ["Finance", "Finance", "ID", "ID"]}'
+    )
+    alice, bob = tmp_path / "alice", tmp_path / "bob"
+    for name in ["bank statement april", "sub/bank statement may", "holiday photo beach"]:
+        for root in (alice, bob):
+            (root / name).parent.mkdir(parents=True, exist_ok=True)
+            (root / f"{name}.txt").write_text(name.split("/")[-1])
+    monkeypatch.setattr("builtins.input", lambda prompt="": "n")
+
+    dest = tmp_path / "organised"
+    # Workers are spawned, so they need a real (offline) embedder rather than a test stub
+    report = run_sharded([alice, bob], dest, RunOptions(threshold=1.15, model_name="hashing", workers=0), shard_workers=2)
+
+    assert (report["files"], report["confident"], report["to_label"]) == (6, 4, 2)
+    assert [r["shard"] for r in report["shards"]] == [str(alice), str(bob)]
+    assert report["cache_misses"] == 6 and (tmp_path / "embedding_cache.sqlite").exists()
+    assert sorted(p.name for p in (dest / "Finance").iterdir()) == [
+        "bank statement april (1).txt", "bank statement april.txt",
+        "bank statement may (1).txt", "bank statement may.txt",
+    ]
+    assert len(list((dest / "Uncategorised").iterdir())) == 2
+    # One journaled run, so a single --undo reverts all shards
+    runs = {r["run"] for r in MoveJournal().read()}
+    assert len(runs) == 1
+    json.dumps(report)
+
+
+def _anonymous_bytes() -> int:
+    # Memory not backed by a file: private copies, unlike the artifact's shared pages
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            if line.startswith("Anonymous:"):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+def _load_and_search(path: str, model_name: str) -> int:
+    # Runs in a spawned process, as a shard worker does
+    before = _anonymous_bytes()
+    knn_wrapper = KNNModelWrapper(model_name=model_name)
+    knn_wrapper.load(Path(path))
+    knn_wrapper.nearest_embeddings(np.ones((4, knn_wrapper.embeddings.shape[1]), dtype=np.float32))
+    return _anonymous_bytes() - before
+
+
+@pytest.mark.skipif(not Path("/proc/self/smaps_rollup").exists(), reason="needs Linux /proc")
+def test_worker_searches_the_shared_artifact(tmp_path):
+    knn_wrapper = KNNModelWrapper(model_name="hashing:4096")
+    knn_wrapper.train([f"document {i} about topic {i % 37}" for i in range(2000)], ["a", "b"] * 1000)
+    knn_wrapper.save(tmp_path / "m.kfo")
+    matrix_bytes = knn_wrapper.embeddings.nbytes
+
+    with multiprocessing.get_context("spawn").Pool(1) as pool:
+        grown = pool.apply(_load_and_search, (str(tmp_path / "m.kfo"), "hashing:4096"))
+    # The default (exact) backend searches the memory-mapped matrix in place
+    assert grown < matrix_bytes / 4
@@ -0,0 +1,52 @@
+import os
+import threading
+import time
+
+from knn_file_organiser.watcher import exclude_dest, snapshot, watch_changes
+
+
+def _touch(path, text="x", mtime_ns=None):
+    path.write_text(text)
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_watch_batches_new_and_changed_files(tmp_path):
+    (tmp_path / "old.txt").write_text("old")
+    changes = watch_changes(tmp_path, interval=0.01, debounce=0, initial=False)
+    _touch(tmp_path / "a.txt")
+    _touch(tmp_path / "b.txt")
+    assert next(changes) == [tmp_path / "a.txt", tmp_path / "b.txt"]
+    _touch(tmp_path / "a.txt", "changed", mtime_ns=time.time_ns() + 10**9)
+    assert next(changes) == [tmp_path / "a.txt"]
+    (tmp_path / "b.txt").unlink()
+    _touch(tmp_path / "b.txt", "back again")
+    assert next(changes) == [tmp_path / "b.txt"]
+
+
+def test_watch_debounces_files_being_written(tmp_path):
+    target = tmp_path / "download.pdf"
+    _touch(target, "part")
+
+    def keep_writing():
+        for i in range(5):
+            time.sleep(0.03)
+            _touch(target, "part" * (i + 2))
+
+    writer = threading.Thread(target=keep_writing)
+    writer.start()
+    started = time.monotonic()
+    batch = next(watch_changes(tmp_path, interval=0.01, debounce=0.1))
+    writer.join()
+    assert batch == [target]
+    assert time.monotonic() - started >= 0.2
+    assert target.read_text() == "part" * 6
+
+
+def test_exclude_dest_inside_source(tmp_path):
+    (tmp_path / "Organised" / "Finance").mkdir(parents=True)
+    (tmp_path / "Organised" / "Finance" / "done.pdf").write_text("x")
+    (tmp_path / "new.pdf").write_text("x")
+    exclude = exclude_dest(tmp_path, tmp_path / "Organised", ["*.tmp"])
+    assert list(snapshot(tmp_path, exclude=exclude)) == [tmp_path / "new.pdf"]
+    assert exclude_dest(tmp_path / "src", tmp_path / "out") == []